@@ -1,7 +1,9 @@
 """Jupyter server extension to serve content in Arrow format."""
 
+from typing import TYPE_CHECKING, Any
+
 try:
-    from ._version import __version__
+    from ._version import __version__ as __version__
 except ImportError:
     # Fallback when using the package in dev mode without installing
     # in editable mode with pip. It is highly recommended to install
@@ -12,12 +14,26 @@ except ImportError:
     warnings.warn("Importing 'arbalister' outside a proper installation.", stacklevel=1)
     __version__ = "dev"
 
-import jupyterlab.labapp
-
-from . import arrow as arrow
 from . import file_format as file_format
 from . import params as params
-from . import routes as routes
+
+if TYPE_CHECKING:
+    import jupyter_server.serverapp
+
+    from . import arrow as arrow
+    from . import routes as routes
+
+# Submodules importing DataFusion and Arrow, imported on first access so that loading the server
+# extension stays cheap until a data file is opened
+_LAZY_SUBMODULES = frozenset({"arrow", "routes"})
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_SUBMODULES:
+        import importlib
+
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _jupyter_labextension_paths() -> list[dict[str, str]]:
@@ -28,8 +44,10 @@ def _jupyter_server_extension_points() -> list[dict[str, str]]:
     return [{"module": "arbalister"}]
 
 
-def _load_jupyter_server_extension(server_app: jupyterlab.labapp.LabApp) -> None:
+def _load_jupyter_server_extension(server_app: "jupyter_server.serverapp.ServerApp") -> None:
     """Register the API handler to receive HTTP requests from the frontend extension."""
-    routes.setup_route_handlers(server_app.web_app)
+    from . import extension
+
+    extension.setup_deferred_route_handlers(server_app.web_app)
     name = "arbalister"
     server_app.log.info(f"Registered {name} server extension")
@@ -1,10 +1,21 @@
+import contextlib
 import dataclasses
 import pathlib
-from typing import Any, Literal, Self
+import threading
+from typing import Any, Iterator, Literal, Self
 
+import adbc_driver_manager
 import adbc_driver_sqlite.dbapi as adbc_sqlite
 import pyarrow as pa
 
+from . import cache as cache
+from . import filters as filters
+
+# Number of rows between two recorded rowids in the keyset pagination index
+ROWID_STRIDE = 4096
+# Maximum number of idle connections kept open per database file
+MAX_IDLE_CONNECTIONS = 4
+
 
 def write_sqlite(
     table: pa.Table,
@@ -20,6 +31,130 @@ def write_sqlite(
         connection.commit()
 
 
+class ConnectionPool:
+    """A pool of connections per database file.
+
+    Connections are closed when the file changes, so that a replaced file is not read through a
+    stale connection.
+    """
+
+    def __init__(self, max_idle: int = MAX_IDLE_CONNECTIONS) -> None:
+        self._max_idle = max_idle
+        self._idle: dict[str, tuple[cache.FileKey, list[adbc_sqlite.Connection]]] = {}
+        self._lock = threading.Lock()
+
+    def _take(self, key: cache.FileKey) -> adbc_sqlite.Connection | None:
+        with self._lock:
+            current_key, connections = self._idle.get(key.path, (key, []))
+            if current_key != key:
+                del self._idle[key.path]
+                for connection in connections:
+                    connection.close()
+                return None
+            return connections.pop() if connections else None
+
+    def _give(self, key: cache.FileKey, connection: adbc_sqlite.Connection) -> None:
+        with self._lock:
+            current_key, connections = self._idle.setdefault(key.path, (key, []))
+            if current_key == key and len(connections) < self._max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+    @contextlib.contextmanager
+    def connect(self, path: pathlib.Path | str) -> Iterator[adbc_sqlite.Connection]:
+        """Borrow a connection to the database file for the duration of the context."""
+        key = cache.FileKey.from_path(path)
+        # Autocommit so that idle connections do not hold a read transaction locking writers out
+        connection = self._take(key) or adbc_sqlite.connect(key.path, autocommit=True)
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        self._give(key, connection)
+
+    def clear(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for _, connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+_POOL = ConnectionPool()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SqliteTableInfo:
+    """Metadata of a table in a Sqlite file."""
+
+    schema: pa.Schema
+    num_rows: int
+    # Rowid of every ROWID_STRIDE-th row in rowid order, or None for tables without rowid
+    rowid_checkpoints: list[int] | None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SqliteDatabaseInfo:
+    """Metadata of a Sqlite file."""
+
+    table_names: list[str]
+
+
+_FILE_INFO = cache.LruCache[cache.FileKey, SqliteDatabaseInfo](max_bytes=16 << 20)
+_TABLE_INFO = cache.LruCache[tuple[cache.FileKey, str], SqliteTableInfo](max_bytes=64 << 20)
+
+
+def _read_rowid_checkpoints(cursor: adbc_sqlite.Cursor, table_name: str) -> list[int] | None:
+    """Return the rowid of every ROWID_STRIDE-th row, computed in a single scan."""
+    table = filters.quote_identifier(table_name)
+    try:
+        cursor.execute(
+            "SELECT rowid FROM "
+            f"(SELECT rowid, ROW_NUMBER() OVER (ORDER BY rowid) - 1 AS n FROM {table}) "
+            f"WHERE n % {ROWID_STRIDE} = 0"
+        )
+    except adbc_driver_manager.ProgrammingError:
+        # Tables created WITHOUT ROWID
+        return None
+    return [int(rowid) for rowid in cursor.fetch_arrow_table().column(0).to_pylist()]
+
+
+def get_file_info(path: pathlib.Path | str) -> SqliteDatabaseInfo:
+    """Return the metadata of a Sqlite file, cached until the file changes."""
+
+    def read() -> SqliteDatabaseInfo:
+        with _POOL.connect(path) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                return SqliteDatabaseInfo(table_names=[row for (row,) in cursor.fetchall()])
+
+    return _FILE_INFO.get_or_insert(
+        cache.FileKey.from_path(path), read, nbytes=lambda info: sum(len(n) for n in info.table_names)
+    )
+
+
+def get_table_info(path: pathlib.Path | str, table_name: str) -> SqliteTableInfo:
+    """Return the metadata of a table in a Sqlite file, cached until the file changes."""
+
+    def read() -> SqliteTableInfo:
+        with _POOL.connect(path) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {filters.quote_identifier(table_name)}")
+                num_rows = cursor.fetchone()[0]  # type: ignore[index]
+                checkpoints = _read_rowid_checkpoints(cursor, table_name)
+            schema = connection.adbc_get_table_schema(table_name)
+        return SqliteTableInfo(schema=schema, num_rows=num_rows, rowid_checkpoints=checkpoints)
+
+    return _TABLE_INFO.get_or_insert(
+        (cache.FileKey.from_path(path), table_name),
+        read,
+        nbytes=lambda info: 8 * len(info.rowid_checkpoints or []) + 1024,
+    )
+
+
 @dataclasses.dataclass
 class SqliteDataFrame:
     """A DataFrame plan on a Sqlite file.
@@ -33,17 +168,17 @@ class SqliteDataFrame:
     _table_name: str
     _schema: pa.Schema
     _num_rows: int
+    _rowid_checkpoints: list[int] | None = None
     _limit: int | None = None
     _offset: int | None = None
     _select: list[str] | None = None
+    _where: tuple[str, list[Any]] | None = None
+    _order_by: str | None = None
 
     @staticmethod
     def get_table_names(path: pathlib.Path | str) -> list[str]:
         """Get the list of table names in a SQLite database."""
-        with adbc_sqlite.connect(str(path)) as connection:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                return [row for (row,) in cursor.fetchall()]
+        return get_file_info(path).table_names
 
     @classmethod
     def read_sqlite(cls, context: Any, path: pathlib.Path | str, table_name: str | None = None) -> Self:
@@ -55,17 +190,19 @@ class SqliteDataFrame:
         if table_name not in tables or table_name is None:
             raise ValueError(f"Invalid table name {table_name}")
 
-        with adbc_sqlite.connect(str(path)) as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-                num_rows = cursor.fetchone()[0]  # type: ignore[index]
-
-            schema = connection.adbc_get_table_schema(table_name)
-
-            return cls(_path=str(path), _table_name=table_name, _schema=schema, _num_rows=num_rows)
+        info = get_table_info(path, table_name)
+        return cls(
+            _path=str(path),
+            _table_name=table_name,
+            _schema=info.schema,
+            _num_rows=info.num_rows,
+            _rowid_checkpoints=info.rowid_checkpoints,
+        )
 
     def schema(self) -> pa.Schema:
         """Return the :py:class:`pyarrow.Schema` of this DataFrame."""
+        if self._select is not None:
+            return pa.schema([self._schema.field(name) for name in self._select])
         return self._schema
 
     def limit(self, count: int, offset: int = 0) -> Self:
@@ -80,16 +217,75 @@ class SqliteDataFrame:
         """Return the total number of rows in this DataFrame."""
         return self._num_rows
 
-    def to_arrow_table(self) -> pa.Table:
-        """Execute the DataFrame and convert it into an Arrow Table."""
-        limit = (
-            f"LIMIT {self._limit} OFFSET {self._offset}"
-            if self._limit is not None and self._offset is not None
-            else ""
+    def filter(self, predicate: filters.Expr) -> Self:
+        """Return a DataFrame with only the rows matching the predicate, translated to SQL."""
+        sql, params = filters.to_sql(predicate)
+        if self._where is not None:
+            sql, params = f"{self._where[0]} AND {sql}", self._where[1] + params
+        query = f"SELECT COUNT(*) FROM {filters.quote_identifier(self._table_name)} WHERE {sql}"
+        with _POOL.connect(self._path) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, parameters=params or None)
+                num_rows = cursor.fetchone()[0]  # type: ignore[index]
+        return dataclasses.replace(self, _where=(sql, params), _num_rows=num_rows)
+
+    def sort(self, column: str, descending: bool = False) -> Self:
+        """Return a DataFrame sorted by the given column, with nulls last."""
+        direction = "DESC" if descending else "ASC"
+        return dataclasses.replace(
+            self, _order_by=f"{filters.quote_identifier(column)} {direction} NULLS LAST"
         )
-        columns = self._select if self._select is not None else ["*"]
 
-        with adbc_sqlite.connect(self._path) as connection:
+    def _query(self) -> tuple[str, list[Any]]:
+        """Return the SQL query of this plan and its parameters."""
+        columns = ", ".join(map(filters.quote_identifier, self._select)) if self._select is not None else "*"
+        query = f"SELECT {columns} FROM {filters.quote_identifier(self._table_name)}"
+        params: list[Any] = []
+        # SQLite scans covering indexes in index order, so pages must all be ordered by rowid to
+        # neither overlap nor skip rows. Tables without rowid are scanned in primary key order.
+        has_rowid = self._rowid_checkpoints is not None
+
+        if self._where is not None or self._order_by is not None:
+            if self._where is not None:
+                query += f" WHERE {self._where[0]}"
+                params += self._where[1]
+            # The rowid breaks ties between rows of equal sort values
+            sort_keys = [k for k in [self._order_by, "rowid" if has_rowid else None] if k is not None]
+            if sort_keys:
+                query += f" ORDER BY {', '.join(sort_keys)}"
+            if self._limit is not None and self._offset is not None:
+                query += " LIMIT ? OFFSET ?"
+                params += [self._limit, self._offset]
+            return query, params
+
+        order_by = " ORDER BY rowid" if has_rowid else ""
+        if self._limit is None or self._offset is None:
+            return f"{query}{order_by}", params
+
+        checkpoints = self._rowid_checkpoints
+        if not checkpoints or self._offset < ROWID_STRIDE:
+            return f"{query}{order_by} LIMIT ? OFFSET ?", [self._limit, self._offset]
+
+        # Keyset pagination: start from the closest known rowid so that SQLite only steps over
+        # less than ROWID_STRIDE rows instead of every row before the offset.
+        checkpoint = min(self._offset // ROWID_STRIDE, len(checkpoints) - 1)
+        return (
+            f"{query} WHERE rowid >= ? ORDER BY rowid LIMIT ? OFFSET ?",
+            [checkpoints[checkpoint], self._limit, self._offset - checkpoint * ROWID_STRIDE],
+        )
+
+    def to_arrow_table(self) -> pa.Table:
+        """Execute the DataFrame and convert it into an Arrow Table."""
+        query, parameters = self._query()
+        with _POOL.connect(self._path) as connection:
             with connection.cursor() as cursor:
-                cursor.execute(f'SELECT {",".join(columns)} FROM "{self._table_name}" {limit}')
+                cursor.execute(query, parameters=parameters or None)
                 return cursor.fetch_arrow_table()
+
+    def execute_stream(self) -> Iterator[pa.RecordBatch]:
+        """Execute the DataFrame and lazily yield its record batches."""
+        query, parameters = self._query()
+        with _POOL.connect(self._path) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, parameters=parameters or None)
+                yield from cursor.fetch_record_batch()
@@ -1,38 +1,124 @@
 import codecs
+import dataclasses
+import os
 import pathlib
+import uuid
 from typing import Any, Callable
 
 import datafusion as dn
 import pyarrow as pa
 
+from . import cache as cache
+from . import csv_index as csv_index
 from . import file_format as ff
 
 ReadCallable = Callable[..., dn.DataFrame]
 
+# Formats whose reader loads the whole file in memory rather than building a lazy plan
+EAGER_FORMATS = frozenset({ff.FileFormat.Orc})
+# Formats whose reader can be planned a second time to scan the file in parallel partitions
+PARALLEL_FORMATS = frozenset(
+    {ff.FileFormat.Avro, ff.FileFormat.Csv, ff.FileFormat.Ipc, ff.FileFormat.Parquet}
+)
+
+
+def _decode_delimiter(delimiter: str) -> str:
+    """Decode delimiters passed as escape sequences, such as a tabulation."""
+    if len(delimiter) > 1:
+        return codecs.decode(delimiter, "unicode_escape")
+    return delimiter
+
+
+def from_arrow(ctx: dn.SessionContext, table: pa.Table) -> dn.DataFrame:
+    """Create a DataFrame of an in-memory table, without keeping the table in the session catalog.
+
+    DataFusion registers the table under a generated name to plan the DataFrame, which would keep
+    it in memory for the lifetime of the session, while the DataFrame holds the table by itself.
+    """
+    name = f"arrow_{uuid.uuid4().hex}"
+    df = ctx.from_arrow(table, name=name)
+    ctx.deregister_table(name)
+    return df
+
 
 def _read_csv(
     ctx: dn.SessionContext, path: str | pathlib.Path, delimiter: str, **kwargs: dict[str, Any]
 ) -> dn.DataFrame:
-    if len(delimiter) > 1:
-        delimiter = codecs.decode(delimiter, "unicode_escape")
-    return ctx.read_csv(path, delimiter=delimiter, **kwargs)  # type: ignore[arg-type]
+    # Start indexing rows in the background to speed up later chunk requests
+    csv_index.get_indexer().get(path)
+    return ctx.read_csv(path, delimiter=_decode_delimiter(delimiter), **kwargs)  # type: ignore[arg-type]
 
 
-def _read_ipc(ctx: dn.SessionContext, path: str | pathlib.Path, **kwargs: dict[str, Any]) -> dn.DataFrame:
-    import pyarrow.feather
+# Memory allocated when loading each IPC file version, beyond the pages of the mapped file
+_IPC_HEAP_NBYTES = cache.LruCache[cache.FileKey, int](max_bytes=1 << 20)
 
-    #  table = pyarrow.feather.read_table(path, {**{"memory_map": True}, **kwargs})
-    table = pyarrow.feather.read_table(path, **kwargs)
-    return ctx.from_arrow(table)
 
+def _heap_nbytes(table: pa.Table, mapped: pa.Buffer) -> int:
+    """Return the size of the table buffers allocated in memory rather than pointing into the mapped file."""
+    start, end = mapped.address, mapped.address + mapped.size
+    seen: set[int] = set()
+    nbytes = 0
+    for column in table.columns:
+        for chunk in column.chunks:
+            buffers = chunk.buffers()
+            if pa.types.is_dictionary(chunk.type):
+                buffers += chunk.dictionary.buffers()
+            for buffer in buffers:
+                if buffer is not None and not start <= buffer.address < end and buffer.address not in seen:
+                    seen.add(buffer.address)
+                    nbytes += buffer.size
+    return nbytes
 
-def _read_orc(ctx: dn.SessionContext, path: str | pathlib.Path, **kwargs: dict[str, Any]) -> dn.DataFrame:
+
+def _load_ipc(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> pa.Table:
+    # Memory map the file so that Arrow buffers point into the OS page cache rather than being
+    # copied in memory. DataFusion imports them without copy, so a query only faults in the
+    # pages of the record batches it touches.
+    # Compressed IPC files, such as Feather files written with the defaults, still need to be
+    # decompressed in memory, which is recorded for the memory budget of the caches.
+    file = cache.FileKey.from_path(path)
+    source = pa.memory_map(str(path))
+    mapped = source.read_buffer(source.size())
+    source.seek(0)
+    try:
+        table = pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        import pyarrow.feather
+
+        # Legacy Feather V1 files are not IPC files
+        source.seek(0)
+        table = pyarrow.feather.read_table(source, **kwargs)
+    _IPC_HEAP_NBYTES.put(file, _heap_nbytes(table, mapped), nbytes=64)
+    return table
+
+
+def loaded_nbytes(file_format: ff.FileFormat, file: cache.FileKey) -> int:
+    """Estimate the memory held by the table of a file version read by the reader of its format.
+
+    Lazy formats only hold a plan, and uncompressed IPC files point into the mapped file, so
+    they hold no memory by themselves.
+    """
+    if file_format in EAGER_FORMATS:
+        return file.size
+    if file_format == ff.FileFormat.Ipc:
+        return _IPC_HEAP_NBYTES.get(file) or 0
+    return 0
+
+
+def _load_orc(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> pa.Table:
     # Watch for https://github.com/datafusion-contrib/datafusion-orc
     # Evolution for native datafusion reader
     import pyarrow.orc
 
-    table = pyarrow.orc.read_table(path, **kwargs)
-    return ctx.from_arrow(table)
+    return pyarrow.orc.read_table(path, **kwargs)
+
+
+def _read_ipc(ctx: dn.SessionContext, path: str | pathlib.Path, **kwargs: dict[str, Any]) -> dn.DataFrame:
+    return from_arrow(ctx, _load_ipc(path, **kwargs))
+
+
+def _read_orc(ctx: dn.SessionContext, path: str | pathlib.Path, **kwargs: dict[str, Any]) -> dn.DataFrame:
+    return from_arrow(ctx, _load_orc(path, **kwargs))
 
 
 def get_table_reader(format: ff.FileFormat) -> ReadCallable:
@@ -64,6 +150,381 @@ def get_table_reader(format: ff.FileFormat) -> ReadCallable:
     return out
 
 
+RegisterCallable = Callable[..., None]
+
+
+def _register_avro(
+    ctx: dn.SessionContext,
+    name: str,
+    path: str | pathlib.Path,
+    schema: pa.Schema | None = None,
+    **kwargs: dict[str, Any],
+) -> None:
+    ctx.register_avro(name, path, schema=schema, file_extension=pathlib.Path(path).suffix)
+
+
+def _register_csv(
+    ctx: dn.SessionContext,
+    name: str,
+    path: str | pathlib.Path,
+    delimiter: str,
+    schema: pa.Schema | None = None,
+    **kwargs: dict[str, Any],
+) -> None:
+    # Start indexing rows in the background to speed up later chunk requests
+    csv_index.get_indexer().get(path)
+    ctx.register_csv(
+        name,
+        path,
+        schema=schema,
+        delimiter=_decode_delimiter(delimiter),
+        file_extension=pathlib.Path(path).suffix,
+    )
+
+
+def _register_parquet(
+    ctx: dn.SessionContext,
+    name: str,
+    path: str | pathlib.Path,
+    schema: pa.Schema | None = None,
+    file_extension: str | None = None,
+    table_partition_cols: tuple[str, ...] = (),
+    **kwargs: dict[str, Any],
+) -> None:
+    if schema is not None:
+        # DataFusion appends the partition columns to the schema of the files
+        schema = pa.schema([f for f in schema if f.name not in table_partition_cols])
+    extension = file_extension or pathlib.Path(path).suffix
+    partition_cols: list[tuple[str, Any]] = [(c, pa.string()) for c in table_partition_cols]
+    try:
+        ctx.register_parquet(
+            name, path, schema=schema, file_extension=extension, table_partition_cols=partition_cols
+        )
+    except TypeError:
+        # DataFusion before 48 takes the names of the partition column types only
+        partition_cols = [(c, "string") for c in table_partition_cols]
+        ctx.register_parquet(
+            name, path, schema=schema, file_extension=extension, table_partition_cols=partition_cols
+        )
+
+
+def _register_ipc(
+    ctx: dn.SessionContext,
+    name: str,
+    path: str | pathlib.Path,
+    schema: pa.Schema | None = None,
+    **kwargs: dict[str, Any],
+) -> None:
+    ctx.from_arrow(_load_ipc(path, **kwargs), name=name)
+
+
+def _register_orc(
+    ctx: dn.SessionContext,
+    name: str,
+    path: str | pathlib.Path,
+    schema: pa.Schema | None = None,
+    **kwargs: dict[str, Any],
+) -> None:
+    ctx.from_arrow(_load_orc(path, **kwargs), name=name)
+
+
+def get_table_registrar(format: ff.FileFormat) -> RegisterCallable | None:
+    """Get the function registering a file as a named table of a datafusion session context.
+
+    The function skips schema inference when given the schema of the file.
+    Return None if the format is not read by datafusion.
+    """
+    match format:
+        case ff.FileFormat.Avro:
+            return _register_avro
+        case ff.FileFormat.Csv:
+            return _register_csv
+        case ff.FileFormat.Parquet:
+            return _register_parquet
+        case ff.FileFormat.Ipc:
+            return _register_ipc
+        case ff.FileFormat.Orc:
+            return _register_orc
+    return None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class FileStats:
+    """Statistics read from a file metadata without scanning its data."""
+
+    num_rows: int
+    # Whether the number of rows is exact or an estimate
+    exact: bool = True
+    # The file schema when reading it is cheaper than building a DataFrame
+    schema: pa.Schema | None = None
+
+
+StatsCallable = Callable[..., FileStats | None]
+
+# Size under which counting CSV rows exactly is cheap enough
+CSV_EXACT_COUNT_MAX_BYTES = 16 << 20
+CSV_SAMPLE_BYTES = 1 << 20
+
+
+def _read_csv_stats(path: str | pathlib.Path, delimiter: str, **kwargs: dict[str, Any]) -> FileStats | None:
+    if (index := csv_index.get_indexer().get(path)) is not None:
+        return FileStats(num_rows=index.num_rows)
+
+    size = os.path.getsize(path)
+    if size <= CSV_EXACT_COUNT_MAX_BYTES:
+        return None
+
+    import pyarrow.csv
+
+    with open(path, "rb") as file:
+        sample = file.read(CSV_SAMPLE_BYTES)
+    # Only keep complete lines and extrapolate the number of rows from the sample to the file
+    sample = sample[: sample.rfind(b"\n") + 1]
+    header_size = sample.find(b"\n") + 1
+    if header_size == 0 or header_size == len(sample):
+        # Lines longer than the sample leave no complete row to extrapolate from
+        return None
+    try:
+        sample_rows = pyarrow.csv.read_csv(
+            pa.py_buffer(sample),
+            parse_options=pyarrow.csv.ParseOptions(
+                delimiter=_decode_delimiter(delimiter), newlines_in_values=True
+            ),
+        ).num_rows
+    except pa.ArrowInvalid:
+        return None
+    if sample_rows == 0:
+        return None
+    num_rows = round(sample_rows * (size - header_size) / (len(sample) - header_size))
+    return FileStats(num_rows=num_rows, exact=False)
+
+
+# Avro block headers are spread over the whole file so we avoid scanning them on every request
+_AVRO_INDEXES = cache.LruCache[cache.FileKey, Any](max_bytes=16 << 20)
+
+
+def read_avro_index(path: str | pathlib.Path) -> Any:
+    """Read the block index of an Avro file, cached until the file changes."""
+    from . import avro_file
+
+    return _AVRO_INDEXES.get_or_insert(
+        cache.FileKey.from_path(path),
+        lambda: avro_file.read_index(path),
+        nbytes=lambda index: 64 * (len(index.blocks) + 1),
+    )
+
+
+def _read_avro_stats(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> FileStats:
+    return FileStats(num_rows=read_avro_index(path).num_rows)
+
+
+def _read_ipc_stats(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> FileStats | None:
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+    except pa.ArrowInvalid:
+        return None
+    if hasattr(reader, "count_rows"):
+        # Only reads the metadata of the record batches, from pyarrow 21
+        return FileStats(num_rows=reader.count_rows())
+    # Record batches of uncompressed files point into the mapped file, while compressed ones are
+    # decompressed one at a time
+    return FileStats(num_rows=sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches)))
+
+
+# ORC footers list every stripe so we avoid parsing them on every request
+_ORC_INDEXES = cache.LruCache[cache.FileKey, Any](max_bytes=16 << 20)
+
+
+def read_orc_index(path: str | pathlib.Path) -> Any:
+    """Read the stripe index of an ORC file, cached until the file changes, or None if unsupported."""
+    from . import orc_file
+
+    return _ORC_INDEXES.get_or_insert(
+        cache.FileKey.from_path(path),
+        lambda: orc_file.read_index(path),
+        nbytes=lambda index: 64 * (len(index.stripes) + 1 if index is not None else 1),
+    )
+
+
+def _read_orc_stats(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> FileStats:
+    import pyarrow.orc
+
+    orc_file = pyarrow.orc.ORCFile(path)
+    # The ORC reader is eager so we avoid building a DataFrame to get the schema
+    return FileStats(num_rows=orc_file.nrows, schema=orc_file.schema)
+
+
+# Parquet footers can be large for wide files so we avoid parsing them on every request
+_PARQUET_METADATA = cache.LruCache[cache.FileKey, Any](max_bytes=64 << 20)
+
+
+def read_parquet_metadata(path: str | pathlib.Path) -> Any:
+    """Read the footer metadata of a Parquet file, cached until the file changes."""
+    import pyarrow.parquet
+
+    return _PARQUET_METADATA.get_or_insert(
+        cache.FileKey.from_path(path),
+        lambda: pyarrow.parquet.read_metadata(path),
+        nbytes=lambda m: m.serialized_size,
+    )
+
+
+def _read_parquet_stats(path: str | pathlib.Path, **kwargs: dict[str, Any]) -> FileStats:
+    return FileStats(num_rows=read_parquet_metadata(path).num_rows)
+
+
+def get_stats_reader(format: ff.FileFormat) -> StatsCallable | None:
+    """Get the function reading statistics from the file metadata for the given format.
+
+    Returns None if the DataFrame count is already cheap for this format.
+    The stats reader may itself return None if it has no better alternative to counting rows.
+    """
+    out: StatsCallable | None = None
+    match format:
+        case ff.FileFormat.Avro:
+            out = _read_avro_stats
+        case ff.FileFormat.Csv:
+            out = _read_csv_stats
+        case ff.FileFormat.Parquet:
+            out = _read_parquet_stats
+        case ff.FileFormat.Ipc:
+            out = _read_ipc_stats
+        case ff.FileFormat.Orc:
+            out = _read_orc_stats
+        case ff.FileFormat.Sqlite:
+            # The number of rows is already cached in the SqliteDataFrame
+            out = None
+    return out
+
+
+WindowReadCallable = Callable[..., pa.Table | None]
+
+
+def row_window_parts(part_rows: list[int], offset: int, count: int) -> tuple[list[int], int]:
+    """Return the indices of the parts overlapping a row window, and the first part row offset."""
+    parts: list[int] = []
+    first_row = 0
+    start = 0
+    for i, num_rows in enumerate(part_rows):
+        end = start + num_rows
+        if end > offset and start < offset + count:
+            if not parts:
+                first_row = start
+            parts.append(i)
+        start = end
+    return parts, first_row
+
+
+def _read_parquet_window(
+    path: str | pathlib.Path, offset: int, count: int, schema: pa.Schema, **kwargs: dict[str, Any]
+) -> pa.Table:
+    import pyarrow.parquet
+
+    metadata = read_parquet_metadata(path)
+    parquet_file = pyarrow.parquet.ParquetFile(path, metadata=metadata)
+    row_group_rows = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    row_groups, first_row = row_window_parts(row_group_rows, offset=offset, count=count)
+    table = parquet_file.read_row_groups(row_groups, columns=schema.names)
+    return table.slice(offset - first_row, count)
+
+
+def _read_csv_window(
+    path: str | pathlib.Path, offset: int, count: int, schema: pa.Schema, delimiter: str, **kwargs: Any
+) -> pa.Table | None:
+    index = csv_index.get_indexer().get(path)
+    if index is None:
+        return None
+
+    import pyarrow.csv
+
+    # Only parse the rows between the index checkpoints surrounding the requested window
+    start, end, first_row = index.byte_range(offset=offset, count=count)
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = index.header + file.read(end - start)
+    try:
+        table = pyarrow.csv.read_csv(
+            pa.py_buffer(data),
+            parse_options=pyarrow.csv.ParseOptions(
+                delimiter=_decode_delimiter(delimiter), newlines_in_values=True
+            ),
+            # DataFusion only reads empty fields, quoted or not, as nulls and keeps values such as NA
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=schema,
+                include_columns=schema.names,
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowInvalid:
+        # Let DataFusion handle values that do not convert to the inferred schema
+        return None
+    return table.slice(offset - first_row, count)
+
+
+def _read_avro_window(
+    path: str | pathlib.Path,
+    offset: int,
+    count: int,
+    schema: pa.Schema,
+    context: dn.SessionContext | None = None,
+    **kwargs: dict[str, Any],
+) -> pa.Table:
+    import tempfile
+
+    from . import avro_file
+
+    index = read_avro_index(path)
+    block_ids, first_row = row_window_parts([b.num_rows for b in index.blocks], offset=offset, count=count)
+    window = avro_file.read_blocks(path, index, [index.blocks[i] for i in block_ids])
+    if context is None:
+        context = dn.SessionContext()
+    # Only the blocks covering the window are decoded, in a container file with the same header.
+    # DataFusion reads Avro from files only, and a temporary directory lets it open the file on
+    # all platforms.
+    with tempfile.TemporaryDirectory(prefix="arbalister-avro-") as directory:
+        window_path = pathlib.Path(directory) / "window.avro"
+        window_path.write_bytes(window)
+        table = context.read_avro(str(window_path)).to_arrow_table()
+    return table.select(schema.names).slice(offset - first_row, count)
+
+
+def _read_orc_window(
+    path: str | pathlib.Path, offset: int, count: int, schema: pa.Schema, **kwargs: dict[str, Any]
+) -> pa.Table | None:
+    index = read_orc_index(path)
+    if index is None:
+        return None
+
+    import pyarrow.orc
+
+    orc_file = pyarrow.orc.ORCFile(path)
+    stripe_ids, first_row = row_window_parts([s.num_rows for s in index.stripes], offset=offset, count=count)
+    table = pa.Table.from_batches(
+        [orc_file.read_stripe(i, columns=schema.names) for i in stripe_ids],
+        schema=pa.schema([orc_file.schema.field(name) for name in schema.names]),
+    )
+    return table.slice(offset - first_row, count)
+
+
+def get_window_reader(format: ff.FileFormat) -> WindowReadCallable | None:
+    """Get the function reading a window of rows while skipping unrelated parts of the file.
+
+    Returns None if the format has no better alternative to a DataFusion limit.
+    """
+    out: WindowReadCallable | None = None
+    match format:
+        case ff.FileFormat.Avro:
+            out = _read_avro_window
+        case ff.FileFormat.Csv:
+            out = _read_csv_window
+        case ff.FileFormat.Orc:
+            out = _read_orc_window
+        case ff.FileFormat.Parquet:
+            out = _read_parquet_window
+    return out
+
+
 WriteCallable = Callable[..., None]
 
 
@@ -89,22 +550,34 @@ def _arrow_to_avro_type(field: pa.Field) -> str | dict[str, Any]:
 
 
 def _write_avro(
-    table: pa.Table, path: str | pathlib.Path, name: str = "Record", namespace: str = "ns"
+    table: pa.Table,
+    path: str | pathlib.Path,
+    name: str = "Record",
+    namespace: str = "ns",
+    block_bytes: int = 1 << 16,
 ) -> None:
-    # Avro writing is an optional dependency not added by default as it is only necessary during testing
     import json
 
+    from . import avro_file
+
+    schema = json.dumps(
+        {
+            "type": "record",
+            "name": name,
+            "namespace": namespace,
+            "fields": [{"name": f.name, "type": _arrow_to_avro_type(f)} for f in table.schema],
+        }
+    )
+    if avro_file.write_table(table, path, schema=schema, block_bytes=block_bytes):
+        return
+
+    # Nested columns and nulls go through Python records with the avro package, an optional
+    # dependency not added by default as it is only necessary during testing
     import avro.schema
     from avro.datafile import DataFileWriter
     from avro.io import DatumWriter
 
-    schema = {
-        "type": "record",
-        "name": name,
-        "namespace": namespace,
-        "fields": [{"name": f.name, "type": _arrow_to_avro_type(f)} for f in table.schema],
-    }
-    schema_parsed = avro.schema.parse(json.dumps(schema))
+    schema_parsed = avro.schema.parse(schema)
     recs = table.to_pylist()
     with open(path, "wb") as f:
         writer = DataFileWriter(f, DatumWriter(), schema_parsed)
@@ -0,0 +1,244 @@
+import dataclasses
+import os
+import pathlib
+from typing import TYPE_CHECKING, BinaryIO
+
+import pyarrow as pa
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+MAGIC = b"Obj\x01"
+SYNC_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AvroBlock:
+    """Location of a block of records in an Avro container file."""
+
+    # Byte offset of the block header in the file
+    offset: int
+    # Byte size of the block, including its header and trailing sync marker
+    size: int
+    # Index of the first record of the block in the file
+    row_offset: int
+    num_rows: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AvroFileIndex:
+    """The header and block locations of an Avro container file."""
+
+    # Byte size of the file header, including the sync marker
+    header_size: int
+    sync: bytes
+    blocks: list[AvroBlock]
+
+    @property
+    def num_rows(self) -> int:
+        """Total number of records in the file."""
+        return sum(b.num_rows for b in self.blocks)
+
+
+def _read_long(file: BinaryIO) -> int | None:
+    """Read a zigzag varint encoded long, or return None at the end of file."""
+    shift = 0
+    acc = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift == 0:
+                return None
+            raise ValueError("Truncated Avro long")
+        value = byte[0]
+        acc |= (value & 0x7F) << shift
+        shift += 7
+        if not value & 0x80:
+            return (acc >> 1) ^ -(acc & 1)
+
+
+def _read_required_long(file: BinaryIO) -> int:
+    value = _read_long(file)
+    if value is None:
+        raise ValueError("Unexpected end of Avro file")
+    return value
+
+
+def _skip_metadata(file: BinaryIO) -> None:
+    """Skip the header metadata, encoded as an Avro map of bytes."""
+    while (count := _read_required_long(file)) != 0:
+        if count < 0:
+            # A negative count is followed by the byte size of the map block
+            _read_required_long(file)
+            count = -count
+        for _ in range(count):
+            file.seek(_read_required_long(file), 1)  # key
+            file.seek(_read_required_long(file), 1)  # value
+
+
+def read_index(path: pathlib.Path | str) -> AvroFileIndex:
+    """Read the header and block headers of an Avro container file, skipping over the records.
+
+    An Avro container file starts with a header (magic, metadata map, and a sync marker) followed
+    by blocks, each prefixed with its number of records and byte size.
+    Rows can therefore be counted and located without decoding any record.
+    """
+    with open(path, "rb", buffering=1 << 16) as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an Avro container file: {path}")
+        _skip_metadata(file)
+        sync = file.read(SYNC_SIZE)
+        header_size = file.tell()
+
+        blocks: list[AvroBlock] = []
+        row_offset = 0
+        while True:
+            offset = file.tell()
+            if (num_rows := _read_long(file)) is None:
+                break
+            data_size = _read_required_long(file)
+            file.seek(data_size, 1)
+            if file.read(SYNC_SIZE) != sync:
+                raise ValueError(f"Invalid Avro sync marker at byte {file.tell()} in {path}")
+            size = file.tell() - offset
+            blocks.append(AvroBlock(offset=offset, size=size, row_offset=row_offset, num_rows=num_rows))
+            row_offset += num_rows
+
+    return AvroFileIndex(header_size=header_size, sync=sync, blocks=blocks)
+
+
+def read_blocks(path: pathlib.Path | str, index: AvroFileIndex, blocks: list[AvroBlock]) -> bytes:
+    """Return an Avro container file holding only the given consecutive blocks of the file.
+
+    Blocks are self-contained under the header, so they are copied without decoding any record.
+    """
+    with open(path, "rb") as file:
+        header = file.read(index.header_size)
+        if not blocks:
+            return header
+        file.seek(blocks[0].offset)
+        return header + file.read(blocks[-1].offset + blocks[-1].size - blocks[0].offset)
+
+
+def _encode_long(value: int) -> bytes:
+    """Encode a long as a zigzag varint."""
+    acc = (value << 1) ^ (value >> 63)
+    out = bytearray()
+    while acc > 0x7F:
+        out.append((acc & 0x7F) | 0x80)
+        acc >>= 7
+    out.append(acc)
+    return bytes(out)
+
+
+def _encode_bytes(value: bytes) -> bytes:
+    return _encode_long(len(value)) + value
+
+
+# A column encoded as the byte size of each of its values and their concatenated bytes
+Piece = tuple["npt.NDArray[np.int64]", "npt.NDArray[np.uint8]"]
+
+
+def _encode_varints(values: "npt.NDArray[np.int64]") -> Piece:
+    """Encode longs as zigzag varints of 7 bits groups, using as few groups as possible."""
+    import numpy as np
+
+    max_groups = 10
+    zigzag = ((values << 1) ^ (values >> 63)).view(np.uint64)
+    groups = np.stack(
+        [(zigzag >> np.uint64(7 * g)) & np.uint64(0x7F) for g in range(max_groups)], axis=1
+    ).astype(np.uint8)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for g in range(1, max_groups):
+        lengths += (zigzag >> np.uint64(7 * g)) != 0
+    positions = np.arange(max_groups)
+    # All groups but the last have their high bit set
+    continuation = (positions[None, :] < lengths[:, None] - 1).astype(np.uint8) << np.uint8(7)
+    data: npt.NDArray[np.uint8] = (groups | continuation)[positions[None, :] < lengths[:, None]]
+    return lengths, data
+
+
+def _encode_column(column: pa.Array) -> list[Piece] | None:
+    """Encode the values of a column, or return None if its type is not supported."""
+    import numpy as np
+
+    t = column.type
+    if column.null_count > 0:
+        return None
+    if pa.types.is_integer(t) or pa.types.is_timestamp(t):
+        return [_encode_varints(column.cast(pa.int64()).to_numpy().astype(np.int64))]
+    if pa.types.is_floating(t):
+        dtype = "<f8" if t.bit_width > 32 else "<f4"
+        data = column.to_numpy().astype(dtype)
+        return [(np.full(len(data), data.itemsize, dtype=np.int64), data.view(np.uint8))]
+    if pa.types.is_boolean(t):
+        return [(np.ones(len(column), dtype=np.int64), column.to_numpy(zero_copy_only=False).view(np.uint8))]
+    if pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_binary(t):
+        binary = column.cast(pa.large_binary())
+        offsets = np.frombuffer(binary.buffers()[1], dtype=np.int64)[
+            binary.offset : binary.offset + len(binary) + 1
+        ]
+        values = binary.buffers()[2]
+        data = np.frombuffer(values, dtype=np.uint8) if values is not None else np.empty(0, dtype=np.uint8)
+        lengths = np.diff(offsets)
+        # Strings and bytes are prefixed by their size
+        return [_encode_varints(lengths), (lengths, data[offsets[0] : offsets[-1]])]
+    return None
+
+
+def _interleave(
+    pieces: list[Piece], num_rows: int
+) -> tuple["npt.NDArray[np.int64]", "npt.NDArray[np.uint8]"]:
+    """Lay the pieces out record after record, returning the record byte offsets and the bytes."""
+    import numpy as np
+
+    row_sizes = np.zeros(num_rows, dtype=np.int64)
+    for lengths, _ in pieces:
+        row_sizes += lengths
+    row_offsets = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(row_sizes)])
+    out = np.empty(row_offsets[-1], dtype=np.uint8)
+    position = row_offsets[:-1].copy()
+    for lengths, data in pieces:
+        source_offsets = np.cumsum(lengths) - lengths
+        out[np.repeat(position - source_offsets, lengths) + np.arange(len(data))] = data
+        position += lengths
+    return row_offsets, out
+
+
+def write_table(table: pa.Table, path: pathlib.Path | str, schema: str, block_bytes: int = 1 << 16) -> bool:
+    """Write a table in an Avro container file with vectorized encoding of whole columns.
+
+    The Avro ``schema`` must be a record of the table columns, in order, with types matching the
+    Arrow types: ``int`` or ``long`` for integers and timestamps, ``float`` or ``double``,
+    ``boolean``, ``string``, and ``bytes``.
+    Records are grouped in uncompressed blocks of about ``block_bytes`` bytes.
+    Returns False, without writing anything, if a column has nulls or an unsupported type.
+    """
+    # Numpy is only needed to generate files, a test dependency like the avro package rather than
+    # a dependency of the server extension
+    import numpy as np
+
+    pieces: list[Piece] = []
+    for column in table.columns:
+        encoded = _encode_column(column.combine_chunks())
+        if encoded is None:
+            return False
+        pieces += encoded
+    row_offsets, data = _interleave(pieces, table.num_rows)
+
+    sync = os.urandom(SYNC_SIZE)
+    metadata = {"avro.schema": schema.encode(), "avro.codec": b"null"}
+    with open(path, "wb") as file:
+        file.write(MAGIC + _encode_long(len(metadata)))
+        for key, value in metadata.items():
+            file.write(_encode_bytes(key.encode()) + _encode_bytes(value))
+        file.write(_encode_long(0) + sync)
+
+        block_starts = np.flatnonzero(np.diff(row_offsets[:-1] // block_bytes, prepend=-1))
+        for start, end in zip(block_starts, [*block_starts[1:], table.num_rows], strict=True):
+            block = data[row_offsets[start] : row_offsets[end]]
+            file.write(_encode_long(int(end - start)) + _encode_long(len(block)))
+            file.write(block.tobytes())
+            file.write(sync)
+    return True
@@ -0,0 +1,110 @@
+import collections
+import dataclasses
+import os
+import pathlib
+import threading
+from typing import Callable, Self
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class FileKey:
+    """Identify a given version of a file on disk."""
+
+    path: str
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def from_path(cls, path: pathlib.Path | str) -> Self:
+        """Stat the file to build its identity."""
+        resolved = pathlib.Path(path).resolve()
+        stat = os.stat(resolved)
+        return cls(path=str(resolved), mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+
+@dataclasses.dataclass(slots=True)
+class _Entry[V]:
+    value: V
+    nbytes: int
+
+
+class LruCache[K, V]:
+    """A thread-safe least-recently-used cache bounded by the estimated size of its values.
+
+    Values larger than the whole budget are returned to the caller but never stored.
+    The optional ``on_evict`` callback is called with the key and value of every value dropped to
+    stay within budget, including those never stored, to release what they hold.
+    """
+
+    def __init__(self, max_bytes: int, on_evict: Callable[[K, V], None] | None = None) -> None:
+        self._max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._nbytes = 0
+        self._entries: collections.OrderedDict[K, _Entry[V]] = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def max_bytes(self) -> int:
+        """The memory budget of the cache."""
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """The estimated memory used by the stored values."""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        """Return the number of stored values."""
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        """Return whether a value is stored for the key."""
+        return key in self._entries
+
+    def get(self, key: K) -> V | None:
+        """Return the value if present and mark it as most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key: K, value: V, nbytes: int) -> None:
+        """Insert a value, evicting the least recently used ones to stay within budget."""
+        with self._lock:
+            self.pop(key)
+            if nbytes > self._max_bytes:
+                if self._on_evict is not None:
+                    self._on_evict(key, value)
+                return
+            self._entries[key] = _Entry(value=value, nbytes=nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self._max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                if self._on_evict is not None:
+                    self._on_evict(evicted_key, evicted.value)
+
+    def pop(self, key: K) -> V | None:
+        """Remove a value from the cache and return it if it was present."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._nbytes -= entry.nbytes
+            return entry.value
+
+    def get_or_insert(self, key: K, factory: Callable[[], V], nbytes: Callable[[V], int]) -> V:
+        """Return the cached value or build, store, and return a new one."""
+        if (value := self.get(key)) is not None:
+            return value
+        value = factory()
+        self.put(key, value, nbytes(value))
+        return value
+
+    def clear(self) -> None:
+        """Remove all values from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
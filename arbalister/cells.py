@@ -0,0 +1,72 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Appended to truncated values, so that they are longer than the limit while complete values are not
+TRUNCATION_MARKER = "…"
+# Field metadata key holding the limit of the values of a truncated column
+MAX_CELL_BYTES_KEY = b"max_cell_bytes"
+
+
+def _is_truncatable(data_type: pa.DataType) -> bool:
+    return bool(
+        pa.types.is_string(data_type)
+        or pa.types.is_large_string(data_type)
+        or pa.types.is_binary(data_type)
+        or pa.types.is_large_binary(data_type)
+    )
+
+
+def truncated_schema(schema: pa.Schema, max_cell_bytes: int) -> pa.Schema:
+    """Return the schema with the limit in the metadata of the string and binary fields."""
+    return pa.schema(
+        [
+            field.with_metadata({**(field.metadata or {}), MAX_CELL_BYTES_KEY: str(max_cell_bytes)})
+            if _is_truncatable(field.type)
+            else field
+            for field in schema
+        ],
+        metadata=schema.metadata,
+    )
+
+
+def _truncate_value(value: bytes, max_cell_bytes: int, is_string: bool) -> bytes:
+    """Cut a value after its first bytes, on a character boundary for strings, and mark it."""
+    cut = max_cell_bytes
+    if is_string:
+        # Keep the whole character straddling the limit, UTF-8 continuation bytes are 0b10xxxxxx
+        while cut < len(value) and (value[cut] & 0xC0) == 0x80:
+            cut += 1
+    return value[:cut] + TRUNCATION_MARKER.encode()
+
+
+def truncate_column(column: pa.Array, max_cell_bytes: int) -> pa.Array:
+    """Truncate the string or binary values longer than ``max_cell_bytes`` bytes.
+
+    Truncated values end with the ``TRUNCATION_MARKER`` and are longer than ``max_cell_bytes``
+    bytes, while the other values are untouched, so they are never longer.
+    Long values are found with compute kernels, and as they are rare in practice, only they are
+    cut one by one.
+    """
+    if not _is_truncatable(column.type):
+        return column
+    too_long = pc.fill_null(pc.greater(pc.binary_length(column), max_cell_bytes), False)
+    if not pc.any(too_long).as_py():
+        return column
+
+    is_string = pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+    binary_type = pa.large_binary() if pa.types.is_large_string(column.type) else pa.binary()
+    values = pc.filter(column, too_long).cast(binary_type) if is_string else pc.filter(column, too_long)
+    replacements = pa.array(
+        [_truncate_value(v.as_py(), max_cell_bytes, is_string) for v in values], type=values.type
+    )
+    if is_string:
+        replacements = replacements.cast(column.type)
+    return pc.replace_with_mask(column, too_long, replacements)
+
+
+def truncate_cells(batch: pa.RecordBatch, max_cell_bytes: int) -> pa.RecordBatch:
+    """Truncate the long string and binary values of a record batch, marking the truncated fields."""
+    return pa.RecordBatch.from_arrays(
+        [truncate_column(column, max_cell_bytes) for column in batch.columns],
+        schema=truncated_schema(batch.schema, max_cell_bytes),
+    )
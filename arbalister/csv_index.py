@@ -0,0 +1,239 @@
+import array
+import concurrent.futures
+import dataclasses
+import hashlib
+import mmap
+import os
+import pathlib
+import re
+import threading
+from typing import Self
+
+import pyarrow as pa
+
+from . import cache as cache
+
+# Number of rows between two recorded byte offsets
+DEFAULT_STRIDE = 4096
+# Size of the blocks in which newlines are counted at once
+_SCAN_BLOCK_SIZE = 1 << 16
+_QUOTE_OR_NEWLINE = re.compile(rb'["\n]')
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CsvIndex:
+    """A sparse index of the byte offsets of rows in a CSV file."""
+
+    # The header line, including its line terminator
+    header: bytes
+    stride: int
+    # Byte offset of every stride-th data row, starting with the first row after the header
+    offsets: array.array[int]
+    num_rows: int
+    # Byte size of the indexed file
+    size: int
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory used by the index."""
+        return len(self.header) + self.offsets.itemsize * len(self.offsets)
+
+    def byte_range(self, offset: int, count: int) -> tuple[int, int, int]:
+        """Return the byte range covering the given rows, and the index of its first row."""
+        if not self.offsets:
+            return self.size, self.size, offset
+        first = min(offset // self.stride, len(self.offsets) - 1)
+        last = -(-(offset + count) // self.stride)
+        start = self.offsets[first]
+        end = self.offsets[last] if last < len(self.offsets) else self.size
+        return start, end, first * self.stride
+
+    def to_table(self) -> pa.Table:
+        """Serialize the index as an Arrow table."""
+        metadata = {
+            "header": self.header,
+            "stride": str(self.stride),
+            "num_rows": str(self.num_rows),
+            "size": str(self.size),
+        }
+        return pa.table({"offset": pa.array(self.offsets, type=pa.int64())}).replace_schema_metadata(metadata)
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> Self:
+        """Deserialize the index from an Arrow table."""
+        metadata = table.schema.metadata
+        return cls(
+            header=metadata[b"header"],
+            stride=int(metadata[b"stride"]),
+            offsets=array.array("q", table.column("offset").to_pylist()),
+            num_rows=int(metadata[b"num_rows"]),
+            size=int(metadata[b"size"]),
+        )
+
+
+def _find_row_end(data: mmap.mmap, start: int) -> int:
+    """Return the offset after the first line terminator outside of quotes."""
+    in_quotes = False
+    for match in _QUOTE_OR_NEWLINE.finditer(data, start):
+        if match.group() == b'"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            return int(match.end())
+    return len(data)
+
+
+def _scan_row_offsets(data: mmap.mmap, start: int, stride: int) -> tuple[array.array[int], int]:
+    """Return the offsets of every stride-th row starting at the given offset, and the row breaks count.
+
+    Newlines are counted block by block, only falling back to a slower scan tracking quotes in
+    blocks where a quoted value may contain a newline.
+    """
+    size = len(data)
+    offsets = array.array("q", [start] if start < size else [])
+    num_breaks = 0
+    in_quotes = False
+
+    def on_break(pos: int) -> None:
+        nonlocal num_breaks
+        num_breaks += 1
+        if num_breaks % stride == 0 and pos + 1 < size:
+            offsets.append(pos + 1)
+
+    for block_start in range(start, size, _SCAN_BLOCK_SIZE):
+        block = data[block_start : block_start + _SCAN_BLOCK_SIZE]
+        if not in_quotes and b'"' not in block:
+            num_newlines = block.count(b"\n")
+            next_checkpoint = (num_breaks // stride + 1) * stride
+            if num_breaks + num_newlines < next_checkpoint:
+                num_breaks += num_newlines
+                continue
+            pos = block.find(b"\n")
+            while pos != -1:
+                on_break(block_start + pos)
+                pos = block.find(b"\n", pos + 1)
+            continue
+
+        for match in _QUOTE_OR_NEWLINE.finditer(block):
+            if match.group() == b'"':
+                in_quotes = not in_quotes
+            elif not in_quotes:
+                on_break(block_start + match.start())
+
+    return offsets, num_breaks
+
+
+def build_index(path: pathlib.Path | str, stride: int = DEFAULT_STRIDE) -> CsvIndex:
+    """Scan a memory mapped CSV file to record the byte offset of every stride-th row."""
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return CsvIndex(header=b"", stride=stride, offsets=array.array("q"), num_rows=0, size=0)
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end = _find_row_end(data, 0)
+            offsets, num_breaks = _scan_row_offsets(data, start=header_end, stride=stride)
+            # The last row may not end with a newline
+            trailing_row = header_end < size and data[size - 1 : size] != b"\n"
+            return CsvIndex(
+                header=data[:header_end],
+                stride=stride,
+                offsets=offsets,
+                num_rows=num_breaks + int(trailing_row),
+                size=size,
+            )
+
+
+class CsvIndexer:
+    """Build CSV indexes in the background and keep them in memory and on disk.
+
+    Indexes are persisted in the cache directory and discarded when the file changes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: pathlib.Path | str | None = None,
+        stride: int = DEFAULT_STRIDE,
+        max_bytes: int = 64 << 20,
+    ) -> None:
+        self._cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else None
+        self._stride = stride
+        self._indexes = cache.LruCache[cache.FileKey, CsvIndex](max_bytes=max_bytes)
+        self._pending: dict[cache.FileKey, concurrent.futures.Future[CsvIndex]] = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="arbalister-csv-index"
+        )
+
+    def _sidecar(self, key: cache.FileKey) -> pathlib.Path | None:
+        if self._cache_dir is None:
+            return None
+        return self._cache_dir / f"{hashlib.sha256(key.path.encode()).hexdigest()}.arrow"
+
+    def _load(self, key: cache.FileKey) -> CsvIndex | None:
+        sidecar = self._sidecar(key)
+        if sidecar is None or not sidecar.exists():
+            return None
+        try:
+            with pa.memory_map(str(sidecar)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        metadata = table.schema.metadata or {}
+        if metadata.get(b"file_key") != repr(key).encode():
+            return None
+        index = CsvIndex.from_table(table)
+        return index if index.stride == self._stride else None
+
+    def _save(self, key: cache.FileKey, index: CsvIndex) -> None:
+        sidecar = self._sidecar(key)
+        if sidecar is None:
+            return
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        table = index.to_table()
+        table = table.replace_schema_metadata({**table.schema.metadata, b"file_key": repr(key).encode()})
+        tmp = sidecar.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, sidecar)
+
+    def _build(self, key: cache.FileKey) -> CsvIndex:
+        try:
+            index = build_index(key.path, stride=self._stride)
+            self._indexes.put(key, index, nbytes=index.nbytes)
+            try:
+                self._save(key, index)
+            except OSError:
+                pass
+            return index
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def get(self, path: pathlib.Path | str, wait: bool = False) -> CsvIndex | None:
+        """Return the index of the file, or None if it is still being built in the background."""
+        key = cache.FileKey.from_path(path)
+        if (index := self._indexes.get(key)) is not None:
+            return index
+        if (index := self._load(key)) is not None:
+            self._indexes.put(key, index, nbytes=index.nbytes)
+            return index
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._build, key)
+                self._pending[key] = future
+        return future.result() if wait else None
+
+
+_indexer = CsvIndexer()
+
+
+def get_indexer() -> CsvIndexer:
+    """Return the CSV indexer used by the CSV readers."""
+    return _indexer
+
+
+def set_indexer(indexer: CsvIndexer) -> None:
+    """Set the CSV indexer used by the CSV readers."""
+    global _indexer
+    _indexer = indexer
@@ -0,0 +1,254 @@
+import collections
+import concurrent.futures
+import dataclasses
+import fnmatch
+import os
+import pathlib
+import time
+from typing import Any, Iterator
+
+import datafusion as dn
+import pyarrow as pa
+
+from . import arrow as abw
+from . import cache as cache
+from . import file_format as ff
+
+# Characters making the file name of a URL path a glob pattern
+GLOB_CHARACTERS = frozenset("*?[")
+# Formats whose files can be read together as one table
+DATASET_FORMATS = frozenset({ff.FileFormat.Parquet})
+# Number of threads reading the footers of the dataset files
+FOOTER_READ_THREADS = 16
+# DataFusion before 51 fails scanning partition directories next to files of other layouts
+SKIPS_OTHER_LAYOUTS = int(dn.__version__.split(".")[0]) >= 51
+# Coarsest resolution of the modification times of directories, telling apart later changes
+MTIME_RESOLUTION_NS = 2_000_000_000
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DatasetFile:
+    """A file of a dataset and the values of its partition columns."""
+
+    file: cache.FileKey
+    # Values from the ``column=value`` directories of the file path, in partition column order
+    partition_values: tuple[str, ...] = ()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Dataset:
+    """The files of a directory, or matching a file name pattern, read as one table.
+
+    Files are listed as DataFusion listing tables do, so that rows read file by file are in the
+    same order as rows scanned by DataFusion: sorted by path, looking into the ``column=value``
+    partition directories only.
+    """
+
+    # The directory of the files
+    root: pathlib.Path
+    # Pattern of the file names, such as ``part-*.parquet``
+    pattern: str
+    file_format: ff.FileFormat
+    partition_columns: tuple[str, ...]
+    files: tuple[DatasetFile, ...]
+    # Latest modification time of the files and listed directories
+    mtime_ns: int
+
+    @property
+    def table_path(self) -> str:
+        """The path of the dataset as a DataFusion listing table."""
+        if self.pattern == f"*.{self.file_format.value}":
+            return f"{self.root}/"
+        return str(self.root / self.pattern)
+
+    @property
+    def key(self) -> cache.FileKey:
+        """Identify the version of the dataset, which changes when a file is added, removed, or changed."""
+        return cache.FileKey(
+            path=str(self.root / self.pattern),
+            mtime_ns=self.mtime_ns,
+            size=sum(f.file.size for f in self.files),
+        )
+
+    @property
+    def table_options(self) -> dict[str, Any]:
+        """The options registering the dataset as a DataFusion table."""
+        return {
+            "file_extension": f".{self.file_format.value}",
+            "table_partition_cols": self.partition_columns,
+        }
+
+
+def is_dataset(path: pathlib.Path) -> bool:
+    """Return whether the path is a directory or a file name pattern, rather than a single file."""
+    return path.is_dir() or not GLOB_CHARACTERS.isdisjoint(path.name)
+
+
+def _walk(
+    directory: pathlib.Path, segments: tuple[str, ...]
+) -> Iterator[tuple[tuple[str, ...], os.DirEntry[str]]]:
+    """Yield the files under a directory and partition directories, with their partition segments."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                # DataFusion ignores other subdirectories, such as temporary outputs
+                if "=" in entry.name:
+                    yield (*segments, entry.name), entry
+                    yield from _walk(pathlib.Path(entry.path), (*segments, entry.name))
+            elif entry.is_file():
+                yield segments, entry
+
+
+def _parse_path(path: pathlib.Path) -> tuple[pathlib.Path, str, ff.FileFormat]:
+    """Return the directory, file name pattern, and format of the files of a dataset path."""
+    if path.is_dir():
+        return path, f"*.{ff.FileFormat.Parquet.value}", ff.FileFormat.Parquet
+    if not GLOB_CHARACTERS.isdisjoint(str(path.parent)):
+        raise ValueError("Patterns are only supported in file names")
+    if not path.suffix:
+        # Such as ``part-*``, which DataFusion matches along with the default file extension
+        return path.parent, f"{path.name}.{ff.FileFormat.Parquet.value}", ff.FileFormat.Parquet
+    return path.parent, path.name, ff.FileFormat.from_filename(path)
+
+
+def _has_other_files(root: pathlib.Path, pattern: str, partition_columns: tuple[str, ...]) -> bool:
+    """Return whether files matching the pattern are outside the partition directories of the columns."""
+    for file in root.rglob(pattern):
+        parts = file.relative_to(root).parent.parts
+        if any("=" not in s for s in parts) or tuple(s.partition("=")[0] for s in parts) != partition_columns:
+            return True
+    return False
+
+
+def _list(path: pathlib.Path) -> tuple[Dataset, tuple[tuple[str, int], ...]]:
+    """List the files of a dataset, along with the modification times of the listed directories."""
+    root, pattern, file_format = _parse_path(path)
+    if file_format not in DATASET_FORMATS:
+        raise ValueError(f"Datasets of {file_format.value} files are not supported")
+
+    directories = [(str(root), root.stat().st_mtime_ns)]
+    found: list[tuple[tuple[str, ...], os.DirEntry[str]]] = []
+    for segments, entry in _walk(root, ()):
+        if entry.is_dir():
+            directories.append((entry.path, entry.stat().st_mtime_ns))
+        elif fnmatch.fnmatchcase(entry.name, pattern):
+            found.append((segments, entry))
+    if not found:
+        raise ValueError(f"No {file_format.value} files in {path}")
+
+    layouts = collections.Counter(tuple(s.partition("=")[0] for s in segments) for segments, _ in found)
+    partition_columns = layouts.most_common(1)[0][0]
+    if partition_columns and not SKIPS_OTHER_LAYOUTS and _has_other_files(root, pattern, partition_columns):
+        raise ValueError(
+            f"Files outside the {'/'.join(partition_columns)} partition directories of {path}"
+            f" are only skipped from DataFusion 51, found {dn.__version__}"
+        )
+
+    mtime_ns = max(m for _, m in directories)
+    files: list[tuple[str, DatasetFile]] = []
+    for segments, entry in found:
+        if tuple(s.partition("=")[0] for s in segments[: len(partition_columns)]) != partition_columns:
+            continue
+        stat = entry.stat()
+        mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+        dataset_file = DatasetFile(
+            file=cache.FileKey(path=entry.path, mtime_ns=stat.st_mtime_ns, size=stat.st_size),
+            partition_values=tuple(s.partition("=")[2] for s in segments[: len(partition_columns)]),
+        )
+        files.append(("/".join((*segments, entry.name)), dataset_file))
+    files.sort(key=lambda f: f[0])
+
+    dataset = Dataset(
+        root=root,
+        pattern=pattern,
+        file_format=file_format,
+        partition_columns=partition_columns,
+        files=tuple(f for _, f in files),
+        mtime_ns=mtime_ns,
+    )
+    return dataset, tuple(directories)
+
+
+# Listings of the datasets and the modification times of their directories, so that chunk requests
+# only stat the directories rather than every file
+_LISTINGS = cache.LruCache[str, tuple[Dataset, tuple[tuple[str, int], ...]]](max_bytes=64 << 20)
+
+
+def discover(path: pathlib.Path) -> Dataset:
+    """List the files of a directory or file name pattern, and their partition columns.
+
+    Partition columns are the names of the ``column=value`` directories shared by most files,
+    such as ``year=2024/month=01/part-0.parquet``, and files of other layouts are skipped.
+    The listing is reused until a file is added to, removed from, or renamed in one of its
+    directories, so files rewritten in place are not seen until then.
+    Raise a ValueError if the dataset is not supported, or has no files.
+    """
+    if (listing := _LISTINGS.get(str(path))) is not None:
+        dataset, directories = listing
+        try:
+            if all(os.stat(d).st_mtime_ns == mtime_ns for d, mtime_ns in directories):
+                return dataset
+        except FileNotFoundError:
+            pass
+    dataset, directories = _list(path)
+    # Directories changed within the resolution of modification times could change again unnoticed
+    if time.time_ns() - max(m for _, m in directories) > MTIME_RESOLUTION_NS:
+        _LISTINGS.put(str(path), (dataset, directories), nbytes=256 * (len(dataset.files) + len(directories)))
+    return dataset
+
+
+# Row counts of the dataset files, so that a chunk only opens the files covering its rows
+_ROW_COUNTS = cache.LruCache[cache.FileKey, list[int]](max_bytes=16 << 20)
+
+
+def row_counts(dataset: Dataset) -> list[int]:
+    """Return the number of rows of each file, read from their footers and cached until a file changes."""
+
+    def read() -> list[int]:
+        with concurrent.futures.ThreadPoolExecutor(FOOTER_READ_THREADS) as pool:
+            metadata = pool.map(lambda f: abw.read_parquet_metadata(f.file.path), dataset.files)
+            return [m.num_rows for m in metadata]
+
+    return _ROW_COUNTS.get_or_insert(dataset.key, read, nbytes=lambda counts: 8 * (len(counts) + 1))
+
+
+def read_stats(dataset: Dataset) -> abw.FileStats:
+    """Return the number of rows of the dataset from the file footers."""
+    return abw.FileStats(num_rows=sum(row_counts(dataset)))
+
+
+def read_window(dataset: Dataset, offset: int, count: int, schema: pa.Schema) -> pa.Table | None:
+    """Read a window of rows from the files covering it only, or None if the files disagree with the schema.
+
+    The partition columns of the schema hold the values from the directories of each file.
+    """
+    counts = row_counts(dataset)
+    file_ids, start = abw.row_window_parts(counts, offset=offset, count=count)
+    file_schema = pa.schema([f for f in schema if f.name not in dataset.partition_columns])
+    read_file = abw.get_window_reader(dataset.file_format)
+    assert read_file is not None
+
+    pieces: list[pa.Table] = []
+    for i in file_ids:
+        dataset_file = dataset.files[i]
+        file_offset = max(offset - start, 0)
+        file_count = min(offset + count - start, counts[i]) - file_offset
+        start += counts[i]
+        try:
+            table = read_file(
+                dataset_file.file.path, offset=file_offset, count=file_count, schema=file_schema
+            )
+        except (KeyError, pa.ArrowInvalid):
+            # Files missing some columns are left to DataFusion, which merges their schemas
+            table = None
+        if table is None:
+            return None
+        values = dict(zip(dataset.partition_columns, dataset_file.partition_values, strict=True))
+        columns = [
+            pa.array([values[name]] * table.num_rows, pa.string()) if name in values else table[name]
+            for name in schema.names
+        ]
+        pieces.append(pa.Table.from_arrays(columns, names=schema.names).cast(schema))
+    if not pieces:
+        return schema.empty_table()
+    return pa.concat_tables(pieces)
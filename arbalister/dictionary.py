@@ -0,0 +1,79 @@
+from typing import Self
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# String columns with at most this ratio of distinct values in the sample get dictionary encoded
+MAX_DISTINCT_RATIO = 0.5
+# Number of rows of the first record batch used to estimate the cardinality of the columns
+SAMPLE_ROWS = 8192
+
+
+def _is_string(data_type: pa.DataType) -> bool:
+    return bool(
+        pa.types.is_string(data_type)
+        or pa.types.is_large_string(data_type)
+        or pa.types.is_string_view(data_type)
+    )
+
+
+def low_cardinality_columns(sample: pa.RecordBatch, max_ratio: float = MAX_DISTINCT_RATIO) -> list[str]:
+    """Return the string columns of the sample with few distinct values."""
+    names: list[str] = []
+    for field, column in zip(sample.schema, sample.columns, strict=True):
+        if not _is_string(field.type):
+            continue
+        num_values = len(column) - column.null_count
+        if num_values > 0 and pc.count_distinct(column).as_py() <= max_ratio * num_values:
+            names.append(field.name)
+    return names
+
+
+class DictionaryEncoder:
+    """Dictionary encode string columns of consecutive record batches of a stream.
+
+    The dictionary of each column only grows, new values being appended at the end, so that an
+    IPC writer with ``emit_dictionary_deltas`` only sends the new values with each batch.
+    """
+
+    def __init__(self, schema: pa.Schema, columns: list[str]) -> None:
+        self._dictionaries: dict[str, pa.Array] = {
+            name: pa.array([], type=schema.field(name).type) for name in columns
+        }
+        self._schema = pa.schema(
+            [
+                field.with_type(pa.dictionary(pa.int32(), field.type))
+                if field.name in self._dictionaries
+                else field
+                for field in schema
+            ],
+            metadata=schema.metadata,
+        )
+
+    @classmethod
+    def from_sample(cls, schema: pa.Schema, batch: pa.RecordBatch) -> Self:
+        """Build an encoder of the low cardinality columns of the first rows of the batch."""
+        return cls(schema, low_cardinality_columns(batch.slice(0, SAMPLE_ROWS)))
+
+    @property
+    def schema(self) -> pa.Schema:
+        """The schema of the encoded record batches."""
+        return self._schema
+
+    def _encode_column(self, name: str, column: pa.Array) -> pa.DictionaryArray:
+        dictionary = self._dictionaries[name]
+        values = column.drop_null()
+        new_values = pc.unique(values.filter(pc.invert(pc.is_in(values, value_set=dictionary))))
+        if len(new_values) > 0:
+            dictionary = pa.concat_arrays([dictionary, new_values])
+            self._dictionaries[name] = dictionary
+        indices = pc.index_in(column, value_set=dictionary).cast(pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+    def encode(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """Return the batch with its low cardinality columns dictionary encoded."""
+        columns = [
+            self._encode_column(name, column) if name in self._dictionaries else column
+            for name, column in zip(batch.schema.names, batch.columns, strict=True)
+        ]
+        return pa.RecordBatch.from_arrays(columns, schema=self._schema)
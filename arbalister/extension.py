@@ -0,0 +1,58 @@
+from typing import Any
+
+import jupyter_server.base.handlers
+import jupyter_server.serverapp
+import tornado.httputil
+from jupyter_server.utils import url_path_join
+
+# URL patterns of the routes, relative to the server base URL, and the name of their handler class
+# in the ``routes`` module
+ROUTES: list[tuple[str, str]] = [
+    (r"arrow/stream/([^?]*)", "IpcRouteHandler"),
+    (r"arrow/batch/([^?]*)", "BatchRouteHandler"),
+    (r"arrow/cell/([^?]*)", "CellRouteHandler"),
+    (r"arrow/stats/([^?]*)", "StatsRouteHandler"),
+    (r"arrow/summary/([^?]*)", "SummaryRouteHandler"),
+    (r"file/info/([^?]*)", "FileInfoRouteHandler"),
+    (r"arbalister/metrics", "MetricsRouteHandler"),
+]
+
+# Application setting holding the state shared by the handlers once created
+HANDLER_KWARGS_SETTING = "arbalister_handler_kwargs"
+
+
+class DeferredRouteHandler(jupyter_server.base.handlers.APIHandler):
+    """Stand in for a route handler, importing the data engines on the first request.
+
+    Tornado instantiates the registered class for every request, so this returns an instance of
+    the actual handler class of the ``routes`` module instead.
+    The state shared by the handlers, such as the DataFusion session contexts, is created with
+    the first request and reused by the next ones.
+    """
+
+    handler_name = ""
+
+    def __new__(
+        cls,
+        application: jupyter_server.serverapp.ServerWebApplication,
+        request: tornado.httputil.HTTPServerRequest,
+        **kwargs: Any,
+    ) -> Any:
+        """Return the actual route handler of the request."""
+        from . import routes
+
+        handler_kwargs = application.settings.get(HANDLER_KWARGS_SETTING)
+        if handler_kwargs is None:
+            handler_kwargs = routes.make_handler_kwargs(application)
+            application.settings[HANDLER_KWARGS_SETTING] = handler_kwargs
+        return getattr(routes, cls.handler_name)(application, request, **handler_kwargs)
+
+
+def setup_deferred_route_handlers(web_app: jupyter_server.serverapp.ServerWebApplication) -> None:
+    """Register the routes without importing the data engines until they receive a request."""
+    base_url = web_app.settings["base_url"]
+    handlers = [
+        (url_path_join(base_url, pattern), type(name, (DeferredRouteHandler,), {"handler_name": name}))
+        for pattern, name in ROUTES
+    ]
+    web_app.add_handlers(".*$", handlers)  # type: ignore[no-untyped-call]
@@ -0,0 +1,283 @@
+import dataclasses
+import operator
+import re
+from typing import Any, Callable, Literal
+
+import datafusion as dn
+
+CompareOp = Literal["==", "!=", "<", "<=", ">", ">="]
+Scalar = bool | int | float | str | None
+
+
+class FilterSyntaxError(ValueError):
+    """Raised when a filter expression cannot be parsed."""
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Column:
+    """A reference to a column by name."""
+
+    name: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Value:
+    """A literal value."""
+
+    value: Scalar
+
+
+Operand = Column | Value
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Compare:
+    """A binary comparison between two operands."""
+
+    op: CompareOp
+    left: Operand
+    right: Operand
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class IsNull:
+    """A null check on an operand."""
+
+    operand: Operand
+    negated: bool = False
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class And:
+    """A logical conjunction."""
+
+    left: "Expr"
+    right: "Expr"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Or:
+    """A logical disjunction."""
+
+    left: "Expr"
+    right: "Expr"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Not:
+    """A logical negation."""
+
+    operand: "Expr"
+
+
+Expr = Compare | IsNull | And | Or | Not
+
+_TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+        |'(?P<string>(?:[^']|'')*)'
+        |`(?P<quoted>(?:[^`]|``)*)`
+        |(?P<op>==|!=|<=|>=|<|>|=|\(|\))
+        |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )
+    """,
+    re.VERBOSE,
+)
+_KEYWORDS = {"and", "or", "not", "is", "null", "true", "false"}
+
+
+def _tokenize(text: str) -> list[tuple[str, str]]:
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FilterSyntaxError(f"Unexpected character at position {pos} in filter {text!r}")
+        kind = match.lastgroup
+        assert kind is not None
+        value = match.group(kind)
+        if kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """A recursive descent parser of filter expressions.
+
+    The grammar, by increasing precedence, is::
+
+        expr       := and_expr ("or" and_expr)*
+        and_expr   := not_expr ("and" not_expr)*
+        not_expr   := "not" not_expr | "(" expr ")" | comparison
+        comparison := operand ("is" ["not"] "null" | op operand)
+        operand    := identifier | `quoted identifier` | 'string' | number | true | false | null
+    """
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._tokens = _tokenize(text)
+        self._pos = 0
+
+    def _peek(self) -> tuple[str, str] | None:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self) -> tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError(f"Unexpected end of filter {self._text!r}")
+        self._pos += 1
+        return token
+
+    def _accept(self, kind: str, value: str) -> bool:
+        if self._peek() == (kind, value):
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: str) -> None:
+        if not self._accept(kind, value):
+            raise FilterSyntaxError(f"Expected {value!r} in filter {self._text!r}")
+
+    def parse(self) -> Expr:
+        expr = self._expr()
+        if (token := self._peek()) is not None:
+            raise FilterSyntaxError(f"Unexpected {token[1]!r} in filter {self._text!r}")
+        return expr
+
+    def _expr(self) -> Expr:
+        expr = self._and_expr()
+        while self._accept("keyword", "or"):
+            expr = Or(expr, self._and_expr())
+        return expr
+
+    def _and_expr(self) -> Expr:
+        expr = self._not_expr()
+        while self._accept("keyword", "and"):
+            expr = And(expr, self._not_expr())
+        return expr
+
+    def _not_expr(self) -> Expr:
+        if self._accept("keyword", "not"):
+            return Not(self._not_expr())
+        if self._accept("op", "("):
+            expr = self._expr()
+            self._expect("op", ")")
+            return expr
+        return self._comparison()
+
+    def _comparison(self) -> Expr:
+        left = self._operand()
+        if self._accept("keyword", "is"):
+            negated = self._accept("keyword", "not")
+            self._expect("keyword", "null")
+            return IsNull(left, negated=negated)
+        kind, op = self._next()
+        if kind != "op" or op in ("(", ")"):
+            raise FilterSyntaxError(f"Expected a comparison operator, got {op!r} in filter {self._text!r}")
+        return Compare("==" if op == "=" else op, left, self._operand())  # type: ignore[arg-type]
+
+    def _operand(self) -> Operand:
+        kind, value = self._next()
+        match kind:
+            case "word":
+                return Column(value)
+            case "quoted":
+                return Column(value.replace("``", "`"))
+            case "string":
+                return Value(value.replace("''", "'"))
+            case "number":
+                return Value(float(value) if any(c in value for c in ".eE") else int(value))
+            case "keyword" if value in ("true", "false"):
+                return Value(value == "true")
+            case "keyword" if value == "null":
+                return Value(None)
+        raise FilterSyntaxError(f"Expected a column or a value, got {value!r} in filter {self._text!r}")
+
+
+def parse(text: str) -> Expr:
+    """Parse a filter expression such as ``age >= 18 and (city == 'Paris' or city is null)``."""
+    return _Parser(text).parse()
+
+
+def columns(expr: Expr) -> set[str]:
+    """Return the names of the columns referenced in the expression."""
+    match expr:
+        case Compare(left=left, right=right):
+            return {o.name for o in (left, right) if isinstance(o, Column)}
+        case IsNull(operand=operand):
+            return {operand.name} if isinstance(operand, Column) else set()
+        case And(left=left, right=right) | Or(left=left, right=right):
+            return columns(left) | columns(right)
+        case Not(operand=operand):
+            return columns(operand)
+
+
+def _operand_to_datafusion(operand: Operand) -> dn.Expr:
+    if isinstance(operand, Column):
+        return dn.col(operand.name)
+    return dn.lit(operand.value)
+
+
+_DATAFUSION_COMPARE: dict[CompareOp, Callable[[dn.Expr, dn.Expr], dn.Expr]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def to_datafusion(expr: Expr) -> dn.Expr:
+    """Compile the expression into a DataFusion expression."""
+    match expr:
+        case Compare(op=op, left=left, right=right):
+            return _DATAFUSION_COMPARE[op](_operand_to_datafusion(left), _operand_to_datafusion(right))
+        case IsNull(operand=operand, negated=negated):
+            out = _operand_to_datafusion(operand)
+            return out.is_not_null() if negated else out.is_null()
+        case And(left=left, right=right):
+            return to_datafusion(left) & to_datafusion(right)
+        case Or(left=left, right=right):
+            return to_datafusion(left) | to_datafusion(right)
+        case Not(operand=operand):
+            return ~to_datafusion(operand)
+
+
+def quote_identifier(name: str) -> str:
+    """Quote an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _operand_to_sql(operand: Operand, params: list[Any]) -> str:
+    if isinstance(operand, Column):
+        return quote_identifier(operand.name)
+    if operand.value is None:
+        return "NULL"
+    params.append(operand.value)
+    return "?"
+
+
+def to_sql(expr: Expr) -> tuple[str, list[Any]]:
+    """Compile the expression into an SQL predicate with positional parameters."""
+    params: list[Any] = []
+
+    def compile(expr: Expr) -> str:
+        match expr:
+            case Compare(op=op, left=left, right=right):
+                sql_op = "=" if op == "==" else op
+                return f"({_operand_to_sql(left, params)} {sql_op} {_operand_to_sql(right, params)})"
+            case IsNull(operand=operand, negated=negated):
+                return f"({_operand_to_sql(operand, params)} IS {'NOT ' if negated else ''}NULL)"
+            case And(left=left, right=right):
+                return f"({compile(left)} AND {compile(right)})"
+            case Or(left=left, right=right):
+                return f"({compile(left)} OR {compile(right)})"
+            case Not(operand=operand):
+                return f"(NOT {compile(operand)})"
+
+    return compile(expr), params
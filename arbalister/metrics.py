@@ -0,0 +1,176 @@
+import bisect
+import contextlib
+import threading
+import time
+from typing import Iterator
+
+# Upper bounds in seconds of the buckets of the duration histograms
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestTimings:
+    """Time spent in each phase of a request, with the number of rows and bytes sent.
+
+    Phases are timed from the event loop and the query thread pool alike, and a phase entered
+    several times, such as executing each record batch of a query, accumulates its durations.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._durations: dict[str, float] = {}
+        self._rows = 0
+        self._bytes = 0
+
+    @property
+    def durations(self) -> dict[str, float]:
+        """The total duration in seconds of each phase, in the order they were first entered."""
+        with self._lock:
+            return dict(self._durations)
+
+    @property
+    def rows(self) -> int:
+        """The number of rows sent."""
+        return self._rows
+
+    @property
+    def bytes(self) -> int:
+        """The number of body bytes sent."""
+        return self._bytes
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add a duration to a phase."""
+        with self._lock:
+            self._durations[phase] = self._durations.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of the context manager in the given phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def iterate[T](self, phase: str, items: Iterator[T]) -> Iterator[T]:
+        """Yield the items, timing how long each takes to produce in the given phase.
+
+        Closing the returned iterator closes ``items`` too, to release the resources of a query.
+        """
+        try:
+            while True:
+                with self.phase(phase):
+                    item = next(items, None)
+                if item is None:
+                    return
+                yield item
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    def count(self, rows: int = 0, nbytes: int = 0) -> None:
+        """Add to the number of rows and bytes sent."""
+        with self._lock:
+            self._rows += rows
+            self._bytes += nbytes
+
+    def server_timing(self) -> str:
+        """Format the phase durations as a ``Server-Timing`` header value, in milliseconds."""
+        return ", ".join(f"{phase};dur={seconds * 1e3:.2f}" for phase, seconds in self.durations.items())
+
+
+class Histogram:
+    """A distribution of durations in cumulative buckets, as Prometheus histograms."""
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        # The last count is for the values above all buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        """The number of observed values."""
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        """Add a value to the distribution."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        """Return the Prometheus text lines of the histogram with the given labels."""
+        lines: list[str] = []
+        cumulated = 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts, strict=True):
+            cumulated += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulated}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulated}")
+        return lines
+
+
+class Metrics:
+    """Aggregate the timings of the requests of each route and file format.
+
+    Metrics are rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._requests: dict[tuple[str, str, int], int] = {}
+        self._durations: dict[tuple[str, str], Histogram] = {}
+        self._phases: dict[tuple[str, str, str], Histogram] = {}
+        self._rows: dict[tuple[str, str], int] = {}
+        self._bytes: dict[tuple[str, str], int] = {}
+
+    def observe(
+        self, route: str, file_format: str, status: int, duration: float, timings: RequestTimings
+    ) -> None:
+        """Record a finished request."""
+        key = (route, file_format)
+        with self._lock:
+            self._requests[(*key, status)] = self._requests.get((*key, status), 0) + 1
+            self._durations.setdefault(key, Histogram(self._buckets)).observe(duration)
+            for phase, seconds in timings.durations.items():
+                self._phases.setdefault((*key, phase), Histogram(self._buckets)).observe(seconds)
+            self._rows[key] = self._rows.get(key, 0) + timings.rows
+            self._bytes[key] = self._bytes.get(key, 0) + timings.bytes
+
+    def render(self) -> str:
+        """Return the metrics in the Prometheus text format."""
+        lines: list[str] = []
+
+        def labels(route: str, file_format: str) -> str:
+            return f'route="{route}",format="{file_format}"'
+
+        with self._lock:
+            lines += [
+                "# HELP arbalister_requests_total Number of finished requests.",
+                "# TYPE arbalister_requests_total counter",
+            ]
+            for (route, file_format, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'arbalister_requests_total{{{labels(route, file_format)},status="{status}"}} {count}'
+                )
+            lines += [
+                "# HELP arbalister_request_duration_seconds Duration of the requests.",
+                "# TYPE arbalister_request_duration_seconds histogram",
+            ]
+            for (route, file_format), histogram in sorted(self._durations.items()):
+                lines += histogram.render("arbalister_request_duration_seconds", labels(route, file_format))
+            lines += [
+                "# HELP arbalister_phase_duration_seconds Time spent by requests in each phase.",
+                "# TYPE arbalister_phase_duration_seconds histogram",
+            ]
+            for (route, file_format, phase), histogram in sorted(self._phases.items()):
+                phase_labels = f'{labels(route, file_format)},phase="{phase}"'
+                lines += histogram.render("arbalister_phase_duration_seconds", phase_labels)
+            for name, counts, description in [
+                ("arbalister_rows_total", self._rows, "Number of rows sent."),
+                ("arbalister_bytes_total", self._bytes, "Number of body bytes sent."),
+            ]:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+                for (route, file_format), count in sorted(counts.items()):
+                    lines.append(f"{name}{{{labels(route, file_format)}}} {count}")
+        return "\n".join(lines) + "\n"
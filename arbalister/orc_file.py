@@ -0,0 +1,202 @@
+import dataclasses
+import enum
+import pathlib
+import zlib
+from typing import Iterator
+
+import pyarrow as pa
+
+MAGIC = b"ORC"
+# Size of the end of the file read at once, which usually covers the postscript and footer
+TAIL_BYTES = 1 << 16
+
+
+class Compression(enum.IntEnum):
+    """Compression kinds of the ORC postscript."""
+
+    NONE = 0
+    ZLIB = 1
+    SNAPPY = 2
+    LZO = 3
+    LZ4 = 4
+    ZSTD = 5
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class OrcStripe:
+    """Location of a stripe of rows in an ORC file."""
+
+    # Byte offset of the stripe in the file
+    offset: int
+    # Byte size of the stripe, including its indexes and footer
+    size: int
+    # Index of the first row of the stripe in the file
+    row_offset: int
+    num_rows: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class OrcFileIndex:
+    """The stripe locations of an ORC file."""
+
+    stripes: list[OrcStripe]
+
+    @property
+    def num_rows(self) -> int:
+        """Total number of rows in the file."""
+        return sum(s.num_rows for s in self.stripes)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Read a protobuf varint, returning its value and the position after it."""
+    shift = 0
+    acc = 0
+    while True:
+        value = data[pos]
+        pos += 1
+        acc |= (value & 0x7F) << shift
+        shift += 7
+        if not value & 0x80:
+            return acc, pos
+
+
+def _iter_fields(message: bytes) -> Iterator[tuple[int, int | bytes]]:
+    """Yield the number and value of the varint and length delimited fields of a protobuf message."""
+    pos = 0
+    while pos < len(message):
+        key, pos = _read_varint(message, pos)
+        wire_type = key & 0x7
+        match wire_type:
+            case 0:
+                value, pos = _read_varint(message, pos)
+                yield key >> 3, value
+            case 1:
+                pos += 8
+            case 2:
+                size, pos = _read_varint(message, pos)
+                yield key >> 3, message[pos : pos + size]
+                pos += size
+            case 5:
+                pos += 4
+            case _:
+                raise ValueError(f"Unsupported protobuf wire type {wire_type} in ORC metadata")
+
+
+def _read_lz4_length(data: bytes, pos: int, length: int) -> tuple[int, int]:
+    """Read the extension bytes of an LZ4 literal or match length, returning it and the next position."""
+    if length == 15:
+        while True:
+            value = data[pos]
+            pos += 1
+            length += value
+            if value != 255:
+                break
+    return length, pos
+
+
+def _lz4_decompress(data: bytes) -> bytes:
+    """Decompress an LZ4 block, whose decompressed size is only known once decoded.
+
+    A block is a series of sequences, each made of literal bytes followed by a match copying
+    bytes already decompressed, except for the last sequence which only has literals.
+    """
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        token = data[pos]
+        literal_length, pos = _read_lz4_length(data, pos + 1, token >> 4)
+        out += data[pos : pos + literal_length]
+        pos += literal_length
+        if pos >= len(data):
+            break
+        offset = int.from_bytes(data[pos : pos + 2], "little")
+        match_length, pos = _read_lz4_length(data, pos + 2, token & 0xF)
+        match_length += 4
+        if offset == 0 or offset > len(out):
+            raise ValueError("Invalid LZ4 match offset in ORC metadata")
+        start = len(out) - offset
+        # Matches can overlap the bytes they produce, which repeats the last ``offset`` bytes
+        while match_length > 0:
+            piece = out[start : start + min(offset, match_length)]
+            out += piece
+            start += len(piece)
+            match_length -= len(piece)
+    return bytes(out)
+
+
+def _decompress(data: bytes, compression: Compression) -> bytes | None:
+    """Decompress an ORC metadata stream, or return None if the codec is not supported.
+
+    Compressed streams are made of chunks prefixed by a three bytes header holding their size and
+    whether they were stored uncompressed.
+    """
+    if compression == Compression.NONE:
+        return data
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        header = int.from_bytes(data[pos : pos + 3], "little")
+        chunk = data[pos + 3 : pos + 3 + (header >> 1)]
+        pos += 3 + (header >> 1)
+        if header & 1:
+            out += chunk
+            continue
+        match compression:
+            case Compression.ZLIB:
+                out += zlib.decompress(chunk, wbits=-15)
+            case Compression.SNAPPY:
+                # Snappy blocks start with their decompressed size
+                size, _ = _read_varint(chunk, 0)
+                out += pa.decompress(chunk, decompressed_size=size, codec="snappy", asbytes=True)
+            case Compression.ZSTD:
+                out += pa.input_stream(pa.py_buffer(chunk), compression="zstd").read()
+            case Compression.LZ4:
+                # Arrow needs the decompressed size, which ORC chunks do not record
+                out += _lz4_decompress(chunk)
+            case _:
+                return None
+    return bytes(out)
+
+
+def read_index(path: pathlib.Path | str) -> OrcFileIndex | None:
+    """Read the stripe locations and row counts from the footer of an ORC file.
+
+    An ORC file ends with a footer listing its stripes, followed by a postscript describing the
+    footer compression, and a last byte holding the postscript size.
+    Rows can therefore be located by reading the end of the file only.
+    Returns None if the footer is compressed with an unsupported codec.
+    """
+    with open(path, "rb") as file:
+        file_size = file.seek(0, 2)
+        tail_size = min(file_size, TAIL_BYTES)
+        file.seek(file_size - tail_size)
+        tail = file.read(tail_size)
+
+        postscript_size = tail[-1]
+        postscript = dict(_iter_fields(tail[-1 - postscript_size : -1]))
+        if postscript.get(8000) != MAGIC:
+            raise ValueError(f"Not an ORC file: {path}")
+        footer_size = int(postscript.get(1, 0))
+        compression = Compression(int(postscript.get(2, Compression.NONE)))
+
+        end = 1 + postscript_size + footer_size
+        if end > len(tail):
+            file.seek(file_size - end)
+            tail = file.read(end - len(tail)) + tail
+        footer = _decompress(tail[-end : -1 - postscript_size], compression)
+    if footer is None:
+        return None
+
+    stripes: list[OrcStripe] = []
+    row_offset = 0
+    for number, value in _iter_fields(footer):
+        if number != 3 or not isinstance(value, bytes):
+            continue
+        info = dict(_iter_fields(value))
+        num_rows = int(info.get(5, 0))
+        size = sum(int(info.get(i, 0)) for i in (2, 3, 4))
+        stripes.append(
+            OrcStripe(offset=int(info.get(1, 0)), size=size, row_offset=row_offset, num_rows=num_rows)
+        )
+        row_offset += num_rows
+    return OrcFileIndex(stripes=stripes)
@@ -1,19 +1,40 @@
+import asyncio
 import base64
+import concurrent.futures
 import dataclasses
+import datetime
+import email.utils
+import hashlib
 import os
 import pathlib
+import time
+import types
+from typing import Any, Callable, Hashable, Iterator
 
 import datafusion as dn
-import datafusion.functions as dnf
 import jupyter_server.base.handlers
 import jupyter_server.serverapp
 import pyarrow as pa
 import tornado
+import tornado.ioloop
+import tornado.iostream
 from jupyter_server.utils import url_path_join
 
+from . import __version__
 from . import arrow as abw
+from . import cache as cache
+from . import cells as cells
+from . import csv_index as csv_index
+from . import datasets as datasets
+from . import dictionary as dictionary
+from . import extension as extension
 from . import file_format as ff
+from . import filters as filters
+from . import metrics as metrics
 from . import params as params
+from . import summary as summary
+from . import tables as tables
+from . import tile_cache as tile_cache
 
 
 @dataclasses.dataclass(frozen=True, slots=True)
@@ -38,29 +59,592 @@ class CsvReadOptions:
 FileReadOptions = SqliteReadOptions | CsvReadOptions | Empty
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class QueryParams:
+    """Query parameter to filter and sort rows."""
+
+    # Filter expression, such as ``age >= 18 and (city == 'Paris' or city is null)``
+    filter: str | None = None
+    sort_by: str | None = None
+    descending: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the query leaves the rows untouched."""
+        return not self.filter and self.sort_by is None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DataFrameKey:
+    """Cache key of a DataFrame read from a given file version with given options."""
+
+    file: cache.FileKey
+    options: FileReadOptions
+    query: QueryParams = QueryParams()
+    # Whether the DataFrame scans partitions in parallel, in which case row order is arbitrary
+    parallel: bool = False
+
+
+def _is_sortable(data_type: pa.DataType) -> bool:
+    """Return whether DataFusion can sort rows by values of the type, which excludes maps."""
+    if pa.types.is_map(data_type):
+        return False
+    if pa.types.is_struct(data_type):
+        return all(_is_sortable(data_type.field(i).type) for i in range(data_type.num_fields))
+    if (
+        pa.types.is_list(data_type)
+        or pa.types.is_large_list(data_type)
+        or pa.types.is_fixed_size_list(data_type)
+    ):
+        return _is_sortable(data_type.value_type)
+    return True
+
+
+def has_total_order(schema: pa.Schema) -> bool:
+    """Return whether sorts by all the columns of the schema order any two different rows."""
+    return all(_is_sortable(field.type) for field in schema)
+
+
+def sort_exprs(schema: pa.Schema, sort_by: str, descending: bool) -> list[dn.expr.SortExpr]:
+    """Return the sort by a column, with the other columns breaking ties.
+
+    Sorts scanning several partitions put tied rows in a different order on every execution, so
+    that chunks of the same sort could repeat or skip rows.
+    Rows tied on every column are identical, so their order does not matter.
+    """
+    exprs = [dn.col(sort_by).sort(ascending=not descending, nulls_first=False)]
+    for field in schema:
+        # Null columns only hold equal values
+        if field.name != sort_by and _is_sortable(field.type) and not pa.types.is_null(field.type):
+            exprs.append(dn.col(field.name).sort(ascending=True, nulls_first=False))
+    return exprs
+
+
+def apply_query(df: dn.DataFrame, query: QueryParams) -> dn.DataFrame:
+    """Filter and sort the DataFrame, or raise a HTTP 400 error on invalid queries."""
+    predicate: filters.Expr | None = None
+    if query.filter:
+        try:
+            predicate = filters.parse(query.filter)
+        except filters.FilterSyntaxError as e:
+            raise tornado.web.HTTPError(400, str(e)) from e
+
+    referenced = filters.columns(predicate) if predicate is not None else set()
+    if query.sort_by is not None:
+        referenced.add(query.sort_by)
+    if unknown := referenced - set(df.schema().names):
+        raise tornado.web.HTTPError(400, f"Unknown columns {sorted(unknown)}")
+
+    if isinstance(df, dn.DataFrame):
+        if predicate is not None:
+            df = df.filter(filters.to_datafusion(predicate))
+        if query.sort_by is not None:
+            df = df.sort(*sort_exprs(df.schema(), query.sort_by, query.descending))
+    else:
+        # The SqliteDataFrame translates the query into SQL
+        if predicate is not None:
+            df = df.filter(predicate)
+        if query.sort_by is not None:
+            df = df.sort(query.sort_by, descending=query.descending)
+    return df
+
+
+DataFrameCache = cache.LruCache[DataFrameKey, dn.DataFrame]
+# Column summaries of a file version, by number of histogram bins and whether distinct counts are
+# estimated
+SummaryCache = cache.LruCache[tuple[DataFrameKey, int, bool], summary.TableSummary]
+
+# Codecs of the IPC record batch bodies supported by the Arrow IPC format
+IPC_CODECS = ("lz4", "zstd")
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class EncodingParams:
+    """Query parameter for the encoding of IPC record batches."""
+
+    # One of ``IPC_CODECS``, or ``none`` to ignore the codecs of the Accept header
+    compression: str | None = None
+    # Defaults to the codec default level
+    compression_level: int | None = None
+    # Dictionary encode the string columns with few distinct values
+    dictionary_encode: bool = False
+    # Truncate the string and binary values longer than this number of bytes
+    max_cell_bytes: int | None = None
+
+
+def accepted_codec(accept: str) -> str | None:
+    """Return the first supported codec listed in the Arrow stream media type of an Accept header."""
+    for media_range in accept.split(","):
+        media_type, *media_params = media_range.split(";")
+        if media_type.strip() != "application/vnd.apache.arrow.stream":
+            continue
+        for media_param in media_params:
+            name, _, value = media_param.partition("=")
+            if name.strip() != "codecs":
+                continue
+            for codec in value.strip().strip('"').split():
+                if codec in IPC_CODECS and pa.Codec.is_available(codec):
+                    return codec
+    return None
+
+
+# Nominal size of a lazy DataFrame that only holds a plan
+_LAZY_DATAFRAME_NBYTES = 1 << 10
+
+
+def _dataframe_nbytes(file_format: ff.FileFormat, file: cache.FileKey) -> int:
+    """Estimate the memory held by a DataFrame read from the given file."""
+    return abw.loaded_nbytes(file_format, file) or _LAZY_DATAFRAME_NBYTES
+
+
+class RequestCancelled(Exception):
+    """Raised to stop working on a request after its client disconnected."""
+
+
 class BaseRouteHandler(jupyter_server.base.handlers.APIHandler):
     """A base handler to share common methods."""
 
-    def initialize(self, context: dn.SessionContext) -> None:
+    # Label of the route in the metrics
+    route_name = ""
+
+    def initialize(
+        self,
+        tables: tables.TableRegistry,
+        parallel_tables: tables.TableRegistry,
+        dataframes: DataFrameCache,
+        executor: concurrent.futures.Executor,
+        tiles: tile_cache.TileCache | None = None,
+        summaries: SummaryCache | None = None,
+        cache_control: str = "private, no-cache",
+        compression_min_bytes: int = 0,
+        route_metrics: metrics.Metrics | None = None,
+    ) -> None:
         """Process custom constructor arguments."""
         super().initialize()
-        self.context = context
+        self.tables = tables
+        self.parallel_tables = parallel_tables
+        self.context = tables.context
+        self.parallel_context = parallel_tables.context
+        self.dataframes = dataframes
+        self.executor = executor
+        self.tiles = tiles
+        self.summaries = summaries
+        self.cache_control = cache_control
+        self.compression_min_bytes = compression_min_bytes
+        self.route_metrics = route_metrics
+        self.timings = metrics.RequestTimings()
+        # Set when the client disconnects, to stop working on a response nobody will read
+        self.cancelled = False
+        self._headers_flushed = False
+        # Datasets requested by directory or pattern, listed once per request
+        self._datasets: dict[str, datasets.Dataset | None] = {}
+
+    def write(self, chunk: str | bytes | dict[str, Any]) -> None:
+        """Write a chunk to the response buffer, counting the bytes sent."""
+        if isinstance(chunk, bytes):
+            self.timings.count(nbytes=len(chunk))
+        super().write(chunk)
+
+    def flush(self, include_footers: bool = False) -> "asyncio.Future[None]":
+        """Send the response buffer, timing how long the network takes to accept it.
+
+        The headers are sent with the first flush, so the ``Server-Timing`` header only covers the
+        phases done before the first bytes of the body, such as reading the file and planning the
+        query, and the first batch when streaming.
+        """
+        if not self._headers_flushed:
+            self._headers_flushed = True
+            self.set_header("Server-Timing", self.timings.server_timing())
+        start = time.perf_counter()
+        future = super().flush(include_footers=include_footers)
+        future.add_done_callback(lambda _: self.timings.add("write", time.perf_counter() - start))
+        return future
+
+    def on_finish(self) -> None:
+        """Record the timings of the request in the metrics."""
+        super().on_finish()
+        if self.route_metrics is not None:
+            self.route_metrics.observe(
+                self.route_name,
+                self.file_format_label(),
+                self.get_status(),
+                self.request.request_time(),
+                self.timings,
+            )
+
+    def file_format_label(self) -> str:
+        """Return the format of the requested file as a metrics label.
+
+        Only datasets already listed by the request are looked up, so that recording the metrics
+        never lists files on the event loop.
+        """
+        if not self.path_args:
+            return "none"
+        path = self.path_args[0]
+        try:
+            if (dataset := self._datasets.get(path)) is not None:
+                return dataset.file_format.value
+            return ff.FileFormat.from_filename(self.data_file(path)).value
+        except (ValueError, OSError):
+            return "unknown"
+
+    async def prepare(self) -> None:  # type: ignore[override]
+        """List the files of a requested dataset in the query thread pool.
+
+        Datasets are listed once per request, so that the cache validators and keys computed on
+        the event loop only stat the requested file.
+        Unauthenticated requests are left to be rejected without touching the file system.
+        """
+        await super().prepare()
+        if self.current_user is None or not self.path_args:
+            return
+        await self.run_blocking(self.dataset, self.path_args[0])
+
+    def on_connection_close(self) -> None:
+        """Flag the request as cancelled when the client disconnects."""
+        self.cancelled = True
+        super().on_connection_close()
+
+    def log_exception(
+        self,
+        typ: type[BaseException] | None,
+        value: BaseException | None,
+        tb: types.TracebackType | None,
+    ) -> None:
+        """Log uncaught exceptions, except for cancelled requests."""
+        if not isinstance(value, RequestCancelled):
+            super().log_exception(typ, value, tb)
+
+    async def run_blocking[**P, T](self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run a blocking call, such as reading a file or executing a query, in the query thread pool.
+
+        This keeps the event loop free to serve other requests while the query executes.
+        Raise :py:class:`RequestCancelled` instead of running the call if the client disconnected
+        while the call was waiting for a free thread.
+        """
+
+        def call() -> T:
+            if self.cancelled:
+                raise RequestCancelled()
+            return func(*args, **kwargs)
+
+        return await tornado.ioloop.IOLoop.current().run_in_executor(self.executor, call)
+
+    async def write_stream(
+        self,
+        schema: pa.Schema,
+        batches: Iterator[pa.RecordBatch],
+        record: list[bytes] | None = None,
+        encoding: EncodingParams | None = None,
+    ) -> None:
+        """Execute the batches iterator in the query thread pool and stream them as IPC.
+
+        Each record batch is written as soon as it is produced so that peak memory is a single
+        batch and the client starts receiving data before the query completes.
+        Batches are encoded in the query thread pool too, as compression is CPU bound.
+        The query stops at the next batch if the client disconnects.
+        The written bytes are also appended to ``record`` if given.
+        """
+        sink = _ChunkSink()
+        batches = self.timings.iterate("execute", batches)
+        try:
+            batch = await self.run_blocking(next, batches, None)
+            encoder = BatchEncoder(schema, batch, encoding)
+            options = self.ipc_write_options(encoding, 0 if batch is None else batch.nbytes)
+            with pa.ipc.new_stream(sink, encoder.schema, options=options) as writer:
+                while not self.cancelled and batch is not None:
+                    await self.run_blocking(self.encode_batch, encoder, writer, batch)
+                    self.write_chunks(sink.drain(), record)
+                    await self.flush()
+                    batch = await self.run_blocking(next, batches, None)
+            self.write_chunks(sink.drain(), record)
+        except (tornado.iostream.StreamClosedError, RequestCancelled):
+            self.cancelled = True
+        finally:
+            if hasattr(batches, "close"):
+                # Release the resources held by the query, such as a database connection
+                batches.close()
+
+    def encode_batch(
+        self, encoder: "BatchEncoder", writer: pa.ipc.RecordBatchStreamWriter, batch: pa.RecordBatch
+    ) -> None:
+        """Encode a record batch and write it to the IPC writer, counting its rows."""
+        with self.timings.phase("encode"):
+            encoder.write(writer, batch)
+        self.timings.count(rows=batch.num_rows)
+
+    def write_chunks(self, chunks: list[bytes], record: list[bytes] | None = None) -> None:
+        """Write encoded chunks to the response buffer, and append them to ``record`` if given."""
+        for chunk in chunks:
+            self.write(chunk)
+        if record is not None:
+            record.extend(chunks)
+
+    def get_encoding_params(self) -> EncodingParams:
+        """Return the encoding of the IPC record batches asked by the client, or raise a HTTP 400 error.
+
+        The ``compression`` query parameter takes precedence over the ``codecs`` parameter of the
+        Arrow stream media type in the ``Accept`` header, which lists codecs by preference, such
+        as ``application/vnd.apache.arrow.stream; codecs="zstd lz4"``.
+        """
+        self.add_header("Vary", "Accept")
+        encoding = self.get_query_params_as(EncodingParams)
+        if "compression" not in self.request.arguments:
+            codec = accepted_codec(self.request.headers.get("Accept", ""))
+            encoding = dataclasses.replace(encoding, compression=codec)
+        if encoding.compression is not None and encoding.compression not in IPC_CODECS:
+            raise tornado.web.HTTPError(
+                400, f"Unsupported compression {encoding.compression!r}, use one of {IPC_CODECS}"
+            )
+        if encoding.max_cell_bytes is not None and encoding.max_cell_bytes < 1:
+            raise tornado.web.HTTPError(400, "The max_cell_bytes must be positive")
+        return encoding
+
+    def ipc_write_options(self, encoding: EncodingParams | None, nbytes: int) -> pa.ipc.IpcWriteOptions:
+        """Return the IPC options to write record batches of the given size.
+
+        Small batches are not compressed, as the saved transfer time does not make up for the time
+        spent compressing and decompressing them.
+        """
+        if encoding is None or encoding.compression is None or nbytes < self.compression_min_bytes:
+            return pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        codec = pa.Codec(encoding.compression, compression_level=encoding.compression_level)
+        return pa.ipc.IpcWriteOptions(compression=codec, emit_dictionary_deltas=True)
+
+    def tile_key(self, path: str, *coordinates: Hashable) -> Hashable | None:
+        """Return the key of a tile of the file in the disk cache, or None if the cache is disabled.
+
+        The key identifies the server version, the file version and read options, so that tiles
+        of a changed file, or encoded by another version, are never served.
+        """
+        if self.tiles is None:
+            return None
+        file_params = self.get_file_options(self.file_format(path))
+        return (__version__, self.file_key(path), file_params, *coordinates)
+
+    def check_not_modified(self, path: str, *request_params: Hashable) -> bool:
+        """Set the cache validators of the response and return True if the client copy is fresh.
+
+        The strong ETag identifies the server version, the file version, the read options, and
+        the request parameters, so it only requires a stat of the file.
+        When True, the status is set to 304 and the response must be finished without a body.
+        """
+        file_key = self.file_key(path)
+        file_params = self.get_file_options(self.file_format(path))
+        identity = (__version__, self.request.path, file_key, file_params, *request_params)
+        etag = hashlib.sha256(repr(identity).encode()).hexdigest()
+        mtime = datetime.datetime.fromtimestamp(file_key.mtime_ns // 1_000_000_000, datetime.UTC)
+
+        self.set_header("Etag", f'"{etag}"')
+        self.set_header("Last-Modified", mtime)
+        self.set_header("Cache-Control", self.cache_control)
+
+        if "If-None-Match" in self.request.headers:
+            # The ETag takes precedence over the date, which has only a second resolution
+            fresh = self.check_etag_header()
+        elif (since := self.request.headers.get("If-Modified-Since")) is not None:
+            try:
+                fresh = mtime <= email.utils.parsedate_to_datetime(since)
+            except (TypeError, ValueError):
+                fresh = False
+        else:
+            fresh = False
+        if fresh:
+            self.set_status(304)
+        return fresh
 
     def data_file(self, path: str) -> pathlib.Path:
         """Return the file that is requested by the URL path."""
         root_dir = pathlib.Path(os.path.expanduser(self.settings["server_root_dir"])).resolve()
         return root_dir / path
 
-    def dataframe(self, path: str) -> dn.DataFrame:
+    def dataset(self, path: str) -> datasets.Dataset | None:
+        """Return the files requested by a directory or file name pattern, or None for a single file.
+
+        Listing the files blocks, and is done by :py:meth:`prepare` off the event loop.
+        Raise a HTTP 400 error if the dataset is not supported, such as a directory without files.
+        """
+        if path not in self._datasets:
+            file = self.data_file(path)
+            try:
+                self._datasets[path] = datasets.discover(file) if datasets.is_dataset(file) else None
+            except ValueError as e:
+                raise tornado.web.HTTPError(400, str(e)) from e
+        return self._datasets[path]
+
+    def file_format(self, path: str) -> ff.FileFormat:
+        """Return the format of the requested file, or of the files of the requested dataset."""
+        if (dataset := self.dataset(path)) is not None:
+            return dataset.file_format
+        return ff.FileFormat.from_filename(self.data_file(path))
+
+    def file_key(self, path: str) -> cache.FileKey:
+        """Return the version of the requested file or dataset."""
+        if (dataset := self.dataset(path)) is not None:
+            return dataset.key
+        return cache.FileKey.from_path(self.data_file(path))
+
+    def _read_dataframe(self, path: str, parallel: bool = False) -> tuple[DataFrameKey, dn.DataFrame]:
+        """Return the cached DataFrame of the whole file and its cache key."""
+        file_format = self.file_format(path)
+        file_params = self.get_file_options(file_format)
+        key = DataFrameKey(file=self.file_key(path), options=file_params, parallel=parallel)
+
+        def read() -> dn.DataFrame:
+            with self.timings.phase("open"):
+                registry = self.parallel_tables if parallel else self.tables
+                options = dataclasses.asdict(file_params)
+                if (dataset := self.dataset(path)) is not None:
+                    # All the files of the dataset are scanned as one listing table
+                    return registry.table(
+                        file_format, dataset.table_path, file=key.file, **dataset.table_options, **options
+                    )
+                return registry.table(file_format, self.data_file(path), **options)
+
+        df = self.dataframes.get_or_insert(
+            key, read, nbytes=lambda _: _dataframe_nbytes(file_format, key.file)
+        )
+        return key, df
+
+    def parallel_dataframe(self, path: str) -> dn.DataFrame | None:
+        """Return the DataFrame of the whole file scanned in parallel partitions, in arbitrary order.
+
+        Return None if the file format does not support it.
+        """
+        if self.file_format(path) not in abw.PARALLEL_FORMATS:
+            return None
+        return self._read_dataframe(path, parallel=True)[1]
+
+    def dataframe(self, path: str, query: QueryParams | None = None) -> dn.DataFrame:
         """Return the DataFusion lazy DataFrame.
 
         Note: On some file type, the file is read eagerly when calling this method.
+        DataFrames are cached per file version and read options so that subsequent requests on
+        an unchanged file do not read it again.
+        Filtered and sorted DataFrames are materialized in the cache when they fit in it, so that
+        chunk requests do not redo the sort.
         """
+        key, df = self._read_dataframe(path)
+        if query is None or query.is_empty:
+            return df
+
+        query_key = dataclasses.replace(key, query=query)
+        if (cached := self.dataframes.get(query_key)) is not None:
+            return cached
+
+        # A sort defines the row order by itself, so it can use all partitions in parallel, as long
+        # as its tiebreakers order any two different rows. A filter alone must keep the file order,
+        # which only the single partition scan guarantees.
+        parallel = None
+        if query.sort_by is not None and has_total_order(df.schema()):
+            parallel = self.parallel_dataframe(path)
+        with self.timings.phase("plan"):
+            to_materialize = apply_query(parallel if parallel is not None else df, query)
+        if (
+            isinstance(to_materialize, dn.DataFrame)
+            and (materialized := self._materialize(to_materialize)) is not None
+        ):
+            df, nbytes = materialized
+            self.dataframes.put(query_key, df, nbytes=nbytes)
+        else:
+            # Executed again for each chunk, so the sort must see the rows in the same order each time
+            with self.timings.phase("plan"):
+                df = apply_query(df, query) if parallel is not None else to_materialize
+            self.dataframes.put(query_key, df, nbytes=_LAZY_DATAFRAME_NBYTES)
+        return df
+
+    def count_rows(self, path: str, query: QueryParams | None = None) -> int:
+        """Count the rows of the file matching the query, scanning partitions in parallel if possible."""
+        key, df = self._read_dataframe(path)
+        if query is not None and not query.is_empty:
+            query_key = dataclasses.replace(key, query=query)
+            if (cached := self.dataframes.get(query_key)) is not None:
+                with self.timings.phase("execute"):
+                    return cached.count()
+
+        if (parallel := self.parallel_dataframe(path)) is not None:
+            df = parallel
+        if query is not None and query.filter:
+            # Sorting does not change the number of rows
+            with self.timings.phase("plan"):
+                df = apply_query(df, dataclasses.replace(query, sort_by=None))
+        with self.timings.phase("execute"):
+            return df.count()
+
+    def _materialize(self, df: dn.DataFrame) -> tuple[dn.DataFrame, int] | None:
+        """Execute the DataFrame in memory, unless it does not fit in the cache."""
+        batches: list[pa.RecordBatch] = []
+        nbytes = 0
+        for batch in self.timings.iterate("execute", iter_record_batches(df)):
+            nbytes += batch.nbytes
+            if nbytes > self.dataframes.max_bytes:
+                return None
+            batches.append(batch)
+        table = pa.Table.from_batches(batches, schema=df.schema())
+        return abw.from_arrow(self.context, table), nbytes
+
+    def file_stats(self, path: str) -> abw.FileStats | None:
+        """Return the statistics read from the file metadata, if available for this file."""
+        if (dataset := self.dataset(path)) is not None:
+            with self.timings.phase("open"):
+                return datasets.read_stats(dataset)
         file = self.data_file(path)
         file_format = ff.FileFormat.from_filename(file)
+        read_stats = abw.get_stats_reader(format=file_format)
+        if read_stats is None:
+            return None
         file_params = self.get_file_options(file_format)
-        read_table = abw.get_table_reader(format=file_format)
-        return read_table(self.context, file, **dataclasses.asdict(file_params))
+        with self.timings.phase("open"):
+            return read_stats(file, **dataclasses.asdict(file_params))
+
+    def schema(self, path: str, query: QueryParams) -> pa.Schema:
+        """Return the schema of the rows of the file matching the query.
+
+        The schema of eager formats is read from the file metadata when possible, so that chunks
+        of rows read from the file layout do not need to load the whole file in memory first.
+        """
+        file_format = self.file_format(path)
+        if query.is_empty and file_format in abw.EAGER_FORMATS:
+            file_stats = self.file_stats(path)
+            if file_stats is not None and file_stats.schema is not None:
+                return file_stats.schema
+        schema: pa.Schema = self.dataframe(path, query).schema()
+        return schema
+
+    def read_window(self, path: str, offset: int, count: int, schema: pa.Schema) -> pa.Table | None:
+        """Read a window of rows with the given schema using the file layout, if available."""
+        if (dataset := self.dataset(path)) is not None:
+            with self.timings.phase("execute"):
+                return datasets.read_window(dataset, offset=offset, count=count, schema=schema)
+        file = self.data_file(path)
+        file_format = ff.FileFormat.from_filename(file)
+        read_window = abw.get_window_reader(format=file_format)
+        if read_window is None:
+            return None
+        file_params = self.get_file_options(file_format)
+        with self.timings.phase("execute"):
+            return read_window(
+                file,
+                offset=offset,
+                count=count,
+                schema=schema,
+                context=self.context,
+                **dataclasses.asdict(file_params),
+            )
+
+    def read_rows(
+        self, path: str, schema: pa.Schema, query: QueryParams, offset: int, count: int
+    ) -> Iterator[pa.RecordBatch]:
+        """Yield the record batches of a range of rows of the columns of the schema matching the query."""
+        # Some formats can read only the parts of the file covering the requested rows
+        if query.is_empty:
+            window = self.read_window(path, offset=offset, count=count, schema=schema)
+            if window is not None:
+                return iter(window.cast(schema).to_batches())
+        df = self.dataframe(path, query)
+        with self.timings.phase("plan"):
+            df = df.select(*schema.names).limit(count=count, offset=offset)
+        return iter_record_batches(df)
 
     def get_query_params_as[T](self, dataclass_type: type[T]) -> T:
         """Extract query parameters into a dataclass type."""
@@ -86,40 +670,356 @@ class IpcParams:
     col_chunk: int | None = None
 
 
+def iter_record_batches(df: dn.DataFrame) -> Iterator[pa.RecordBatch]:
+    """Execute the DataFrame and yield its record batches as they are produced."""
+    for batch in df.execute_stream():
+        yield batch if isinstance(batch, pa.RecordBatch) else batch.to_pyarrow()
+
+
+class BatchEncoder:
+    """Transform the record batches of an IPC stream into the encoding asked by the client.
+
+    Long cells are truncated, then the low cardinality string columns of the sample batch are
+    dictionary encoded, and only the new dictionary values are sent with the next batches.
+    """
+
+    def __init__(
+        self, schema: pa.Schema, sample: pa.RecordBatch | None, encoding: EncodingParams | None
+    ) -> None:
+        self._max_cell_bytes = None if encoding is None else encoding.max_cell_bytes
+        if self._max_cell_bytes is not None:
+            schema = cells.truncated_schema(schema, self._max_cell_bytes)
+        self._dictionary = None
+        if encoding is not None and encoding.dictionary_encode and sample is not None:
+            self._dictionary = dictionary.DictionaryEncoder.from_sample(schema, sample)
+            schema = self._dictionary.schema
+        self._schema = schema
+
+    @property
+    def schema(self) -> pa.Schema:
+        """The schema of the encoded record batches."""
+        return self._schema
+
+    def write(self, writer: pa.ipc.RecordBatchStreamWriter, batch: pa.RecordBatch) -> None:
+        """Encode the record batch and write it to the IPC writer."""
+        if self._max_cell_bytes is not None:
+            batch = cells.truncate_cells(batch, self._max_cell_bytes)
+        if self._dictionary is not None:
+            batch = self._dictionary.encode(batch)
+        writer.write_batch(batch)
+
+
+class _ChunkSink:
+    """A writable file-like object buffering bytes until the handler writes them on the event loop."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: Any) -> int:
+        # Tornado only accepts bytes, so IPC body buffers are copied one batch at a time
+        chunk = data if isinstance(data, bytes) else memoryview(data).tobytes()
+        self._chunks.append(chunk)
+        return len(chunk)
+
+    def drain(self) -> list[bytes]:
+        """Return and forget the buffered bytes."""
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
 class IpcRouteHandler(BaseRouteHandler):
     """An handler to get file in IPC."""
 
+    route_name = "stream"
+
     @tornado.web.authenticated
     async def get(self, path: str) -> None:
         """HTTP GET return an IPC file."""
         params = self.get_query_params_as(IpcParams)
+        query = self.get_query_params_as(QueryParams)
+        encoding = self.get_encoding_params()
 
-        self.set_header("Content-Type", "application/vnd.apache.arrow.stream")
+        if self.check_not_modified(path, params, query, encoding):
+            await self.finish()
+            return
 
-        df: dn.DataFrame = self.dataframe(path)
+        self.set_header("Content-Type", "application/vnd.apache.arrow.stream")
 
+        # Only chunks of rows are cached on disk, as whole files could fill the cache at once
+        key = None
         if params.row_chunk_size is not None and params.row_chunk is not None:
-            offset: int = params.row_chunk * params.row_chunk_size
-            df = df.limit(count=params.row_chunk_size, offset=offset)
+            key = self.tile_key(path, "stream", params, query, encoding)
+        if key is not None and (cached := await self.run_blocking(self.tiles.get, key)) is not None:  # type: ignore[union-attr]
+            # Finishing an unflushed response resets the Content-Type to JSON otherwise
+            await self.finish(cached, set_content_type="application/vnd.apache.arrow.stream")
+            return
+
+        schema: pa.Schema = await self.run_blocking(self.schema, path, query)
 
         if params.col_chunk_size is not None and params.col_chunk is not None:
-            col_names = df.schema().names
             start: int = params.col_chunk * params.col_chunk_size
             end: int = start + params.col_chunk_size
-            df = df.select(*col_names[start:end])
+            schema = pa.schema(list(schema)[start:end], metadata=schema.metadata)
+
+        if params.row_chunk_size is not None and params.row_chunk is not None:
+            offset: int = params.row_chunk * params.row_chunk_size
+            batches = await self.run_blocking(
+                self.read_rows, path, schema, query, offset=offset, count=params.row_chunk_size
+            )
+        else:
+            df: dn.DataFrame = await self.run_blocking(self.dataframe, path, query)
+            batches = iter_record_batches(df.select(*schema.names))
 
-        table: pa.Table = df.to_arrow_table()
+        record: list[bytes] | None = [] if key is not None else None
+        await self.write_stream(schema, batches, record=record, encoding=encoding)
+        if not self.cancelled:
+            await self.flush()
+            if key is not None and record is not None:
+                await self.run_blocking(self.tiles.put, key, b"".join(record))  # type: ignore[union-attr]
 
-        # TODO can we write directly to socket and send chunks
-        sink = pa.BufferOutputStream()
-        with pa.ipc.new_stream(sink, table.schema) as writer:
-            writer.write_table(table)
 
-        buf: pa.Buffer = sink.getvalue()
-        self.write(buf.to_pybytes())  # FIXME to_pybytes copies memory
+@dataclasses.dataclass(frozen=True, slots=True)
+class CellParams:
+    """Query parameter for a single cell."""
+
+    row: int | None = None
+    column: str | None = None
+
+
+class CellRouteHandler(BaseRouteHandler):
+    """An handler to get the full value of a single cell, such as one truncated in the tiles."""
+
+    route_name = "cell"
+
+    @tornado.web.authenticated
+    async def get(self, path: str) -> None:
+        """HTTP GET return an IPC stream with the cell, or no rows if the row is out of range."""
+        params = self.get_query_params_as(CellParams)
+        query = self.get_query_params_as(QueryParams)
+        if params.row is None or params.row < 0 or params.column is None:
+            raise tornado.web.HTTPError(400, "A cell requires a non negative row and a column")
+        # The whole point is to get the value that was truncated in the tiles
+        encoding = dataclasses.replace(self.get_encoding_params(), max_cell_bytes=None)
+
+        if self.check_not_modified(path, params, query, encoding):
+            await self.finish()
+            return
+
+        self.set_header("Content-Type", "application/vnd.apache.arrow.stream")
+
+        schema: pa.Schema = await self.run_blocking(self.schema, path, query)
+        if params.column not in schema.names:
+            raise tornado.web.HTTPError(400, f"Unknown column {params.column!r}")
+        schema = pa.schema([schema.field(params.column)], metadata=schema.metadata)
+
+        batches = await self.run_blocking(self.read_rows, path, schema, query, offset=params.row, count=1)
+        await self.write_stream(schema, batches, encoding=encoding)
+        if not self.cancelled:
+            await self.flush()
+
+
+# Maximum number of tiles in a single batch request
+MAX_BATCH_TILES = 256
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class BatchParams:
+    """Query parameter for a batch of IPC tiles."""
+
+    row_chunk_size: int | None = None
+    col_chunk_size: int | None = None
+    # Comma separated ``row_chunk:col_chunk`` pairs, such as ``0:0,0:1,1:0``
+    chunks: str = ""
+
+
+def parse_tiles(text: str) -> list[tuple[int, int]]:
+    """Parse the unique ``row_chunk:col_chunk`` pairs of a batch request, or raise a HTTP 400 error."""
+    tiles: dict[tuple[int, int], None] = {}
+    for item in filter(None, (i.strip() for i in text.split(","))):
+        try:
+            row_chunk, col_chunk = (int(i) for i in item.split(":"))
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, f"Invalid chunk {item!r}, expected row_chunk:col_chunk") from e
+        if row_chunk < 0 or col_chunk < 0:
+            raise tornado.web.HTTPError(400, f"Invalid chunk {item!r}, expected non-negative indices")
+        tiles[(row_chunk, col_chunk)] = None
+    if not tiles:
+        raise tornado.web.HTTPError(400, "No chunks requested")
+    if len(tiles) > MAX_BATCH_TILES:
+        raise tornado.web.HTTPError(400, f"Too many chunks requested, the maximum is {MAX_BATCH_TILES}")
+    return list(tiles)
+
+
+def chunk_columns(col_names: list[str], col_chunk: int, col_chunk_size: int | None) -> list[str]:
+    """Return the names of the columns in a column chunk."""
+    if col_chunk_size is None:
+        return col_names if col_chunk == 0 else []
+    start = col_chunk * col_chunk_size
+    return col_names[start : start + col_chunk_size]
+
+
+def group_tile_runs(tiles: list[tuple[int, int]]) -> list[tuple[int, int, list[tuple[int, int]]]]:
+    """Group tiles into runs of consecutive row chunks.
+
+    Return the first and last row chunk of each run, with the tiles it covers.
+    """
+    runs: list[tuple[int, int, list[tuple[int, int]]]] = []
+    for tile in sorted(tiles):
+        if runs and tile[0] <= runs[-1][1] + 1:
+            first, _, run_tiles = runs[-1]
+            runs[-1] = (first, tile[0], [*run_tiles, tile])
+        else:
+            runs.append((tile[0], tile[0], [tile]))
+    return runs
+
+
+class BatchRouteHandler(BaseRouteHandler):
+    """An handler to get many tiles of a file in a single response."""
+
+    route_name = "batch"
+
+    @tornado.web.authenticated
+    async def get(self, path: str) -> None:
+        """HTTP GET return concatenated IPC streams, one per tile.
+
+        Each stream carries its ``row_chunk`` and ``col_chunk`` in the schema metadata, as tiles
+        are not written in the requested order.
+        Tiles on consecutive row chunks are read in a single scan of their rows and columns.
+        """
+        params = self.get_query_params_as(BatchParams)
+        query = self.get_query_params_as(QueryParams)
+        tiles = parse_tiles(params.chunks)
+        if params.row_chunk_size is None:
+            if any(row_chunk != 0 for row_chunk, _ in tiles):
+                raise tornado.web.HTTPError(400, "Row chunks require a row_chunk_size")
+        encoding = self.get_encoding_params()
+
+        if self.check_not_modified(path, params, query, encoding):
+            await self.finish()
+            return
+
+        self.set_header("Content-Type", "application/vnd.apache.arrow.stream")
+
+        # Only chunks of rows are cached on disk, as whole columns could fill the cache at once
+        keys = {
+            tile: None
+            if params.row_chunk_size is None
+            else self.tile_key(
+                path, "batch", params.row_chunk_size, params.col_chunk_size, tile, query, encoding
+            )
+            for tile in tiles
+        }
+        cached = await self.run_blocking(self.read_cached_tiles, keys)
+        for data in cached.values():
+            self.write(data)
+        if not (tiles := [tile for tile in tiles if tile not in cached]):
+            await self.finish(set_content_type="application/vnd.apache.arrow.stream")
+            return
+
+        schema: pa.Schema = await self.run_blocking(self.schema, path, query)
+        col_names: list[str] = schema.names
+        row_size = params.row_chunk_size
+
+        for first, last, run_tiles in group_tile_runs(tiles):
+            if self.cancelled:
+                return
+            run_columns = set().union(
+                *(chunk_columns(col_names, c, params.col_chunk_size) for _, c in run_tiles)
+            )
+            run_schema = pa.schema([f for f in schema if f.name in run_columns], metadata=schema.metadata)
+            run_offset = 0 if row_size is None else first * row_size
+            run_count = None if row_size is None else (last - first + 1) * row_size
+            table = await self.run_blocking(self.read_table, path, run_schema, query, run_offset, run_count)
+
+            encoded = await self.run_blocking(
+                self.encode_run, table, col_names, run_offset, run_tiles, params, encoding
+            )
+            self.write_chunks(list(encoded.values()))
+            await self.run_blocking(self.write_cached_tiles, keys, encoded)
+            try:
+                await self.flush()
+            except tornado.iostream.StreamClosedError:
+                return
 
         await self.flush()
 
+    def read_table(
+        self, path: str, schema: pa.Schema, query: QueryParams, offset: int, count: int | None
+    ) -> pa.Table:
+        """Read a range of rows of the columns of the schema in memory, or all rows if count is None."""
+        if count is None:
+            batches = iter_record_batches(self.dataframe(path, query).select(*schema.names))
+        else:
+            batches = self.read_rows(path, schema, query, offset=offset, count=count)
+        return pa.Table.from_batches(list(self.timings.iterate("execute", batches)), schema=schema)
+
+    def encode_run(
+        self,
+        table: pa.Table,
+        col_names: list[str],
+        offset: int,
+        tiles: list[tuple[int, int]],
+        params: BatchParams,
+        encoding: EncodingParams,
+    ) -> dict[tuple[int, int], bytes]:
+        """Encode the tiles of a run read in memory starting at row offset.
+
+        The columns of the tiles are chunked from the full list of columns of the file.
+        """
+        encoded: dict[tuple[int, int], bytes] = {}
+        for row_chunk, col_chunk in tiles:
+            tile = table.select(chunk_columns(col_names, col_chunk, params.col_chunk_size))
+            if params.row_chunk_size is not None:
+                tile = tile.slice(row_chunk * params.row_chunk_size - offset, params.row_chunk_size)
+            with self.timings.phase("encode"):
+                encoded[(row_chunk, col_chunk)] = self.encode_tile(tile, row_chunk, col_chunk, encoding)
+            self.timings.count(rows=tile.num_rows)
+        return encoded
+
+    def encode_tile(
+        self,
+        tile: pa.Table,
+        row_chunk: int,
+        col_chunk: int,
+        encoding: EncodingParams,
+    ) -> bytes:
+        """Encode a tile as an IPC stream, identified by its chunk indices in the schema metadata."""
+        metadata = {"row_chunk": str(row_chunk), "col_chunk": str(col_chunk)}
+        tile = tile.replace_schema_metadata({**(tile.schema.metadata or {}), **metadata})
+        batches = tile.to_batches()
+        encoder = BatchEncoder(tile.schema, batches[0] if batches else None, encoding)
+        sink = pa.BufferOutputStream()
+        options = self.ipc_write_options(encoding, tile.nbytes)
+        with pa.ipc.new_stream(sink, encoder.schema, options=options) as writer:
+            for batch in batches:
+                encoder.write(writer, batch)
+        data: bytes = sink.getvalue().to_pybytes()
+        return data
+
+    def read_cached_tiles(self, keys: dict[tuple[int, int], Hashable | None]) -> dict[tuple[int, int], bytes]:
+        """Return the encoded tiles found in the disk cache."""
+        if self.tiles is None:
+            return {}
+        cached = {tile: self.tiles.get(key) for tile, key in keys.items() if key is not None}
+        return {tile: data for tile, data in cached.items() if data is not None}
+
+    def write_cached_tiles(
+        self, keys: dict[tuple[int, int], Hashable | None], encoded: dict[tuple[int, int], bytes]
+    ) -> None:
+        """Store encoded tiles in the disk cache."""
+        if self.tiles is not None:
+            for tile, data in encoded.items():
+                if (key := keys[tile]) is not None:
+                    self.tiles.put(key, data)
+
 
 @dataclasses.dataclass(frozen=True, slots=True)
 class SchemaInfo:
@@ -137,48 +1037,121 @@ class StatsResponse:
     schema: SchemaInfo
     num_rows: int = 0
     num_cols: int = 0
+    # Whether num_rows is exact or estimated from a sample of the file
+    num_rows_exact: bool = True
 
 
 class StatsRouteHandler(BaseRouteHandler):
     """An handler to get file in IPC."""
 
+    route_name = "stats"
+
     @tornado.web.authenticated
     async def get(self, path: str) -> None:
         """HTTP GET return statistics."""
-        df = self.dataframe(path)
+        query = self.get_query_params_as(QueryParams)
+        if self.check_not_modified(path, query):
+            await self.finish()
+            return
+        response = await self.run_blocking(self.stats, path, query)
+        if not response.num_rows_exact:
+            # The ETag identifies the file version only, while an estimate is replaced by the
+            # exact count once the file is indexed, so it must not be revalidated or stored
+            self.clear_header("Etag")
+            self.clear_header("Last-Modified")
+            self.set_header("Cache-Control", "no-store")
+        await self.finish(dataclasses.asdict(response))
 
-        # FIXME this is not optimal for ORC/CSV where we can read_metadata, but it is not read
-        # via DataFusion.
-        schema = df.schema()
-        try:
-            num_rows = df.count()
-        # Workaround issue in Avro files df.count() not working
-        except Exception as e:
-            if len(schema.names) == 0:
-                num_rows = 0
-            # No dedicated exception type coming from DataFusion
-            if str(e).startswith("DataFusion"):
-                first_col: str = schema.names[0]
-                batches = df.aggregate([], [dnf.count(dn.col(first_col))]).collect()
-                num_rows = batches[0].column(0)[0].as_py()
+    def stats(self, path: str, query: QueryParams) -> StatsResponse:
+        """Compute the statistics of the file, blocking until done."""
+        # Read what we can from the file metadata rather than scanning the data
+        file_stats = self.file_stats(path) if query.is_empty else None
 
-        # Create a zero-row IPC stream with the table schema
-        zero_row_table = df.limit(0, 0).to_arrow_table()
+        if file_stats is not None and file_stats.schema is not None:
+            schema = file_stats.schema
+        else:
+            schema = self.dataframe(path, query).schema()
+
+        if file_stats is not None:
+            num_rows = file_stats.num_rows
+            num_rows_exact = file_stats.exact
+        else:
+            num_rows = self.count_rows(path, query)
+            num_rows_exact = True
 
+        # Create a zero-row IPC stream with the table schema
         sink = pa.BufferOutputStream()
-        with pa.ipc.new_stream(sink, schema) as writer:
-            writer.write_table(zero_row_table)
+        with pa.ipc.new_stream(sink, schema):
+            pass
 
         buf: pa.Buffer = sink.getvalue()
         schema_64 = base64.b64encode(buf.to_pybytes()).decode("utf-8")
 
-        response = StatsResponse(
+        return StatsResponse(
             num_cols=len(schema),
             num_rows=num_rows,
+            num_rows_exact=num_rows_exact,
             schema=SchemaInfo(data=schema_64),
         )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SummaryParams:
+    """Query parameter for the column summaries."""
+
+    bins: int = summary.DEFAULT_BINS
+    # Estimate the number of distinct values of every column, which scans the whole file even
+    # when the other statistics are read from the Parquet metadata
+    distinct: bool = True
+
+
+class SummaryRouteHandler(BaseRouteHandler):
+    """An handler to get statistics of every column."""
+
+    route_name = "summary"
+
+    @tornado.web.authenticated
+    async def get(self, path: str) -> None:
+        """HTTP GET return the null count, min, max, distinct count, and histogram of every column.
+
+        The summary is computed in one aggregation over the whole file and a second pass over
+        its numeric columns for the histograms.
+        The null counts, minimums, and maximums of Parquet files are read from their metadata, but
+        distinct counts still require the aggregation, unless ``distinct=false`` is given.
+        """
+        params = self.get_query_params_as(SummaryParams)
+        if params.bins < 1:
+            raise tornado.web.HTTPError(400, "The number of bins must be positive")
+        response = await self.run_blocking(self.summary, path, params.bins, params.distinct)
         await self.finish(dataclasses.asdict(response))
 
+    def summary(self, path: str, bins: int, distinct: bool = True) -> summary.TableSummary:
+        """Compute the column summaries, cached until the file changes."""
+        key, df = self._read_dataframe(path)
+
+        def compute() -> summary.TableSummary:
+            file_format = self.file_format(path)
+            if not isinstance(df, dn.DataFrame):
+                # Sqlite tables are summarized from the query results, one record batch at a time
+                with self.timings.phase("execute"):
+                    return summary.summarize_batches(
+                        df.schema(),
+                        lambda columns: df.select(*columns).execute_stream(),
+                        bins=bins,
+                        distinct=distinct,
+                    )
+            aggregated = p if (p := self.parallel_dataframe(path)) is not None else df
+            # The footer statistics of a dataset are spread over its files
+            parquet_path = None
+            if file_format == ff.FileFormat.Parquet and self.dataset(path) is None:
+                parquet_path = self.data_file(path)
+            with self.timings.phase("execute"):
+                return summary.summarize(aggregated, parquet_path=parquet_path, bins=bins, distinct=distinct)
+
+        if self.summaries is None:
+            return compute()
+        return self.summaries.get_or_insert((key, bins, distinct), compute, nbytes=lambda s: s.nbytes)
+
 
 @dataclasses.dataclass(frozen=True, slots=True)
 class SqliteFileInfo:
@@ -214,11 +1187,13 @@ NoFileInfoResponse = FileInfoResponse[Empty, Empty]
 class FileInfoRouteHandler(BaseRouteHandler):
     """A handler to get file-specific information."""
 
+    route_name = "file_info"
+
     @tornado.web.authenticated
     async def get(self, path: str) -> None:
         """HTTP GET return file-specific information."""
         file = self.data_file(path)
-        file_format = ff.FileFormat.from_filename(file)
+        file_format = self.file_format(path)
 
         match file_format:
             case ff.FileFormat.Csv:
@@ -231,7 +1206,7 @@ class FileInfoRouteHandler(BaseRouteHandler):
             case ff.FileFormat.Sqlite:
                 from . import adbc
 
-                table_names = adbc.SqliteDataFrame.get_table_names(file)
+                table_names = await self.run_blocking(adbc.SqliteDataFrame.get_table_names, file)
 
                 sqlite_response = SqliteFileInfoResponse(
                     info=SqliteFileInfo(table_names=table_names),
@@ -243,12 +1218,66 @@ class FileInfoRouteHandler(BaseRouteHandler):
                 await self.finish(dataclasses.asdict(no_response))
 
 
-def make_datafusion_config() -> dn.SessionConfig:
-    """Return the datafusion config."""
+class MetricsRouteHandler(BaseRouteHandler):
+    """An handler to get the timings of the requests of all routes in the Prometheus text format."""
+
+    route_name = "metrics"
+
+    @tornado.web.authenticated
+    async def get(self) -> None:
+        """HTTP GET return the metrics."""
+        if self.route_metrics is None:
+            raise tornado.web.HTTPError(404, "Metrics are not collected")
+        await self.finish(
+            self.route_metrics.render(), set_content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ServerConfig:
+    """Server extension options, set in the ``Arbalister`` section of the Jupyter configuration."""
+
+    # Memory budget in bytes of the registered tables and cached DataFrames together
+    dataframe_cache_bytes: int = 1 << 30
+    # Directory of the persistent caches, defaults to the user cache directory
+    cache_dir: str | None = None
+    # Number of threads executing queries concurrently, off the server event loop
+    max_concurrent_queries: int = 8
+    # Number of partitions scanned in parallel by counts and sorts, defaults to the number of CPUs
+    query_partitions: int | None = None
+    # Disk budget of the cache of encoded IPC tiles in bytes, disabled when zero
+    tile_cache_bytes: int = 0
+    # Memory budget of the cache of column summaries in bytes
+    summary_cache_bytes: int = 16 << 20
+    # Cache-Control header of the data and statistics responses, which all carry an ETag
+    cache_control: str = "private, no-cache"
+    # Record batches smaller than this size in bytes are sent uncompressed even if asked
+    compression_min_bytes: int = 1 << 16
+
+    def cache_path(self) -> pathlib.Path:
+        """Return the directory of the persistent caches."""
+        if self.cache_dir is not None:
+            return pathlib.Path(self.cache_dir).expanduser()
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return pathlib.Path(xdg_cache) / "arbalister"
+
+
+def make_server_config(web_app: jupyter_server.serverapp.ServerWebApplication) -> ServerConfig:
+    """Read the server extension options from the Jupyter configuration."""
+    section = web_app.settings.get("config", {}).get("Arbalister", {})
+    return params.build_dataclass(ServerConfig, lambda name, default: section.get(name, default))
+
+
+def make_datafusion_config(target_partitions: int = 1) -> dn.SessionConfig:
+    """Return the datafusion config.
+
+    Reading rows in file order requires a single partition, otherwise limit parallelism will
+    return arbitrary rows.
+    More partitions can only be used for queries that do not depend on the file order.
+    """
     config = (
         dn.SessionConfig()
-        # Must use a single partition otherwise limit parallelism will return arbitrary rows
-        .with_target_partitions(1)
+        .with_target_partitions(target_partitions)
         # String views do not get written properly to IPC
         .set("datafusion.execution.parquet.schema_force_view_types", "false")
     )
@@ -256,17 +1285,52 @@ def make_datafusion_config() -> dn.SessionConfig:
     return config
 
 
-def setup_route_handlers(web_app: jupyter_server.serverapp.ServerWebApplication) -> None:
-    """Jupyter server setup entry point."""
-    host_pattern = ".*$"
-    base_url = web_app.settings["base_url"]
-
+def make_handler_kwargs(web_app: jupyter_server.serverapp.ServerWebApplication) -> dict[str, Any]:
+    """Create the state shared by the route handlers, such as the DataFusion session contexts."""
+    config = make_server_config(web_app)
     context = dn.SessionContext(make_datafusion_config())
+    partitions = config.query_partitions or os.cpu_count() or 1
+    parallel_context = dn.SessionContext(make_datafusion_config(target_partitions=partitions))
+    # The memory budget is split so that the caches stay within it together: half for the tables
+    # registered in the session contexts, which hold the files read in memory, and half for the
+    # cached DataFrames, which hold the materialized filters and sorts
+    table_bytes = config.dataframe_cache_bytes // 2
+    # Only files scanned lazily are registered for parallel scans, as small listing tables
+    parallel_table_bytes = table_bytes // 32
+    # Files are registered once per version in each context, and their DataFrames then planned
+    # from the session catalog
+    registry = tables.TableRegistry(context, max_bytes=table_bytes - parallel_table_bytes)
+    parallel_registry = tables.TableRegistry(parallel_context, max_bytes=parallel_table_bytes)
+    dataframes = DataFrameCache(max_bytes=config.dataframe_cache_bytes - table_bytes)
+    csv_index.set_indexer(csv_index.CsvIndexer(cache_dir=config.cache_path() / "csv-index"))
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=config.max_concurrent_queries, thread_name_prefix="arbalister-query"
+    )
+    tiles = None
+    if config.tile_cache_bytes > 0:
+        tiles = tile_cache.TileCache(config.cache_path() / "tiles", max_bytes=config.tile_cache_bytes)
+    return {
+        "tables": registry,
+        "parallel_tables": parallel_registry,
+        "dataframes": dataframes,
+        "executor": executor,
+        "tiles": tiles,
+        "summaries": SummaryCache(max_bytes=config.summary_cache_bytes),
+        "cache_control": config.cache_control,
+        "compression_min_bytes": config.compression_min_bytes,
+        "route_metrics": metrics.Metrics(),
+    }
+
 
+def setup_route_handlers(web_app: jupyter_server.serverapp.ServerWebApplication) -> None:
+    """Register the route handlers, creating their shared state right away.
+
+    The server extension uses :py:func:`extension.setup_deferred_route_handlers` instead, which
+    creates it on the first request.
+    """
+    base_url = web_app.settings["base_url"]
+    kwargs = make_handler_kwargs(web_app)
     handlers = [
-        (url_path_join(base_url, r"arrow/stream/([^?]*)"), IpcRouteHandler, {"context": context}),
-        (url_path_join(base_url, r"arrow/stats/([^?]*)"), StatsRouteHandler, {"context": context}),
-        (url_path_join(base_url, r"file/info/([^?]*)"), FileInfoRouteHandler, {"context": context}),
+        (url_path_join(base_url, pattern), globals()[name], kwargs) for pattern, name in extension.ROUTES
     ]
-
-    web_app.add_handlers(host_pattern, handlers)  # type: ignore[no-untyped-call]
+    web_app.add_handlers(".*$", handlers)  # type: ignore[no-untyped-call]
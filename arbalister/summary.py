@@ -0,0 +1,313 @@
+import dataclasses
+import datetime
+import decimal
+import math
+import pathlib
+from typing import Any, Callable, Iterator
+
+import datafusion as dn
+import pyarrow as pa
+import pyarrow.compute as pc
+from datafusion import functions as f
+
+# Default number of bins of the histograms of numeric columns
+DEFAULT_BINS = 20
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Histogram:
+    """Counts of the values of a numeric column in bins of equal width."""
+
+    # The bins boundaries, one more than the number of bins
+    edges: list[float]
+    counts: list[int]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ColumnSummary:
+    """Statistics of the values of a column."""
+
+    name: str
+    type: str
+    null_count: int
+    min: Any = None
+    max: Any = None
+    # HyperLogLog estimate of the number of distinct non-null values
+    distinct_count: int | None = None
+    histogram: Histogram | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TableSummary:
+    """Statistics of the columns of a table."""
+
+    num_rows: int
+    columns: list[ColumnSummary]
+
+    @property
+    def nbytes(self) -> int:
+        """Rough estimate of the memory used by the summary."""
+        return 256 + 512 * len(self.columns)
+
+
+def _is_orderable(data_type: pa.DataType) -> bool:
+    return bool(
+        pa.types.is_integer(data_type)
+        or pa.types.is_floating(data_type)
+        or pa.types.is_decimal(data_type)
+        or pa.types.is_string(data_type)
+        or pa.types.is_large_string(data_type)
+        or pa.types.is_string_view(data_type)
+        or pa.types.is_boolean(data_type)
+        or pa.types.is_temporal(data_type)
+    )
+
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    return bool(pa.types.is_integer(data_type) or pa.types.is_floating(data_type))
+
+
+def _distinct_expr(column: dn.Expr, data_type: pa.DataType) -> dn.Expr | None:
+    """Return the approximate distinct count aggregate of a column, if supported by its type."""
+    if not _is_orderable(data_type):
+        return None
+    if not (
+        pa.types.is_integer(data_type) or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+    ):
+        # The HyperLogLog aggregate does not hash the other types in every DataFusion version, such
+        # as dates or string views, their text representation is unique
+        column = column.cast(pa.string())
+    return f.approx_distinct(column)
+
+
+def _json_value(value: Any) -> Any:
+    """Convert a scalar into a value that can be serialized in JSON."""
+    match value:
+        case None | bool() | int() | str():
+            return value
+        case float():
+            return value if math.isfinite(value) else str(value)
+        case decimal.Decimal() | datetime.date() | datetime.time() | datetime.timedelta():
+            return str(value)
+        case bytes():
+            return value.hex()
+    return str(value)
+
+
+def _parquet_statistics(path: pathlib.Path | str, schema: pa.Schema) -> dict[str, tuple[int, Any, Any]]:
+    """Return the null count, min, and max of the columns fully covered by Parquet statistics."""
+    import pyarrow.parquet
+
+    from . import arrow as abw
+
+    metadata = abw.read_parquet_metadata(path)
+    out: dict[str, tuple[int, Any, Any]] = {}
+    for i in range(metadata.num_columns):
+        column = metadata.schema.column(i)
+        name = column.path
+        if name not in schema.names or not _is_orderable(schema.field(name).type):
+            # Nested columns have many leaves
+            continue
+        stats = [metadata.row_group(rg).column(i).statistics for rg in range(metadata.num_row_groups)]
+        if metadata.num_row_groups == 0 or not all(
+            s is not None and s.has_min_max and s.has_null_count for s in stats
+        ):
+            continue
+        try:
+            out[name] = (
+                sum(s.null_count for s in stats),
+                min(s.min for s in stats),
+                max(s.max for s in stats),
+            )
+        except (TypeError, pyarrow.ArrowException):
+            continue
+    return out
+
+
+def _aggregate(
+    df: dn.DataFrame, schema: pa.Schema, known: dict[str, tuple[int, Any, Any]], distinct: bool = True
+) -> tuple[int, dict[str, dict[str, Any]]]:
+    """Compute the number of rows and the per column statistics not known yet, in a single pass."""
+    aggregates = [f.count(dn.lit(1)).alias("num_rows")]
+    for i, field in enumerate(schema):
+        column = dn.col(field.name)
+        if field.name not in known:
+            aggregates.append(f.count(column).alias(f"{i}_count"))
+            if _is_orderable(field.type):
+                aggregates.append(f.min(column).alias(f"{i}_min"))
+                aggregates.append(f.max(column).alias(f"{i}_max"))
+        if distinct and (distinct_expr := _distinct_expr(column, field.type)) is not None:
+            aggregates.append(distinct_expr.alias(f"{i}_distinct"))
+
+    row = df.aggregate([], aggregates).to_arrow_table().to_pylist()[0]
+    num_rows = int(row.pop("num_rows"))
+    columns: dict[str, dict[str, Any]] = {}
+    for i, field in enumerate(schema):
+        values = {k.split("_", 1)[1]: v for k, v in row.items() if k.split("_", 1)[0] == str(i)}
+        if field.name in known:
+            null_count, min_value, max_value = known[field.name]
+            values.update(null_count=null_count, min=min_value, max=max_value)
+        else:
+            values["null_count"] = num_rows - values.pop("count")
+        columns[field.name] = values
+    return num_rows, columns
+
+
+def _merge_min_max(values: dict[str, Any], array: pa.Array) -> None:
+    """Update the minimum and maximum of a column with the values of a record batch."""
+    try:
+        min_max = pc.min_max(array).as_py()
+    except pa.ArrowNotImplementedError:
+        return
+    for stat, pick in [("min", min), ("max", max)]:
+        if min_max[stat] is not None:
+            current = values.get(stat)
+            values[stat] = min_max[stat] if current is None else pick(current, min_max[stat])
+
+
+def _aggregate_batches(
+    batches: Iterator[pa.RecordBatch], schema: pa.Schema, distinct: bool = True
+) -> tuple[int, dict[str, dict[str, Any]]]:
+    """Compute the number of rows and the per column statistics, merged over the record batches.
+
+    Distinct counts are exact, from the distinct values of each batch merged together.
+    """
+    num_rows = 0
+    columns: dict[str, dict[str, Any]] = {field.name: {"null_count": 0} for field in schema}
+    uniques: dict[str, pa.Array] = {}
+    for batch in batches:
+        num_rows += batch.num_rows
+        for field in schema:
+            array = batch.column(field.name)
+            values = columns[field.name]
+            values["null_count"] += array.null_count
+            if not _is_orderable(field.type):
+                continue
+            _merge_min_max(values, array)
+            if distinct:
+                batch_uniques = pc.unique(pc.drop_null(array))
+                if field.name in uniques:
+                    batch_uniques = pc.unique(pa.concat_arrays([uniques[field.name], batch_uniques]))
+                uniques[field.name] = batch_uniques
+    for field in schema:
+        if distinct and _is_orderable(field.type):
+            columns[field.name]["distinct"] = len(uniques[field.name]) if field.name in uniques else 0
+    return num_rows, columns
+
+
+def _histogram_bins(min_value: Any, max_value: Any, bins: int) -> tuple[float, float, int] | None:
+    """Return the lower bound, width, and number of bins of a histogram."""
+    if not isinstance(min_value, int | float) or not isinstance(max_value, int | float):
+        return None
+    if not (math.isfinite(min_value) and math.isfinite(max_value)):
+        return None
+    if max_value == min_value:
+        return float(min_value), 1.0, 1
+    return float(min_value), (float(max_value) - float(min_value)) / bins, bins
+
+
+def _histograms(
+    batches: Iterator[pa.RecordBatch], bins: dict[str, tuple[float, float, int]]
+) -> dict[str, Histogram]:
+    """Count the values of numeric columns in bins, one record batch at a time."""
+    counts = {name: [0] * num_bins for name, (_, _, num_bins) in bins.items()}
+    for batch in batches:
+        for name, (low, width, num_bins) in bins.items():
+            values = pc.cast(batch.column(name), pa.float64())
+            index = pc.cast(pc.floor(pc.divide(pc.subtract(values, low), width)), pa.int64(), safe=False)
+            # The maximum lands on the upper edge of the last bin, NaN on no bin
+            index = pc.min_element_wise(pc.max_element_wise(index, 0), num_bins - 1)
+            value_counts = pc.value_counts(pc.drop_null(pc.if_else(pc.is_nan(values), None, index)))
+            for bin_index, count in zip(
+                value_counts.field("values").to_pylist(),
+                value_counts.field("counts").to_pylist(),
+                strict=True,
+            ):
+                counts[name][bin_index] += count
+    return {
+        name: Histogram(edges=[low + i * width for i in range(num_bins + 1)], counts=counts[name])
+        for name, (low, width, num_bins) in bins.items()
+    }
+
+
+def _numeric_bins(
+    schema: pa.Schema, num_rows: int, values: dict[str, dict[str, Any]], bins: int
+) -> dict[str, tuple[float, float, int]]:
+    """Return the histogram bins of the numeric columns with some finite values."""
+    return {
+        field.name: hb
+        for field in schema
+        if _is_numeric(field.type)
+        and values[field.name]["null_count"] < num_rows
+        and (hb := _histogram_bins(values[field.name].get("min"), values[field.name].get("max"), bins))
+        is not None
+    }
+
+
+def _table_summary(
+    schema: pa.Schema, num_rows: int, values: dict[str, dict[str, Any]], histograms: dict[str, Histogram]
+) -> TableSummary:
+    """Build the summary of the columns from their statistics."""
+    return TableSummary(
+        num_rows=num_rows,
+        columns=[
+            ColumnSummary(
+                name=field.name,
+                type=str(field.type),
+                null_count=int(values[field.name]["null_count"]),
+                min=_json_value(values[field.name].get("min")),
+                max=_json_value(values[field.name].get("max")),
+                distinct_count=values[field.name].get("distinct"),
+                histogram=histograms.get(field.name),
+            )
+            for field in schema
+        ],
+    )
+
+
+def summarize(
+    df: dn.DataFrame,
+    parquet_path: pathlib.Path | str | None = None,
+    bins: int = DEFAULT_BINS,
+    distinct: bool = True,
+) -> TableSummary:
+    """Compute the statistics of every column of the DataFrame.
+
+    Null counts, minimums, maximums, and distinct count estimates are computed in a single
+    aggregation, skipping the statistics already stored in the Parquet file metadata if a path
+    is given.
+    Distinct counts are not stored in the metadata, so they are only estimated if ``distinct``,
+    which scans every column.
+    Histograms of numeric columns take a second pass over the record batches, as their bins
+    depend on the minimum and maximum.
+    """
+    schema: pa.Schema = df.schema()
+    known = _parquet_statistics(parquet_path, schema) if parquet_path is not None else {}
+    num_rows, values = _aggregate(df, schema, known, distinct=distinct)
+
+    histogram_bins = _numeric_bins(schema, num_rows, values, bins)
+    histograms: dict[str, Histogram] = {}
+    if histogram_bins:
+        numeric_df = df.select(*histogram_bins)
+        histograms = _histograms((b.to_pyarrow() for b in numeric_df.execute_stream()), histogram_bins)
+    return _table_summary(schema, num_rows, values, histograms)
+
+
+def summarize_batches(
+    schema: pa.Schema,
+    read: Callable[[list[str]], Iterator[pa.RecordBatch]],
+    bins: int = DEFAULT_BINS,
+    distinct: bool = True,
+) -> TableSummary:
+    """Compute the statistics of every column from record batches, one batch in memory at a time.
+
+    ``read`` streams the record batches of the given columns, and is called once for the null
+    counts, minimums, maximums, and distinct counts, then once more for the histograms.
+    Distinct counts are exact, which holds the distinct values of every column in memory.
+    """
+    num_rows, values = _aggregate_batches(read(schema.names), schema, distinct=distinct)
+    histogram_bins = _numeric_bins(schema, num_rows, values, bins)
+    histograms: dict[str, Histogram] = {}
+    if histogram_bins:
+        histograms = _histograms(read(list(histogram_bins)), histogram_bins)
+    return _table_summary(schema, num_rows, values, histograms)
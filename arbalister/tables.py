@@ -0,0 +1,107 @@
+import dataclasses
+import itertools
+import pathlib
+import threading
+from typing import Any
+
+import datafusion as dn
+import pyarrow as pa
+
+from . import arrow as abw
+from . import cache as cache
+from . import file_format as ff
+
+# Nominal size of a table that only holds the location and schema of a file
+_LISTING_TABLE_NBYTES = 1 << 10
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TableKey:
+    """Identify a table of a given file version read with given options."""
+
+    file: cache.FileKey
+    options: tuple[tuple[str, Any], ...]
+
+
+# Schemas inferred when registering files, shared by all session contexts
+_SCHEMAS = cache.LruCache[TableKey, pa.Schema](max_bytes=16 << 20)
+
+
+def pinned_schema(key: TableKey) -> pa.Schema | None:
+    """Return the schema inferred when the file was first registered, if still known."""
+    return _SCHEMAS.get(key)
+
+
+class TableRegistry:
+    """The files registered as named tables of a DataFusion session context.
+
+    A file is registered once per version and read options, so DataFrames of later requests are
+    planned from the session catalog without inferring the schema or listing the file again.
+    The schema inferred by the first registration is pinned, so registering the file in another
+    context, or again after eviction, skips inference too.
+    A table is deregistered when its file changes, or when it is the least recently used one
+    beyond the memory budget.
+    """
+
+    def __init__(self, context: dn.SessionContext, max_bytes: int) -> None:
+        self.context = context
+        self._tables = cache.LruCache[TableKey, str](max_bytes=max_bytes, on_evict=self._deregister)
+        # The registered version of each file and options
+        self._current: dict[tuple[str, tuple[tuple[str, Any], ...]], TableKey] = {}
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of registered tables."""
+        return len(self._tables)
+
+    def _deregister(self, key: TableKey, name: str) -> None:
+        self.context.deregister_table(name)
+        if self._current.get((key.file.path, key.options)) == key:
+            del self._current[(key.file.path, key.options)]
+
+    def table(
+        self,
+        file_format: ff.FileFormat,
+        path: pathlib.Path | str,
+        file: cache.FileKey | None = None,
+        **options: Any,
+    ) -> dn.DataFrame:
+        """Return the DataFrame of the registered table of the file, registering it if needed.
+
+        The version of the file is given by ``file``, defaulting to the file at ``path``, such
+        as for a dataset of several files.
+        Files of formats that cannot be registered, such as Sqlite, are read on every call.
+        """
+        register = abw.get_table_registrar(file_format)
+        if register is None:
+            read_table = abw.get_table_reader(format=file_format)
+            df: dn.DataFrame = read_table(self.context, path, **options)
+            return df
+
+        if file is None:
+            file = cache.FileKey.from_path(path)
+        key = TableKey(file=file, options=tuple(sorted(options.items())))
+        if (name := self._tables.get(key)) is not None:
+            return self.context.table(name)
+
+        # Registering can read the whole file, so concurrent requests register under distinct
+        # names and the first one to finish is kept
+        name = f"{file_format.value}_{next(self._names)}"
+        register(self.context, name, path, schema=pinned_schema(key), **options)
+        df = self.context.table(name)
+        if key not in _SCHEMAS:
+            schema = df.schema()
+            _SCHEMAS.put(key, schema, nbytes=schema.serialize().size)
+
+        nbytes = abw.loaded_nbytes(file_format, key.file) or _LISTING_TABLE_NBYTES
+        with self._lock:
+            if (registered := self._tables.get(key)) is not None:
+                self.context.deregister_table(name)
+                return self.context.table(registered)
+            previous = self._current.get((key.file.path, key.options))
+            if previous is not None and (stale := self._tables.pop(previous)) is not None:
+                self.context.deregister_table(stale)
+            self._current[(key.file.path, key.options)] = key
+            self._tables.put(key, name, nbytes=nbytes)
+        return df
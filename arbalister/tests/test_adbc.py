@@ -0,0 +1,79 @@
+import pathlib
+
+import adbc_driver_sqlite.dbapi as adbc_sqlite
+import pyarrow as pa
+import pytest
+
+import arbalister.adbc as adbc
+
+
+@pytest.fixture
+def sqlite_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Write a Sqlite file whose rowids have gaps, and a table without rowid."""
+    path = tmp_path / "data.sqlite"
+    adbc.write_sqlite(pa.table({"idx": list(range(1_000))}), path, table_name="numbers")
+    with adbc_sqlite.connect(str(path)) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM numbers WHERE idx % 3 = 0")
+            cursor.execute("CREATE TABLE no_rowid (idx INTEGER PRIMARY KEY) WITHOUT ROWID")
+            cursor.execute("INSERT INTO no_rowid SELECT idx FROM numbers")
+        connection.commit()
+    return path
+
+
+@pytest.mark.parametrize("table_name", ["numbers", "no_rowid"])
+@pytest.mark.parametrize(("offset", "count"), [(0, 10), (45, 20), (500, 100), (660, 10)])
+def test_keyset_pagination(
+    sqlite_file: pathlib.Path, monkeypatch: pytest.MonkeyPatch, table_name: str, offset: int, count: int
+) -> None:
+    """Deep pages match the rows of a plain offset query."""
+    monkeypatch.setattr(adbc, "ROWID_STRIDE", 16)
+    expected = pa.table({"idx": [i for i in range(1_000) if i % 3 != 0]}).slice(offset, count)
+
+    df = adbc.SqliteDataFrame.read_sqlite(None, sqlite_file, table_name=table_name)
+    assert df.count() == 666
+    assert (df._rowid_checkpoints is None) == (table_name == "no_rowid")
+
+    result = df.limit(count, offset).to_arrow_table()
+    assert result.column("idx").to_pylist() == expected.column("idx").to_pylist()
+
+
+def test_pages_ignore_covering_index(tmp_path: pathlib.Path) -> None:
+    """Pages follow the rowid order even when SQLite scans a covering index in another order."""
+    path = tmp_path / "indexed.sqlite"
+    num_rows = 100
+    table = pa.table(
+        {"name": [f"name {num_rows - i:03}" for i in range(num_rows)], "text": ["x" * 100] * num_rows}
+    )
+    adbc.write_sqlite(table, path, table_name="indexed")
+    with adbc_sqlite.connect(str(path)) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE INDEX name_index ON indexed (name)")
+        connection.commit()
+
+    df = adbc.SqliteDataFrame.read_sqlite(None, path, table_name="indexed").select("name")
+    pages = [df.limit(10, offset).to_arrow_table() for offset in range(0, num_rows, 10)]
+    assert pa.concat_tables(pages).column("name") == table.column("name")
+
+    df = df.sort("text")
+    pages = [df.limit(10, offset).to_arrow_table() for offset in range(0, num_rows, 10)]
+    assert pa.concat_tables(pages).column("name") == table.column("name")
+
+
+def test_metadata_cached_until_file_changes(sqlite_file: pathlib.Path) -> None:
+    """Table metadata is refreshed when the file changes."""
+    assert adbc.get_table_info(sqlite_file, "numbers").num_rows == 666
+    assert adbc.get_table_info(sqlite_file, "numbers") is adbc.get_table_info(sqlite_file, "numbers")
+
+    adbc.write_sqlite(pa.table({"idx": [-1]}), sqlite_file, table_name="numbers", mode="append")
+    assert adbc.get_table_info(sqlite_file, "numbers").num_rows == 667
+
+
+def test_connection_pool_reuses_connections(sqlite_file: pathlib.Path) -> None:
+    """Connections are returned to the pool and reused."""
+    pool = adbc.ConnectionPool()
+    with pool.connect(sqlite_file) as first:
+        pass
+    with pool.connect(sqlite_file) as second:
+        assert second is first
+    pool.clear()
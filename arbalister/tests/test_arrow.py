@@ -0,0 +1,112 @@
+import pathlib
+
+import datafusion as dn
+import pyarrow as pa
+import pyarrow.feather
+import pytest
+
+import arbalister.arrow as aa
+import arbalister.csv_index as csv_index
+import arbalister.file_format as ff
+
+
+@pytest.fixture
+def large_table() -> pa.Table:
+    """Generate a table large enough to notice memory copies."""
+    return pa.table({f"col_{i}": pa.array(range(100_000), pa.int64()) for i in range(4)})
+
+
+def test_read_ipc_is_zero_copy(tmp_path: pathlib.Path, large_table: pa.Table) -> None:
+    """Uncompressed IPC files are memory mapped rather than loaded in memory."""
+    path = tmp_path / "table.arrow"
+    pyarrow.feather.write_feather(large_table, path, compression="uncompressed")
+
+    read_table = aa.get_table_reader(ff.FileFormat.Ipc)
+    allocated_before = pa.total_allocated_bytes()
+    df = read_table(dn.SessionContext(), path)
+    assert pa.total_allocated_bytes() - allocated_before < large_table.nbytes // 10
+
+    assert df.limit(10, 50_000).to_arrow_table() == large_table.slice(50_000, 10)
+
+
+@pytest.mark.filterwarnings("ignore:Feather V1:DeprecationWarning")
+def test_read_ipc_feather_v1(tmp_path: pathlib.Path, large_table: pa.Table) -> None:
+    """Legacy Feather V1 files can still be read."""
+    path = tmp_path / "table.feather"
+    pyarrow.feather.write_feather(large_table, path, version=1)
+
+    read_table = aa.get_table_reader(ff.FileFormat.Ipc)
+    df = read_table(dn.SessionContext(), path)
+    assert df.to_arrow_table() == large_table
+
+
+def test_csv_stats_estimate(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Large CSV files report an estimated number of rows from a sample."""
+    num_rows = 100_000
+    table = pa.table({"idx": list(range(num_rows, 2 * num_rows)), "name": ["some name"] * num_rows})
+    path = tmp_path / "table.csv"
+    aa.get_table_writer(ff.FileFormat.Csv)(table, path)
+
+    read_stats = aa.get_stats_reader(ff.FileFormat.Csv)
+    assert read_stats is not None
+    assert read_stats(path, delimiter=",") is None
+
+    monkeypatch.setattr(aa, "CSV_EXACT_COUNT_MAX_BYTES", 0)
+    monkeypatch.setattr(aa, "CSV_SAMPLE_BYTES", 64 << 10)
+    stats = read_stats(path, delimiter=",")
+    assert stats is not None
+    assert not stats.exact
+    assert abs(stats.num_rows - num_rows) < num_rows * 0.05
+
+
+@pytest.mark.parametrize(
+    ("header", "row"),
+    [("x" * 1000, "value"), ("name", "x" * 1000), ("a,b", "1,2,3" + " " * 200)],
+    ids=["long-header", "long-row", "extra-field"],
+)
+def test_csv_stats_invalid_sample(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, header: str, row: str
+) -> None:
+    """Samples without a complete row, or that fail to parse, leave the number of rows unknown."""
+    path = tmp_path / "table.csv"
+    path.write_text("\n".join([header, row, row]) + "\n")
+
+    monkeypatch.setattr(aa, "CSV_EXACT_COUNT_MAX_BYTES", 0)
+    monkeypatch.setattr(aa, "CSV_SAMPLE_BYTES", 500)
+    read_stats = aa.get_stats_reader(ff.FileFormat.Csv)
+    assert read_stats is not None
+    assert read_stats(path, delimiter=",") is None
+
+
+@pytest.mark.parametrize(("offset", "count"), [(0, 10), (95, 10), (250, 200), (990, 20), (2_000, 10), (0, 0)])
+def test_read_parquet_window(tmp_path: pathlib.Path, large_table: pa.Table, offset: int, count: int) -> None:
+    """Parquet windows read across row groups match a plain slice."""
+    import pyarrow.parquet
+
+    table = large_table.slice(0, 1_000)
+    path = tmp_path / "table.parquet"
+    pyarrow.parquet.write_table(table, path, row_group_size=100)
+
+    read_window = aa.get_window_reader(ff.FileFormat.Parquet)
+    assert read_window is not None
+    schema = table.select(["col_1", "col_3"]).schema
+    window = read_window(path, offset=offset, count=count, schema=schema)
+    assert window == table.select(["col_1", "col_3"]).slice(offset, count)
+
+
+def test_read_csv_window_nulls(tmp_path: pathlib.Path) -> None:
+    """CSV windows read the same null and null-like values as DataFusion."""
+    path = tmp_path / "nulls.csv"
+    values = ["NA", "N/A", "NULL", "null", "nan", "NaN", "-", "", '""', "text"]
+    path.write_text(
+        "idx,value,number\n" + "".join(f"{i},{v},{i if v else ''}\n" for i, v in enumerate(values))
+    )
+    assert csv_index.get_indexer().get(path, wait=True) is not None
+
+    expected = dn.SessionContext().read_csv(path).to_arrow_table()
+    read_window = aa.get_window_reader(ff.FileFormat.Csv)
+    assert read_window is not None
+    window = read_window(path, offset=0, count=len(values), schema=expected.schema, delimiter=",")
+
+    assert window is not None
+    assert window.to_pylist() == expected.to_pylist()
@@ -0,0 +1,63 @@
+import pathlib
+
+import arbalister.cache as cache
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """Values are evicted in least recently used order to stay within budget."""
+    lru = cache.LruCache[str, int](max_bytes=10)
+    lru.put("a", 1, nbytes=4)
+    lru.put("b", 2, nbytes=4)
+    assert lru.get("a") == 1
+    lru.put("c", 3, nbytes=4)
+
+    assert "a" in lru
+    assert "b" not in lru
+    assert "c" in lru
+    assert lru.nbytes == 8
+
+
+def test_lru_cache_skips_oversized_values() -> None:
+    """Values larger than the budget are not stored."""
+    lru = cache.LruCache[str, int](max_bytes=10)
+    assert lru.get_or_insert("a", lambda: 1, nbytes=lambda _: 11) == 1
+    assert len(lru) == 0
+    assert lru.nbytes == 0
+
+
+def test_lru_cache_on_evict() -> None:
+    """The eviction callback sees the values dropped to stay within budget, but not popped ones."""
+    evicted: list[tuple[str, int]] = []
+    lru = cache.LruCache[str, int](max_bytes=10, on_evict=lambda k, v: evicted.append((k, v)))
+    lru.put("a", 1, nbytes=4)
+    lru.put("b", 2, nbytes=4)
+    lru.put("c", 3, nbytes=4)
+    lru.put("d", 4, nbytes=11)
+    lru.pop("b")
+
+    assert evicted == [("a", 1), ("d", 4)]
+
+
+def test_lru_cache_get_or_insert_calls_factory_once() -> None:
+    """The factory is only called on a cache miss."""
+    lru = cache.LruCache[str, int](max_bytes=10)
+    calls: list[str] = []
+
+    def factory() -> int:
+        calls.append("called")
+        return 42
+
+    assert lru.get_or_insert("a", factory, nbytes=lambda _: 1) == 42
+    assert lru.get_or_insert("a", factory, nbytes=lambda _: 1) == 42
+    assert calls == ["called"]
+
+
+def test_file_key_changes_with_file(tmp_path: pathlib.Path) -> None:
+    """The file identity changes when the file content changes."""
+    file = tmp_path / "data.csv"
+    file.write_text("a\n1\n")
+    key_before = cache.FileKey.from_path(file)
+    assert key_before == cache.FileKey.from_path(file)
+
+    file.write_text("a\n1\n2\n")
+    assert key_before != cache.FileKey.from_path(file)
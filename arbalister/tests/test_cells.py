@@ -0,0 +1,39 @@
+import pyarrow as pa
+import pytest
+
+import arbalister.cells as cells
+
+
+@pytest.mark.parametrize(
+    ("values", "data_type", "expected"),
+    [
+        (["abc", "abcdef", None], pa.string(), ["abc", "abcd…", None]),
+        (["abcdef"], pa.large_string(), ["abcd…"]),
+        # Multi-byte characters straddling the limit are kept whole
+        (["aéé"], pa.string(), ["aéé…"]),
+        (["€€"], pa.string(), ["€€…"]),
+        ([b"\x00\x01\x02\x03\x04", b"ok"], pa.binary(), [b"\x00\x01\x02\x03\xe2\x80\xa6", b"ok"]),
+    ],
+)
+def test_truncate_column(values: list[object], data_type: pa.DataType, expected: list[object]) -> None:
+    """Test that long values are cut and marked as longer than the limit."""
+    column = pa.array(values, type=data_type)
+    truncated = cells.truncate_column(column, max_cell_bytes=4)
+
+    assert truncated.type == data_type
+    assert truncated.to_pylist() == expected
+    for before, after in zip(column.to_pylist(), truncated.to_pylist(), strict=True):
+        if before is not None:
+            encoded = after.encode() if isinstance(after, str) else after
+            was_truncated = before != after
+            assert (len(encoded) > 4) == was_truncated
+
+
+def test_truncate_cells_schema() -> None:
+    """Test that only string and binary fields are marked with the limit."""
+    batch = pa.record_batch({"text": ["a" * 10], "number": [1]})
+    truncated = cells.truncate_cells(batch, max_cell_bytes=4)
+
+    assert truncated.schema.field("text").metadata == {b"max_cell_bytes": b"4"}
+    assert truncated.schema.field("number").metadata is None
+    assert truncated.column("number") == batch.column("number")
@@ -0,0 +1,61 @@
+import pathlib
+
+import pytest
+
+import arbalister.csv_index as csv_index
+
+ROWS = [f"{i},name {i}" for i in range(100)]
+
+
+@pytest.fixture
+def csv_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Write a CSV file with quoted newlines and no trailing newline."""
+    rows = [*ROWS]
+    rows[10] = '10,"name\n10"'
+    rows[33] = '33,"name ""with"" quotes\n33"'
+    path = tmp_path / "data.csv"
+    path.write_bytes(("idx,name\n" + "\n".join(rows)).encode())
+    return path
+
+
+def test_build_index(csv_file: pathlib.Path) -> None:
+    """Offsets point to the start of every stride-th row despite quoted newlines."""
+    index = csv_index.build_index(csv_file, stride=7)
+    data = csv_file.read_bytes()
+
+    assert index.header == b"idx,name\n"
+    assert index.num_rows == len(ROWS)
+    assert len(index.offsets) == -(-len(ROWS) // 7)
+    for i, offset in enumerate(index.offsets):
+        assert data[offset:].startswith(f"{i * 7},".encode())
+
+
+@pytest.mark.parametrize(("offset", "count"), [(0, 5), (5, 10), (30, 7), (95, 10), (200, 10)])
+def test_byte_range(csv_file: pathlib.Path, offset: int, count: int) -> None:
+    """The byte range covers the requested rows."""
+    index = csv_index.build_index(csv_file, stride=7)
+    data = csv_file.read_bytes()
+
+    start, end, first_row = index.byte_range(offset=offset, count=count)
+    assert first_row <= offset
+    if offset < index.num_rows:
+        assert data[start:].startswith(f"{first_row},".encode())
+        last_row = min(offset + count, index.num_rows) - 1
+        assert f"\n{last_row}," in data[:end].decode()
+
+
+def test_indexer_persists_index(csv_file: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    """Indexes are reloaded from disk and rebuilt when the file changes."""
+    indexer = csv_index.CsvIndexer(cache_dir=tmp_path / "cache", stride=7)
+    assert indexer.get(csv_file, wait=True) is not None
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    other_indexer = csv_index.CsvIndexer(cache_dir=tmp_path / "cache", stride=7)
+    index = other_indexer.get(csv_file)
+    assert index is not None
+    assert index.num_rows == len(ROWS)
+
+    csv_file.write_bytes(csv_file.read_bytes() + b"\n100,name 100\n")
+    index = other_indexer.get(csv_file, wait=True)
+    assert index is not None
+    assert index.num_rows == len(ROWS) + 1
@@ -0,0 +1,128 @@
+import os
+import pathlib
+
+import datafusion as dn
+import pyarrow as pa
+import pyarrow.parquet
+import pytest
+
+import arbalister.arrow as aa
+import arbalister.datasets as datasets
+import arbalister.file_format as ff
+
+
+@pytest.fixture
+def lake(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Write a hive partitioned Parquet dataset, with files of uneven sizes and a marker file."""
+    root = tmp_path / "lake"
+    start = 0
+    for i, partition in enumerate(["year=2023/month=01", "year=2023/month=02", "year=2024/month=01"]):
+        for name in ["part-0", "part-1"]:
+            num_rows = 3 + 2 * i
+            table = pa.table({"idx": list(range(start, start + num_rows)), "name": [name] * num_rows})
+            (root / partition).mkdir(parents=True, exist_ok=True)
+            pyarrow.parquet.write_table(table, root / partition / f"{name}.parquet", row_group_size=2)
+            start += num_rows
+    (root / "_SUCCESS").write_text("")
+    return root
+
+
+def scan(dataset: datasets.Dataset) -> pa.Table:
+    """Read the whole dataset with DataFusion, in file order."""
+    ctx = dn.SessionContext(dn.SessionConfig().with_target_partitions(1))
+    register = aa.get_table_registrar(ff.FileFormat.Parquet)
+    assert register is not None
+    register(ctx, "lake", dataset.table_path, **dataset.table_options)
+    return ctx.table("lake").to_arrow_table()
+
+
+def test_discover(lake: pathlib.Path) -> None:
+    """Files are listed in path order, with their partition values."""
+    dataset = datasets.discover(lake)
+    assert dataset.file_format == ff.FileFormat.Parquet
+    assert dataset.partition_columns == ("year", "month")
+    assert [pathlib.Path(f.file.path).relative_to(lake).as_posix() for f in dataset.files] == [
+        "year=2023/month=01/part-0.parquet",
+        "year=2023/month=01/part-1.parquet",
+        "year=2023/month=02/part-0.parquet",
+        "year=2023/month=02/part-1.parquet",
+        "year=2024/month=01/part-0.parquet",
+        "year=2024/month=01/part-1.parquet",
+    ]
+    assert dataset.files[-1].partition_values == ("2024", "01")
+    assert datasets.read_stats(dataset).num_rows == scan(dataset).num_rows == 30
+
+    pattern = datasets.discover(lake / "part-1*")
+    assert len(pattern.files) == 3
+    assert datasets.read_stats(pattern).num_rows == scan(pattern).num_rows == 15
+
+
+def test_discover_other_layouts(lake: pathlib.Path) -> None:
+    """Files outside the partition directories are skipped, or rejected before DataFusion skips them."""
+    (lake / "_temporary").mkdir()
+    pyarrow.parquet.write_table(pa.table({"idx": [-1]}), lake / "_temporary" / "part-9.parquet")
+    if not datasets.SKIPS_OTHER_LAYOUTS:
+        with pytest.raises(ValueError, match="year/month partition directories"):
+            datasets.discover(lake)
+        return
+    dataset = datasets.discover(lake)
+    assert len(dataset.files) == 6
+    assert datasets.read_stats(dataset).num_rows == scan(dataset).num_rows == 30
+
+
+def test_discover_invalid(lake: pathlib.Path) -> None:
+    """Datasets of unsupported formats or without files are rejected."""
+    with pytest.raises(ValueError, match="not supported"):
+        datasets.discover(lake / "*.csv")
+    with pytest.raises(ValueError, match="No parquet files"):
+        datasets.discover(lake / "other-*.parquet")
+    with pytest.raises(ValueError, match="only supported in file names"):
+        datasets.discover(lake / "year=*" / "*.parquet")
+
+
+def test_key_changes_with_files(lake: pathlib.Path) -> None:
+    """The dataset version changes when a file is added."""
+    key = datasets.discover(lake).key
+    assert datasets.discover(lake).key == key
+
+    pyarrow.parquet.write_table(
+        pa.table({"idx": [100], "name": ["x"]}), lake / "year=2024" / "month=01" / "x.parquet"
+    )
+    assert datasets.discover(lake).key != key
+
+
+def test_listing_reused(lake: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The files are listed again only once a directory of the dataset changes."""
+    for directory in [lake, *lake.glob("year=*"), *lake.glob("year=*/month=*")]:
+        os.utime(directory, ns=(0, 0))
+    listed: list[pathlib.Path] = []
+    list_files = datasets._list
+
+    def record(path: pathlib.Path) -> tuple[datasets.Dataset, tuple[tuple[str, int], ...]]:
+        listed.append(path)
+        return list_files(path)
+
+    monkeypatch.setattr(datasets, "_list", record)
+    key = datasets.discover(lake).key
+    assert datasets.discover(lake).key == key
+    assert len(listed) == 1
+
+    pyarrow.parquet.write_table(
+        pa.table({"idx": [100], "name": ["x"]}), lake / "year=2023" / "month=02" / "x.parquet"
+    )
+    assert len(datasets.discover(lake).files) == 7
+    assert len(listed) == 2
+
+
+@pytest.mark.parametrize(("offset", "count"), [(0, 3), (2, 6), (7, 13), (25, 10), (40, 5)])
+def test_read_window(lake: pathlib.Path, offset: int, count: int) -> None:
+    """Windows read from the covering files match the DataFusion scan of the dataset."""
+    dataset = datasets.discover(lake)
+    expected = scan(dataset)
+
+    window = datasets.read_window(dataset, offset=offset, count=count, schema=expected.schema)
+    assert window == expected.slice(offset, count)
+
+    partitions_only = pa.schema([expected.schema.field("month")])
+    window = datasets.read_window(dataset, offset=offset, count=count, schema=partitions_only)
+    assert window == expected.select(["month"]).slice(offset, count)
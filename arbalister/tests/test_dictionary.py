@@ -0,0 +1,40 @@
+import pyarrow as pa
+
+import arbalister.dictionary as dictionary
+
+
+def test_low_cardinality_columns() -> None:
+    """Test that only string columns with few distinct values are selected."""
+    batch = pa.record_batch(
+        {
+            "status": ["open", "closed", None, "open"] * 10,
+            "id": [str(i) for i in range(40)],
+            "code": [1, 2] * 20,
+            "empty": pa.array([None] * 40, type=pa.string()),
+        }
+    )
+    assert dictionary.low_cardinality_columns(batch) == ["status"]
+
+
+def test_dictionary_encoder_deltas() -> None:
+    """Test that consecutive batches only add new values to the dictionaries."""
+    schema = pa.schema({"country": pa.large_string(), "value": pa.int64()})
+    batches = [
+        pa.record_batch({"country": ["fr", "de", "fr", None, "de"], "value": [1, 2, 3, 4, 5]}, schema=schema),
+        pa.record_batch({"country": ["it", "fr", "it", "es"], "value": [6, 7, 8, 9]}, schema=schema),
+    ]
+    encoder = dictionary.DictionaryEncoder.from_sample(schema, batches[0])
+    assert encoder.schema.field("country").type == pa.dictionary(pa.int32(), pa.large_string())
+    assert encoder.schema.field("value").type == pa.int64()
+
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pa.ipc.new_stream(sink, encoder.schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(encoder.encode(batch))
+        assert writer.stats.num_dictionary_deltas == 1
+        assert writer.stats.num_replaced_dictionaries == 0
+
+    table = pa.ipc.open_stream(sink.getvalue()).read_all()
+    assert table.column("country").chunk(1).dictionary.to_pylist() == ["fr", "de", "it", "es"]
+    assert table.cast(schema) == pa.Table.from_batches(batches)
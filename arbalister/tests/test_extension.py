@@ -0,0 +1,38 @@
+import json
+import pathlib
+import subprocess
+import sys
+
+import arbalister as arb
+import arbalister.extension
+
+
+def test_load_extension_is_lazy() -> None:
+    """Loading the server extension does not import the data engines."""
+    code = """
+import json, logging, sys, types
+import tornado.web
+
+import arbalister
+
+server_app = types.SimpleNamespace(
+    web_app=tornado.web.Application(base_url="/"), log=logging.getLogger("test")
+)
+arbalister._load_jupyter_server_extension(server_app)
+print(json.dumps([m for m in ["datafusion", "pyarrow", "jupyterlab"] if m in sys.modules]))
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=pathlib.Path(arb.__file__).parents[1],
+    ).stdout
+
+    assert json.loads(output.splitlines()[-1]) == []
+
+
+def test_routes_match_handlers() -> None:
+    """Every deferred route names a handler of the routes module."""
+    for _, name in arb.extension.ROUTES:
+        assert issubclass(getattr(arb.routes, name), arb.routes.BaseRouteHandler)
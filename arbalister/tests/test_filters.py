@@ -0,0 +1,52 @@
+import pytest
+
+import arbalister.filters as filters
+
+
+def test_parse_precedence() -> None:
+    """And binds tighter than or, and parentheses override it."""
+    expr = filters.parse("a == 1 or b > 2.5 and not c is null")
+    assert expr == filters.Or(
+        filters.Compare("==", filters.Column("a"), filters.Value(1)),
+        filters.And(
+            filters.Compare(">", filters.Column("b"), filters.Value(2.5)),
+            filters.Not(filters.IsNull(filters.Column("c"))),
+        ),
+    )
+
+    expr = filters.parse("(a = 1 OR b > 2) AND c IS NOT NULL")
+    assert expr == filters.And(
+        filters.Or(
+            filters.Compare("==", filters.Column("a"), filters.Value(1)),
+            filters.Compare(">", filters.Column("b"), filters.Value(2)),
+        ),
+        filters.IsNull(filters.Column("c"), negated=True),
+    )
+
+
+def test_parse_literals_and_identifiers() -> None:
+    """Strings, booleans, and quoted identifiers are parsed with their escapes."""
+    expr = filters.parse("`my ``col``` != 'it''s' and flag == true and x <= -1e3")
+    assert expr == filters.And(
+        filters.And(
+            filters.Compare("!=", filters.Column("my `col`"), filters.Value("it's")),
+            filters.Compare("==", filters.Column("flag"), filters.Value(True)),
+        ),
+        filters.Compare("<=", filters.Column("x"), filters.Value(-1e3)),
+    )
+    assert filters.columns(expr) == {"my `col`", "flag", "x"}
+
+
+@pytest.mark.parametrize("text", ["", "a ==", "a == 1 and", "(a == 1", "a 1", "a == 1)", "a ~ 1", "and"])
+def test_parse_errors(text: str) -> None:
+    """Invalid expressions raise a syntax error."""
+    with pytest.raises(filters.FilterSyntaxError):
+        filters.parse(text)
+
+
+def test_to_sql() -> None:
+    """Expressions are translated to SQL with bound parameters."""
+    expr = filters.parse("a == 'x' or not (b < 3 and c is null)")
+    sql, params = filters.to_sql(expr)
+    assert sql == '(("a" = ?) OR (NOT (("b" < ?) AND ("c" IS NULL))))'
+    assert params == ["x", 3]
@@ -0,0 +1,68 @@
+from typing import Iterator
+
+import pytest
+
+import arbalister.metrics as metrics
+
+
+def test_request_timings() -> None:
+    """Phases accumulate their durations and iterating closes the underlying iterator."""
+    timings = metrics.RequestTimings()
+    timings.add("open", 0.5)
+    timings.add("execute", 0.25)
+    timings.add("open", 0.5)
+    closed: list[bool] = []
+
+    def produce() -> Iterator[int]:
+        try:
+            yield from range(3)
+        finally:
+            closed.append(True)
+
+    items = timings.iterate("plan", produce())
+    assert next(items) == 0
+    items.close()  # type: ignore[attr-defined]
+    timings.count(rows=3, nbytes=10)
+
+    assert closed == [True]
+    assert list(timings.durations) == ["open", "execute", "plan"]
+    assert timings.durations["open"] == pytest.approx(1.0)
+    assert (timings.rows, timings.bytes) == (3, 10)
+    assert timings.server_timing().startswith("open;dur=1000.00, execute;dur=250.00, plan;dur=")
+
+
+def test_histogram() -> None:
+    """Values are counted in the first bucket whose bound is not lower, cumulated in the output."""
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.render("duration", 'route="a"') == [
+        'duration_bucket{route="a",le="0.1"} 2',
+        'duration_bucket{route="a",le="1.0"} 3',
+        'duration_bucket{route="a",le="+Inf"} 4',
+        'duration_sum{route="a"} 2.65',
+        'duration_count{route="a"} 4',
+    ]
+
+
+def test_metrics_render() -> None:
+    """Requests are aggregated per route and format."""
+    registry = metrics.Metrics(buckets=(1.0,))
+    timings = metrics.RequestTimings()
+    timings.add("execute", 0.5)
+    timings.count(rows=10, nbytes=100)
+    registry.observe("stream", "csv", 200, 0.75, timings)
+    registry.observe("stream", "csv", 200, 1.5, timings)
+    registry.observe("stats", "csv", 400, 0.1, metrics.RequestTimings())
+
+    text = registry.render()
+
+    assert 'arbalister_requests_total{route="stream",format="csv",status="200"} 2' in text
+    assert 'arbalister_requests_total{route="stats",format="csv",status="400"} 1' in text
+    assert 'arbalister_request_duration_seconds_bucket{route="stream",format="csv",le="1.0"} 1' in text
+    assert 'arbalister_phase_duration_seconds_sum{route="stream",format="csv",phase="execute"} 1.0' in text
+    assert 'arbalister_rows_total{route="stream",format="csv"} 20' in text
+    assert 'arbalister_bytes_total{route="stats",format="csv"} 0' in text
+    assert text.count("# TYPE") == 5
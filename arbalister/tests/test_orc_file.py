@@ -0,0 +1,114 @@
+import pathlib
+
+import pyarrow as pa
+import pyarrow.orc
+import pytest
+
+import arbalister.arrow as aa
+import arbalister.file_format as ff
+import arbalister.orc_file as orc_file
+
+
+@pytest.fixture(scope="module")
+def table() -> pa.Table:
+    """Generate a table spanning many stripes."""
+    num_rows = 100_000
+    return pa.table({"idx": list(range(num_rows)), "name": [f"name_{i}" for i in range(num_rows)]})
+
+
+@pytest.mark.parametrize("compression", ["uncompressed", "zlib", "snappy", "lz4", "zstd"])
+def test_read_index(tmp_path: pathlib.Path, table: pa.Table, compression: str) -> None:
+    """The footer index has the stripe row counts of the file."""
+    path = tmp_path / "table.orc"
+    pyarrow.orc.write_table(table, path, stripe_size=1 << 16, compression=compression)
+    reader = pyarrow.orc.ORCFile(path)
+
+    index = orc_file.read_index(path)
+
+    assert index is not None
+    assert index.num_rows == table.num_rows
+    assert len(index.stripes) == reader.nstripes
+    assert [s.num_rows for s in index.stripes] == [
+        reader.read_stripe(i).num_rows for i in range(reader.nstripes)
+    ]
+    for prev, stripe in zip(index.stripes[:-1], index.stripes[1:], strict=True):
+        assert stripe.offset == prev.offset + prev.size
+        assert stripe.row_offset == prev.row_offset + prev.num_rows
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        out.append(value & 0x7F | (0x80 if value > 0x7F else 0))
+        value >>= 7
+        if not value:
+            return bytes(out)
+
+
+def test_read_index_lz4_footer(tmp_path: pathlib.Path, table: pa.Table) -> None:
+    """LZ4 compressed footers, as written by the Java ORC writer, are decompressed to their exact size.
+
+    Arrow stores small footers uncompressed, so the footer is compressed again here.
+    """
+    path = tmp_path / "table.orc"
+    pyarrow.orc.write_table(table, path, stripe_size=1 << 16, compression="lz4")
+    data = path.read_bytes()
+    postscript_size = data[-1]
+    postscript = list(orc_file._iter_fields(data[-1 - postscript_size : -1]))
+    footer_size = int(dict(postscript)[1])
+    chunk = data[-1 - postscript_size - footer_size : -1 - postscript_size]
+    assert chunk[0] & 1, "Arrow stores the footer in an uncompressed chunk"
+
+    footer = pa.Codec("lz4_raw").compress(chunk[3:], asbytes=True)
+    compressed_chunk = (len(footer) << 1).to_bytes(3, "little") + footer
+    new_postscript = b""
+    for number, value in postscript:
+        if number == 1:
+            value = len(compressed_chunk)
+        if isinstance(value, bytes):
+            new_postscript += _encode_varint(number << 3 | 2) + _encode_varint(len(value)) + value
+        else:
+            new_postscript += _encode_varint(number << 3) + _encode_varint(value)
+    path.write_bytes(
+        data[: -1 - postscript_size - footer_size]
+        + compressed_chunk
+        + new_postscript
+        + bytes([len(new_postscript)])
+    )
+
+    index = orc_file.read_index(path)
+
+    reader = pyarrow.orc.ORCFile(tmp_path / "table.orc")
+    assert index is not None
+    assert [s.num_rows for s in index.stripes] == [
+        reader.read_stripe(i).num_rows for i in range(reader.nstripes)
+    ]
+
+
+def test_lz4_decompress_overlapping_matches() -> None:
+    """Matches overlapping the bytes they produce repeat them."""
+    data = b"abc" * 1000 + bytes(range(256)) + b"z" * 300
+    assert orc_file._lz4_decompress(pa.Codec("lz4_raw").compress(data, asbytes=True)) == data
+
+
+def test_read_index_invalid(tmp_path: pathlib.Path) -> None:
+    """Files without the ORC postscript magic are rejected."""
+    path = tmp_path / "table.orc"
+    path.write_bytes(b"\x00" * 64)
+
+    with pytest.raises(ValueError, match="Not an ORC file"):
+        orc_file.read_index(path)
+
+
+@pytest.mark.parametrize(("offset", "count"), [(0, 10), (12_345, 2_000), (99_990, 100), (200_000, 10)])
+def test_read_window(tmp_path: pathlib.Path, table: pa.Table, offset: int, count: int) -> None:
+    """A window of rows is read from the stripes covering it."""
+    path = tmp_path / "table.orc"
+    pyarrow.orc.write_table(table, path, stripe_size=1 << 16, compression="zstd")
+    read_window = aa.get_window_reader(ff.FileFormat.Orc)
+    assert read_window is not None
+
+    window = read_window(path, offset=offset, count=count, schema=table.select(["name"]).schema)
+
+    assert window is not None
+    assert window.to_pylist() == table.select(["name"]).slice(offset, count).to_pylist()
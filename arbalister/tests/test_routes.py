@@ -1,17 +1,34 @@
+import asyncio
 import base64
 import dataclasses
 import json
 import pathlib
 import random
 import string
-from typing import Awaitable, Callable
+import threading
+from typing import Any, Awaitable, Callable
 
 import pyarrow as pa
 import pytest
 import tornado
 
 import arbalister as arb
+import arbalister.csv_index as csv_index
 import arbalister.file_format as ff
+import arbalister.summary as summary
+
+
+@pytest.fixture
+def jp_server_config(jp_server_config: dict[str, Any], tmp_path: pathlib.Path) -> dict[str, Any]:
+    """Scan in parallel partitions even on machines with a single CPU, and cache tiles on disk."""
+    return {
+        **jp_server_config,
+        "Arbalister": {
+            "query_partitions": 4,
+            "cache_dir": str(tmp_path / "cache"),
+            "tile_cache_bytes": 1 << 20,
+        },
+    }
 
 
 @pytest.fixture(
@@ -256,3 +273,594 @@ async def test_file_info_route_sqlite(
             assert "dummy_table_1" in info["table_names"]
             assert "dummy_table_2" in info["table_names"]
             assert default_options["table_name"] == info["table_names"][0]
+
+
+async def test_ipc_route_streams_batches(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that large results are streamed as multiple record batches."""
+    table = pa.table({"idx": list(range(20_000))})
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(table, jp_root_dir / "large.parquet")
+
+    response = await jp_fetch("arrow/stream", "large.parquet")
+
+    assert response.code == 200
+    reader = pa.ipc.open_stream(response.body)
+    batches = list(reader)
+    assert len(batches) > 1
+    assert pa.Table.from_batches(batches, schema=reader.schema) == table
+
+
+async def test_stats_route_sees_file_changes(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that cached DataFrames are invalidated when the file changes."""
+    write_table = arb.arrow.get_table_writer(ff.FileFormat.Ipc)
+
+    write_table(pa.table({"idx": list(range(5))}), jp_root_dir / "changing.arrow")
+    response = await jp_fetch("arrow/stats", "changing.arrow")
+    assert json.loads(response.body)["num_rows"] == 5
+
+    write_table(pa.table({"idx": list(range(7))}), jp_root_dir / "changing.arrow")
+    response = await jp_fetch("arrow/stats", "changing.arrow")
+    assert json.loads(response.body)["num_rows"] == 7
+
+
+async def test_ipc_route_csv_index(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that deep CSV chunks read with the row index match the file content."""
+    num_rows = 20_000
+    table = pa.table({"idx": list(range(num_rows)), "text": [f"line\n{i}" for i in range(num_rows)]})
+    arb.arrow.get_table_writer(ff.FileFormat.Csv)(table, jp_root_dir / "indexed.csv")
+    index = csv_index.get_indexer().get(jp_root_dir / "indexed.csv", wait=True)
+    assert index is not None
+    assert index.num_rows == num_rows
+
+    params = arb.routes.IpcParams(row_chunk=13, row_chunk_size=1000, col_chunk=0, col_chunk_size=2)
+    response = await jp_fetch(
+        "arrow/stream", "indexed.csv", params={k: str(v) for k, v in dataclasses.asdict(params).items()}
+    )
+
+    payload = pa.ipc.open_stream(response.body).read_all()
+    assert payload == table.slice(13_000, 1000).cast(payload.schema)
+
+
+async def test_ipc_route_query(
+    jp_fetch: JpFetch,
+    full_table: pa.Table,
+    table_file: pathlib.Path,
+    file_params: arb.routes.FileReadOptions,
+) -> None:
+    """Test that filtered and sorted chunks and stats are computed on the server."""
+    import pyarrow.compute as pc
+
+    col = "sequence" if "sequence" in full_table.schema.names else "id"
+    query = arb.routes.QueryParams(filter=f"{col} >= 3 and {col} != 5", sort_by=col, descending=True)
+    query_params = {
+        k: str(v)
+        for k, v in {**dataclasses.asdict(query), **dataclasses.asdict(file_params)}.items()
+        if v is not None
+    }
+
+    mask = pc.and_(pc.greater_equal(full_table[col], 3), pc.not_equal(full_table[col], 5))
+    expected = full_table.filter(mask).sort_by([(col, "descending")])
+
+    response = await jp_fetch("arrow/stats", str(table_file), params=query_params)
+    assert json.loads(response.body)["num_rows"] == expected.num_rows
+
+    for row_chunk in range(2):
+        response = await jp_fetch(
+            "arrow/stream",
+            str(table_file),
+            params={**query_params, "row_chunk": str(row_chunk), "row_chunk_size": "3"},
+        )
+        payload = pa.ipc.open_stream(response.body).read_all()
+        assert payload == expected.slice(row_chunk * 3, 3).cast(payload.schema)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        arb.routes.QueryParams(filter="sequence >="),
+        arb.routes.QueryParams(filter="unknown == 3"),
+        arb.routes.QueryParams(sort_by="unknown"),
+    ],
+)
+async def test_ipc_route_invalid_query(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, query: arb.routes.QueryParams
+) -> None:
+    """Test that invalid queries are rejected as bad requests."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(
+        pa.table({"sequence": [1, 2]}), jp_root_dir / "q.parquet"
+    )
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch(
+            "arrow/stream",
+            "q.parquet",
+            params={k: str(v) for k, v in dataclasses.asdict(query).items() if v is not None},
+        )
+    assert e.value.code == 400
+
+
+async def test_batch_route(
+    jp_fetch: JpFetch,
+    full_table: pa.Table,
+    table_file: pathlib.Path,
+    file_params: arb.routes.FileReadOptions,
+) -> None:
+    """Test fetching many tiles at once returns one IPC stream per tile."""
+    tiles = [(0, 0), (0, 1), (1, 0), (3, 1), (9, 0)]
+    response = await jp_fetch(
+        "arrow/batch",
+        str(table_file),
+        params={
+            "row_chunk_size": "3",
+            "col_chunk_size": "2",
+            "chunks": ",".join(f"{r}:{c}" for r, c in tiles),
+            **{k: str(v) for k, v in dataclasses.asdict(file_params).items() if v is not None},
+        },
+    )
+    assert response.headers["Content-Type"] == "application/vnd.apache.arrow.stream"
+
+    source = pa.BufferReader(response.body)
+    payloads: dict[tuple[int, int], pa.Table] = {}
+    while source.tell() < len(response.body):
+        payload = pa.ipc.open_stream(source).read_all()
+        metadata = payload.schema.metadata
+        payloads[(int(metadata[b"row_chunk"]), int(metadata[b"col_chunk"]))] = payload
+    assert set(payloads) == set(tiles)
+
+    for (row_chunk, col_chunk), payload in payloads.items():
+        expected = full_table.slice(row_chunk * 3, 3).select(full_table.schema.names[col_chunk * 2 :][:2])
+        assert expected.cast(payload.schema) == payload
+
+
+@pytest.mark.parametrize("chunks", ["", "0", "0:a", "-1:0", ",".join(f"{i}:0" for i in range(1000))])
+async def test_batch_route_invalid_chunks(jp_fetch: JpFetch, jp_root_dir: pathlib.Path, chunks: str) -> None:
+    """Test that invalid tile lists are rejected as bad requests."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(
+        pa.table({"sequence": [1, 2]}), jp_root_dir / "b.parquet"
+    )
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch("arrow/batch", "b.parquet", params={"row_chunk_size": "1", "chunks": chunks})
+    assert e.value.code == 400
+
+
+async def test_queries_run_off_event_loop(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that files are read and queries executed in the query thread pool."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(
+        pa.table({"sequence": [1, 2]}), jp_root_dir / "t.parquet"
+    )
+
+    threads: list[str] = []
+    dataframe = arb.routes.BaseRouteHandler.dataframe
+
+    def record_thread(self: arb.routes.BaseRouteHandler, *args: Any, **kwargs: Any) -> Any:
+        threads.append(threading.current_thread().name)
+        return dataframe(self, *args, **kwargs)
+
+    monkeypatch.setattr(arb.routes.BaseRouteHandler, "dataframe", record_thread)
+
+    await jp_fetch("arrow/stream", "t.parquet", params={"filter": "sequence > 1"})
+    await jp_fetch("arrow/stats", "t.parquet", params={"filter": "sequence > 1"})
+    await jp_fetch("arrow/batch", "t.parquet", params={"chunks": "0:0"})
+
+    assert len(threads) >= 3
+    assert all(name.startswith("arbalister-query") for name in threads)
+
+
+async def test_ipc_route_cancelled_on_disconnect(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a query is not executed when the client disconnected while it was waiting."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(
+        pa.table({"sequence": [1, 2]}), jp_root_dir / "c.parquet"
+    )
+
+    release = threading.Event()
+    executed: list[bool] = []
+    dataframe = arb.routes.BaseRouteHandler.dataframe
+    iter_record_batches = arb.routes.iter_record_batches
+
+    def slow_dataframe(self: arb.routes.BaseRouteHandler, *args: Any, **kwargs: Any) -> Any:
+        release.wait(timeout=10)
+        return dataframe(self, *args, **kwargs)
+
+    def record_execution(df: Any) -> Any:
+        executed.append(True)
+        yield from iter_record_batches(df)
+
+    monkeypatch.setattr(arb.routes.BaseRouteHandler, "dataframe", slow_dataframe)
+    monkeypatch.setattr(arb.routes, "iter_record_batches", record_execution)
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch("arrow/stream", "c.parquet", request_timeout=0.5)
+    assert e.value.code == 599
+
+    release.set()
+    await asyncio.sleep(0.5)
+    assert executed == []
+
+
+async def test_parallel_queries_keep_row_order(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that filters keep the file order and tied rows of sorts are in the same order on every run."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    num_rows = 50_000
+    table = pa.table({"sequence": range(num_rows), "key": [i % 7 for i in range(num_rows)]})
+    pq.write_table(table, jp_root_dir / "p.parquet", row_group_size=1000)
+
+    async def fetch(**params: str) -> pa.Table:
+        response = await jp_fetch("arrow/stream", "p.parquet", params=params)
+        return pa.ipc.open_stream(response.body).read_all()
+
+    filtered = await fetch(filter="key != 3")
+    assert filtered == table.filter(pc.not_equal(table["key"], 3))
+
+    response = await jp_fetch("arrow/stats", "p.parquet", params={"filter": "key != 3"})
+    assert json.loads(response.body)["num_rows"] == filtered.num_rows
+
+    # The key has many duplicates, whose order is given by the other columns
+    ordered = await fetch(sort_by="key", descending="true")
+    assert ordered == table.sort_by([("key", "descending"), ("sequence", "ascending")])
+    chunks = [
+        await fetch(sort_by="key", descending="true", row_chunk=str(i), row_chunk_size="9000")
+        for i in range(6)
+    ]
+    assert pa.concat_tables(chunks) == ordered
+
+
+def test_parallel_sort_ties(tmp_path: pathlib.Path) -> None:
+    """Test that sorts scanning partitions in parallel put tied rows in the same order every time."""
+    import datafusion as dn
+    import pyarrow.parquet as pq
+
+    num_rows = 50_000
+    table = pa.table({"sequence": range(num_rows), "key": [i % 7 for i in range(num_rows)]})
+    pq.write_table(table, tmp_path / "p.parquet", row_group_size=1000)
+    ctx = dn.SessionContext(arb.routes.make_datafusion_config(target_partitions=8))
+    df = ctx.read_parquet(str(tmp_path / "p.parquet"))
+
+    query = arb.routes.QueryParams(sort_by="key", descending=True)
+    expected = table.sort_by([("key", "descending"), ("sequence", "ascending")])
+    for _ in range(5):
+        assert arb.routes.apply_query(df, query).to_arrow_table() == expected
+
+
+async def test_summary_route(
+    jp_fetch: JpFetch,
+    full_table: pa.Table,
+    table_file: pathlib.Path,
+    file_params: arb.routes.FileReadOptions,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that column summaries are computed once per file version."""
+    calls: list[bool] = []
+
+    def record_calls(summarize: Callable[..., Any]) -> Callable[..., Any]:
+        def record_call(*args: Any, **kwargs: Any) -> Any:
+            calls.append(True)
+            return summarize(*args, **kwargs)
+
+        return record_call
+
+    # Sqlite tables are summarized from record batches
+    monkeypatch.setattr(summary, "summarize", record_calls(summary.summarize))
+    monkeypatch.setattr(summary, "summarize_batches", record_calls(summary.summarize_batches))
+    query_params = {k: str(v) for k, v in dataclasses.asdict(file_params).items() if v is not None}
+
+    for _ in range(2):
+        response = await jp_fetch("arrow/summary", str(table_file), params={**query_params, "bins": "4"})
+        payload = json.loads(response.body)
+        assert payload["num_rows"] == full_table.num_rows
+        assert [c["name"] for c in payload["columns"]] == full_table.schema.names
+        for column in payload["columns"]:
+            assert column["null_count"] == 0
+            if column["histogram"] is not None:
+                assert sum(column["histogram"]["counts"]) == full_table.num_rows
+    assert len(calls) == 1
+
+    params = {**query_params, "bins": "4", "distinct": "false"}
+    response = await jp_fetch("arrow/summary", str(table_file), params=params)
+    assert all(c["distinct_count"] is None for c in json.loads(response.body)["columns"])
+    assert len(calls) == 2
+
+
+async def test_tile_cache(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that chunks are served from the disk cache until the file changes."""
+    write_table = arb.arrow.get_table_writer(ff.FileFormat.Parquet)
+    table = pa.table({"idx": list(range(10)), "val": [str(i) for i in range(10)]})
+    write_table(table, jp_root_dir / "tiles.parquet")
+    stream_params = {"row_chunk_size": "4", "row_chunk": "1"}
+    batch_params = {"row_chunk_size": "4", "col_chunk_size": "1", "chunks": "0:0,2:1"}
+
+    first_stream = await jp_fetch("arrow/stream", "tiles.parquet", params=stream_params)
+    first_batch = await jp_fetch("arrow/batch", "tiles.parquet", params=batch_params)
+    assert pa.ipc.open_stream(first_stream.body).read_all() == table.slice(4, 4)
+
+    def fail(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("Cached tiles must not be computed")
+
+    with monkeypatch.context() as m:
+        m.setattr(arb.routes.BaseRouteHandler, "dataframe", fail)
+        second_stream = await jp_fetch("arrow/stream", "tiles.parquet", params=stream_params)
+        second_batch = await jp_fetch("arrow/batch", "tiles.parquet", params=batch_params)
+    assert second_stream.body == first_stream.body
+    assert sorted(second_batch.body) == sorted(first_batch.body)
+    for response in [first_stream, first_batch, second_stream, second_batch]:
+        assert response.headers["Content-Type"] == "application/vnd.apache.arrow.stream"
+
+    tiles = jp_root_dir.parent / "cache" / "tiles"
+    cached_files = set(tiles.rglob("*"))
+    await jp_fetch("arrow/stream", "tiles.parquet", params={"row_chunk_size": "4"})
+    await jp_fetch("arrow/batch", "tiles.parquet", params={"col_chunk_size": "1", "chunks": "0:0"})
+    assert set(tiles.rglob("*")) == cached_files
+
+    write_table(table.slice(2), jp_root_dir / "tiles.parquet")
+    changed = await jp_fetch("arrow/stream", "tiles.parquet", params=stream_params)
+    assert pa.ipc.open_stream(changed.body).read_all() == table.slice(6, 4)
+
+
+@pytest.mark.parametrize(
+    ("route", "params"),
+    [
+        ("arrow/stream", {"row_chunk_size": "4", "row_chunk": "1"}),
+        ("arrow/batch", {"row_chunk_size": "4", "chunks": "0:0,1:0"}),
+        ("arrow/stats", {}),
+    ],
+)
+async def test_not_modified(
+    jp_fetch: JpFetch,
+    jp_root_dir: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    route: str,
+    params: dict[str, str],
+) -> None:
+    """Test that unchanged responses are validated with their ETag without reading the file."""
+    write_table = arb.arrow.get_table_writer(ff.FileFormat.Ipc)
+    write_table(pa.table({"idx": list(range(10))}), jp_root_dir / "etag.arrow")
+
+    response = await jp_fetch(route, "etag.arrow", params=params)
+    etag = response.headers["Etag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "Last-Modified" in response.headers
+
+    # A different chunk has a different ETag
+    other = await jp_fetch(route, "etag.arrow", params={**params, "filter": "idx > 2"})
+    assert other.headers["Etag"] != etag
+
+    def fail(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("Fresh responses must not be computed")
+
+    with monkeypatch.context() as m:
+        m.setattr(arb.routes.BaseRouteHandler, "dataframe", fail)
+        m.setattr(arb.routes.BaseRouteHandler, "file_stats", fail)
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch(route, "etag.arrow", params=params, headers={"If-None-Match": etag})
+        assert e.value.code == 304
+
+    write_table(pa.table({"idx": list(range(12))}), jp_root_dir / "etag.arrow")
+    changed = await jp_fetch(route, "etag.arrow", params=params, headers={"If-None-Match": etag})
+    assert changed.code == 200
+    assert changed.headers["Etag"] != etag
+
+
+async def test_estimated_stats_not_validated(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that estimated row counts are not revalidated once the exact count is known."""
+    table = pa.table({"idx": list(range(10))})
+    arb.arrow.get_table_writer(ff.FileFormat.Csv)(table, jp_root_dir / "estimate.csv")
+
+    with monkeypatch.context() as m:
+        m.setattr(
+            arb.routes.BaseRouteHandler,
+            "file_stats",
+            lambda self, path: arb.arrow.FileStats(num_rows=12, exact=False),
+        )
+        estimated = await jp_fetch("arrow/stats", "estimate.csv")
+    assert json.loads(estimated.body)["num_rows_exact"] is False
+    assert estimated.headers["Cache-Control"] == "no-store"
+    assert "Last-Modified" not in estimated.headers
+
+    exact = await jp_fetch(
+        "arrow/stats", "estimate.csv", headers={"If-None-Match": estimated.headers["Etag"]}
+    )
+    assert exact.code == 200
+    assert json.loads(exact.body)["num_rows"] == 10
+    assert json.loads(exact.body)["num_rows_exact"] is True
+    assert exact.headers["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize(
+    ("params", "headers", "num_rows", "compressed"),
+    [
+        ({"compression": "zstd"}, {}, 20_000, True),
+        ({"compression": "lz4", "compression_level": "3"}, {}, 20_000, True),
+        ({}, {"Accept": 'application/vnd.apache.arrow.stream; codecs="brotli zstd"'}, 20_000, True),
+        (
+            {"compression": "none"},
+            {"Accept": 'application/vnd.apache.arrow.stream; codecs="zstd"'},
+            20_000,
+            False,
+        ),
+        ({"compression": "zstd"}, {}, 10, False),
+        ({}, {}, 20_000, False),
+    ],
+)
+@pytest.mark.parametrize("route", ["arrow/stream", "arrow/batch"])
+async def test_ipc_compression(
+    jp_fetch: JpFetch,
+    jp_root_dir: pathlib.Path,
+    route: str,
+    params: dict[str, str],
+    headers: dict[str, str],
+    num_rows: int,
+    compressed: bool,
+) -> None:
+    """Test that IPC bodies are compressed when negotiated and large enough."""
+    table = pa.table({"text": ["repeated text"] * num_rows})
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(table, jp_root_dir / "compress.parquet")
+    chunk_params = {"row_chunk_size": str(num_rows), "chunks": "0:0"} if route == "arrow/batch" else {}
+
+    # The fixture adds the authentication to the headers, which are shared by parametrized tests
+    response = await jp_fetch(
+        route, "compress.parquet", params={**chunk_params, **params}, headers={**headers}
+    )
+
+    assert pa.ipc.open_stream(response.body).read_all().cast(table.schema) == table
+    # Repeated text compresses to a fraction of its size
+    assert (len(response.body) < table.nbytes // 2) == compressed
+
+
+async def test_ipc_invalid_compression(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that unknown codecs are rejected as bad requests."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(pa.table({"a": [1]}), jp_root_dir / "c.parquet")
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch("arrow/stream", "c.parquet", params={"compression": "gzip"})
+    assert e.value.code == 400
+
+
+@pytest.mark.parametrize("route", ["arrow/stream", "arrow/batch"])
+async def test_ipc_dictionary_encode(jp_fetch: JpFetch, jp_root_dir: pathlib.Path, route: str) -> None:
+    """Test that low cardinality string columns are dictionary encoded when asked."""
+    num_rows = 20_000
+    table = pa.table(
+        {
+            "country": [["France", "Germany", "Italy"][i % 3] for i in range(num_rows)],
+            "id": [f"id-{i}" for i in range(num_rows)],
+        }
+    )
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(table, jp_root_dir / "dict.parquet")
+    chunk_params = {"row_chunk_size": str(num_rows), "chunks": "0:0"} if route == "arrow/batch" else {}
+
+    plain = await jp_fetch(route, "dict.parquet", params=chunk_params)
+    encoded = await jp_fetch(route, "dict.parquet", params={**chunk_params, "dictionary_encode": "true"})
+
+    payload = pa.ipc.open_stream(encoded.body).read_all()
+    assert pa.types.is_dictionary(payload.schema.field("country").type)
+    assert not pa.types.is_dictionary(payload.schema.field("id").type)
+    assert payload.column("country").to_pylist() == table.column("country").to_pylist()
+    assert payload.column("id").to_pylist() == table.column("id").to_pylist()
+    assert len(encoded.body) < len(plain.body)
+
+
+@pytest.mark.parametrize("route", ["arrow/stream", "arrow/batch"])
+async def test_ipc_max_cell_bytes(jp_fetch: JpFetch, jp_root_dir: pathlib.Path, route: str) -> None:
+    """Test that long cells are truncated in tiles and fetched in full from the cell route."""
+    long_text = "é" * 1000
+    table = pa.table(
+        {
+            "text": ["short", long_text, None],
+            "blob": [b"\x00" * 1000, b"", b"ok"],
+            "number": [1, 2, 3],
+        }
+    )
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(table, jp_root_dir / "cells.parquet")
+    chunk_params = {"row_chunk_size": "3", "chunks": "0:0"} if route == "arrow/batch" else {}
+
+    response = await jp_fetch(route, "cells.parquet", params={**chunk_params, "max_cell_bytes": "9"})
+
+    payload = pa.ipc.open_stream(response.body).read_all()
+    assert payload.schema.field("text").metadata == {b"max_cell_bytes": b"9"}
+    assert payload.schema.field("number").metadata is None
+    assert payload.column("text").to_pylist() == ["short", "é" * 5 + "…", None]
+    assert payload.column("blob").to_pylist() == [b"\x00" * 9 + "…".encode(), b"", b"ok"]
+    assert payload.column("number").to_pylist() == [1, 2, 3]
+
+    cell = await jp_fetch("arrow/cell", "cells.parquet", params={"row": "1", "column": "text"})
+    assert pa.ipc.open_stream(cell.body).read_all().column("text").to_pylist() == [long_text]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{}, {"row": "0"}, {"column": "text"}, {"row": "-1", "column": "text"}, {"row": "0", "column": "nope"}],
+)
+async def test_cell_route_invalid(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, params: dict[str, str]
+) -> None:
+    """Test that invalid cell coordinates are rejected as bad requests."""
+    arb.arrow.get_table_writer(ff.FileFormat.Parquet)(pa.table({"text": ["a"]}), jp_root_dir / "c.parquet")
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch("arrow/cell", "c.parquet", params=params)
+    assert e.value.code == 400
+
+
+async def test_metrics(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that requests report their phase timings and are aggregated in the metrics route."""
+    write_table = arb.arrow.get_table_writer(ff.FileFormat.Parquet)
+    write_table(pa.table({"idx": list(range(100))}), jp_root_dir / "timed.parquet")
+
+    response = await jp_fetch(
+        "arrow/stream", "timed.parquet", params={"row_chunk": "1", "row_chunk_size": "30"}
+    )
+    phases = dict(timing.split(";dur=") for timing in response.headers["Server-Timing"].split(", "))
+    assert {"open", "execute", "encode"} <= phases.keys()
+    assert all(float(duration) >= 0 for duration in phases.values())
+
+    response = await jp_fetch("arbalister", "metrics")
+    assert response.headers["Content-Type"].startswith("text/plain")
+    text = response.body.decode()
+    labels = 'route="stream",format="parquet"'
+    assert f'arbalister_requests_total{{{labels},status="200"}} 1' in text
+    assert f"arbalister_rows_total{{{labels}}} 30" in text
+    assert f"arbalister_request_duration_seconds_count{{{labels}}} 1" in text
+    assert f'arbalister_phase_duration_seconds_count{{{labels},phase="execute"}} 1' in text
+
+
+async def test_dataset_routes(jp_fetch: JpFetch, jp_root_dir: pathlib.Path) -> None:
+    """Test that a partitioned directory is served as one table, chunks reading the covering files."""
+    import pyarrow.parquet
+
+    for i, year in enumerate(["2023", "2024"]):
+        (jp_root_dir / "lake" / f"year={year}").mkdir(parents=True)
+        for j in range(3):
+            start = 10 * (3 * i + j)
+            pyarrow.parquet.write_table(
+                pa.table({"idx": list(range(start, start + 10))}),
+                jp_root_dir / "lake" / f"year={year}" / f"part-{j}.parquet",
+            )
+    idx = list(range(60))
+    expected = pa.table({"idx": idx, "year": ["2023" if i < 30 else "2024" for i in idx]})
+
+    response = await jp_fetch("arrow/stats", "lake")
+    payload = json.loads(response.body)
+    assert payload["num_rows"] == 60
+    assert pa.ipc.open_stream(base64.b64decode(payload["schema"]["data"])).schema.names == ["idx", "year"]
+
+    response = await jp_fetch("arrow/stream", "lake", params={"row_chunk": "1", "row_chunk_size": "25"})
+    payload = pa.ipc.open_stream(response.body).read_all()
+    assert payload == expected.slice(25, 25).cast(payload.schema)
+
+    response = await jp_fetch("arrow/stats", "lake/part-1*", params={"filter": "year == '2024'"})
+    assert json.loads(response.body)["num_rows"] == 10
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await jp_fetch("arrow/stats", "lake/*.csv")
+    assert e.value.code == 400
+
+
+async def test_dataset_listed_off_event_loop(
+    jp_fetch: JpFetch, jp_root_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that dataset files are listed once per request, in the query thread pool."""
+    import pyarrow.parquet
+
+    (jp_root_dir / "lake").mkdir()
+    pyarrow.parquet.write_table(pa.table({"idx": [1, 2, 3]}), jp_root_dir / "lake" / "part-0.parquet")
+
+    threads: list[threading.Thread] = []
+    discover = arb.datasets.discover
+
+    def record(path: pathlib.Path) -> arb.datasets.Dataset:
+        threads.append(threading.current_thread())
+        return discover(path)
+
+    monkeypatch.setattr(arb.datasets, "discover", record)
+    await jp_fetch("arrow/stream", "lake", params={"row_chunk": "0", "row_chunk_size": "2"})
+    (thread,) = threads
+    assert thread is not threading.main_thread()
@@ -0,0 +1,112 @@
+import dataclasses
+import pathlib
+from typing import Iterator
+
+import datafusion as dn
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import arbalister.summary as summary
+
+
+@pytest.fixture
+def table() -> pa.Table:
+    """Build a table with numeric, text, temporal, nested, and null values."""
+    num_rows = 1000
+    return pa.table(
+        {
+            "integer": pa.array([i if i % 10 else None for i in range(num_rows)], pa.int64()),
+            "floating": pa.array([i / 10 for i in range(num_rows)], pa.float64()),
+            "text": pa.array([f"v{i % 7}" for i in range(num_rows)]),
+            "constant": pa.array([3] * num_rows, pa.int32()),
+            "date": pa.array([i // 100 for i in range(num_rows)], pa.int32()).cast(pa.date32()),
+            "flag": pa.array([i % 3 == 0 for i in range(num_rows)]),
+            "nested": pa.array([[i] for i in range(num_rows)]),
+        }
+    )
+
+
+def check_summary(out: summary.TableSummary, table: pa.Table) -> None:
+    """Check the summary statistics against the table."""
+    assert out.num_rows == table.num_rows
+    columns = {c.name: c for c in out.columns}
+    assert list(columns) == table.schema.names
+
+    assert columns["integer"].null_count == 100
+    assert (columns["integer"].min, columns["integer"].max) == (1, 999)
+    assert columns["integer"].distinct_count == pytest.approx(900, rel=0.05)
+    histogram = columns["integer"].histogram
+    assert histogram is not None
+    assert len(histogram.edges) == summary.DEFAULT_BINS + 1
+    assert sum(histogram.counts) == 900
+
+    assert (columns["floating"].min, columns["floating"].max) == (0.0, 99.9)
+    assert columns["floating"].histogram is not None
+    assert sum(columns["floating"].histogram.counts) == table.num_rows
+
+    assert (columns["text"].min, columns["text"].max, columns["text"].distinct_count) == ("v0", "v6", 7)
+    assert columns["text"].histogram is None
+
+    assert columns["constant"].histogram == summary.Histogram(edges=[3.0, 4.0], counts=[table.num_rows])
+    assert (columns["date"].min, columns["date"].max) == ("1970-01-01", "1970-01-10")
+    assert columns["date"].distinct_count == 10
+    assert (columns["flag"].min, columns["flag"].max, columns["flag"].distinct_count) == (False, True, 2)
+
+    assert columns["nested"].null_count == 0
+    assert columns["nested"].min is None
+    assert columns["nested"].distinct_count is None
+
+
+def test_summarize(table: pa.Table) -> None:
+    """Statistics are computed from the data."""
+    df = dn.SessionContext().from_arrow(table)
+    check_summary(summary.summarize(df), table)
+
+
+def test_summarize_batches(table: pa.Table) -> None:
+    """Statistics merged over record batches match those of the whole table."""
+
+    def read(columns: list[str]) -> Iterator[pa.RecordBatch]:
+        return iter(table.select(columns).to_batches(max_chunksize=64))
+
+    out = summary.summarize_batches(table.schema, read)
+    check_summary(out, table)
+    assert [c.distinct_count for c in out.columns] == [900, 1000, 7, 1, 10, 2, None]
+    # Distinct counts of DataFusion are estimates
+    expected = summary.summarize(dn.SessionContext().from_arrow(table))
+    assert [dataclasses.replace(c, distinct_count=None) for c in out.columns] == [
+        dataclasses.replace(c, distinct_count=None) for c in expected.columns
+    ]
+
+
+def test_summarize_parquet_statistics(table: pa.Table, tmp_path: pathlib.Path) -> None:
+    """Statistics stored in the Parquet metadata are used instead of the data."""
+    path = tmp_path / "table.parquet"
+    pq.write_table(table, path, row_group_size=300)
+
+    df = dn.SessionContext().read_parquet(str(path))
+    check_summary(summary.summarize(df, parquet_path=path), table)
+
+    # Rewrite the file with statistics that do not match the data to check they are used
+    metadata_only = pa.table({"integer": pa.array([-5, 5000], pa.int64())})
+    pq.write_table(metadata_only, tmp_path / "other.parquet")
+    other = summary.summarize(
+        dn.SessionContext().from_arrow(table.select(["integer"])), tmp_path / "other.parquet"
+    )
+    assert (other.columns[0].min, other.columns[0].max, other.columns[0].null_count) == (-5, 5000, 0)
+
+
+def test_summarize_without_distinct(table: pa.Table, tmp_path: pathlib.Path) -> None:
+    """Distinct counts are skipped when not asked, keeping the other statistics."""
+    path = tmp_path / "table.parquet"
+    pq.write_table(table, path)
+
+    df = dn.SessionContext().read_parquet(str(path))
+    with_distinct = summary.summarize(df, parquet_path=path)
+    without_distinct = summary.summarize(df, parquet_path=path, distinct=False)
+
+    assert all(c.distinct_count is None for c in without_distinct.columns)
+    assert without_distinct.columns == [
+        dataclasses.replace(c, distinct_count=None) for c in with_distinct.columns
+    ]
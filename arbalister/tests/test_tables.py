@@ -0,0 +1,99 @@
+import os
+import pathlib
+
+import datafusion as dn
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.feather
+import pyarrow.orc
+import pyarrow.parquet
+
+import arbalister.arrow as aa
+import arbalister.cache as cache
+import arbalister.file_format as ff
+import arbalister.tables as tables
+
+
+def catalog_tables(ctx: dn.SessionContext) -> set[str]:
+    """Return the names of the tables registered in the session context."""
+    catalog = ctx.catalog()
+    if hasattr(catalog, "schema"):
+        schema = catalog.schema("public")
+    else:
+        # DataFusion before 48 calls the schemas databases
+        schema = catalog.database("public")  # type: ignore[attr-defined]
+    names: set[str] = schema.names()
+    return names
+
+
+def test_table_registered_once(tmp_path: pathlib.Path) -> None:
+    """A file is registered once, and its schema pinned for other contexts."""
+    path = tmp_path / "data.csv"
+    pyarrow.csv.write_csv(pa.table({"a": [1, 2, 3], "b": ["x", "y", "z"]}), path)
+    registry = tables.TableRegistry(dn.SessionContext(), max_bytes=1 << 20)
+
+    df = registry.table(ff.FileFormat.Csv, path, delimiter=",")
+    assert registry.table(ff.FileFormat.Csv, path, delimiter=",").count() == 3
+    assert len(catalog_tables(registry.context)) == 1
+
+    key = tables.TableKey(file=cache.FileKey.from_path(path), options=(("delimiter", ","),))
+    assert tables.pinned_schema(key) == df.schema()
+    other = tables.TableRegistry(dn.SessionContext(), max_bytes=1 << 20)
+    assert other.table(ff.FileFormat.Csv, path, delimiter=",").schema() == df.schema()
+
+    # Other read options are another table
+    registry.table(ff.FileFormat.Csv, path, delimiter=";")
+    assert len(catalog_tables(registry.context)) == 2
+
+
+def test_table_replaced_when_file_changes(tmp_path: pathlib.Path) -> None:
+    """A changed file replaces the table of its previous version."""
+    path = tmp_path / "data.parquet"
+    pyarrow.parquet.write_table(pa.table({"a": [1, 2, 3]}), path)
+    registry = tables.TableRegistry(dn.SessionContext(), max_bytes=1 << 20)
+    assert registry.table(ff.FileFormat.Parquet, path).count() == 3
+    (before,) = catalog_tables(registry.context)
+
+    pyarrow.parquet.write_table(pa.table({"a": [1, 2, 3, 4]}), path)
+    os.utime(path, ns=(0, 0))
+    assert registry.table(ff.FileFormat.Parquet, path).count() == 4
+    (after,) = catalog_tables(registry.context)
+    assert after != before
+    assert len(registry) == 1
+
+
+def test_table_evicted(tmp_path: pathlib.Path) -> None:
+    """In-memory tables beyond the budget are deregistered, but their DataFrames still work."""
+    path = tmp_path / "data.orc"
+    table = pa.table({"a": list(range(1000))})
+    pyarrow.orc.write_table(table, path)
+    registry = tables.TableRegistry(dn.SessionContext(), max_bytes=path.stat().st_size - 1)
+
+    df = registry.table(ff.FileFormat.Orc, path)
+    assert len(registry) == 0
+    assert catalog_tables(registry.context) == set()
+    assert df.to_arrow_table() == table
+
+
+def test_compressed_ipc_counted(tmp_path: pathlib.Path) -> None:
+    """Compressed IPC files are counted by their decompressed size, mapped ones as listing tables."""
+    table = pa.table({"a": list(range(100_000))})
+    for compression in ["lz4", "uncompressed"]:
+        pyarrow.feather.write_feather(table, tmp_path / f"{compression}.arrow", compression=compression)
+    registry = tables.TableRegistry(dn.SessionContext(), max_bytes=table.nbytes - 1)
+
+    assert registry.table(ff.FileFormat.Ipc, tmp_path / "uncompressed.arrow").count() == table.num_rows
+    assert len(registry) == 1
+    assert registry.table(ff.FileFormat.Ipc, tmp_path / "lz4.arrow").count() == table.num_rows
+    assert len(registry) == 1
+    key = cache.FileKey.from_path(tmp_path / "lz4.arrow")
+    assert aa.loaded_nbytes(ff.FileFormat.Ipc, key) >= table.nbytes
+
+
+def test_from_arrow_leaves_catalog_empty() -> None:
+    """DataFrames of in-memory tables do not keep them in the session catalog."""
+    ctx = dn.SessionContext()
+    table = pa.table({"a": [1, 2, 3]})
+    df = aa.from_arrow(ctx, table)
+    assert catalog_tables(ctx) == set()
+    assert df.filter(dn.col("a") > 1).count() == 2
@@ -0,0 +1,49 @@
+import pathlib
+
+import arbalister.tile_cache as tile_cache
+
+
+def test_tile_cache_get_put(tmp_path: pathlib.Path) -> None:
+    """Test that stored tiles are read back by key."""
+    tiles = tile_cache.TileCache(tmp_path, max_bytes=100)
+
+    assert tiles.get(("a", 1)) is None
+    tiles.put(("a", 1), b"tile a")
+    tiles.put(("b", 1), b"tile b")
+    assert tiles.get(("a", 1)) == b"tile a"
+    assert tiles.get(("b", 1)) == b"tile b"
+    assert tiles.nbytes == 12
+
+    tiles.put(("a", 1), b"new a")
+    assert tiles.get(("a", 1)) == b"new a"
+    assert tiles.nbytes == 11
+
+
+def test_tile_cache_persists(tmp_path: pathlib.Path) -> None:
+    """Test that tiles written by a cache are found by another one on the same directory."""
+    tile_cache.TileCache(tmp_path, max_bytes=100).put("key", b"data")
+
+    tiles = tile_cache.TileCache(tmp_path, max_bytes=100)
+    assert tiles.nbytes == 4
+    assert tiles.get("key") == b"data"
+
+
+def test_tile_cache_eviction(tmp_path: pathlib.Path) -> None:
+    """Test that the least recently used tiles are removed when over the size cap."""
+    tiles = tile_cache.TileCache(tmp_path, max_bytes=10)
+
+    tiles.put(1, b"1234")
+    tiles.put(2, b"1234")
+    assert tiles.get(1) == b"1234"
+    tiles.put(3, b"1234")
+
+    assert tiles.get(2) is None
+    assert tiles.get(1) == b"1234"
+    assert tiles.get(3) == b"1234"
+    assert tiles.nbytes == 8
+    assert len(list(tmp_path.glob("*/*.arrows"))) == 2
+
+    # Tiles larger than the cache are not stored
+    tiles.put(4, b"0" * 11)
+    assert tiles.get(4) is None
+    assert tiles.get(1) == b"1234"
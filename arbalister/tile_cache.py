@@ -0,0 +1,97 @@
+import hashlib
+import os
+import pathlib
+import threading
+from typing import Hashable
+
+_SUFFIX = ".arrows"
+
+
+class TileCache:
+    """Encoded IPC tiles persisted in a directory, with a size cap and least recently used eviction.
+
+    Tiles are keyed by any hashable value that identifies their content, such as the file
+    version, read options, and chunk coordinates, so entries of a changed file are never read
+    again and eventually get evicted.
+    """
+
+    def __init__(self, directory: pathlib.Path | str, max_bytes: int) -> None:
+        self._directory = pathlib.Path(directory)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Size of each file, in least recently used first order
+        self._entries: dict[pathlib.Path, int] | None = None
+        self._nbytes = 0
+
+    @property
+    def max_bytes(self) -> int:
+        """The maximum total size of the cached tiles."""
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the cached tiles."""
+        with self._lock:
+            self._load_entries()
+            return self._nbytes
+
+    def _load_entries(self) -> dict[pathlib.Path, int]:
+        """Scan the directory for the tiles left by previous processes, once."""
+        if self._entries is None:
+            files: list[tuple[float, pathlib.Path, int]] = []
+            if self._directory.exists():
+                for path in self._directory.glob(f"*/*{_SUFFIX}"):
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, path, stat.st_size))
+            files.sort()
+            self._entries = {path: size for _, path, size in files}
+            self._nbytes = sum(self._entries.values())
+        return self._entries
+
+    def _path(self, key: Hashable) -> pathlib.Path:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return self._directory / digest[:2] / f"{digest}{_SUFFIX}"
+
+    def get(self, key: Hashable) -> bytes | None:
+        """Return the encoded tile, or None if it is not cached."""
+        path = self._path(key)
+        with self._lock:
+            entries = self._load_entries()
+            if path not in entries:
+                return None
+            # Mark as most recently used, in memory and on disk for the next process
+            entries[path] = entries.pop(path)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            # Removed by another process sharing the directory
+            with self._lock:
+                self._nbytes -= self._load_entries().pop(path, 0)
+            return None
+        return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        """Store a tile, evicting the least recently used ones if over the size cap."""
+        if len(data) > self._max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        evicted: list[pathlib.Path] = []
+        with self._lock:
+            entries = self._load_entries()
+            self._nbytes += len(data) - entries.pop(path, 0)
+            entries[path] = len(data)
+            while self._nbytes > self._max_bytes:
+                oldest = next(iter(entries))
+                self._nbytes -= entries.pop(oldest)
+                evicted.append(oldest)
+        for oldest in evicted:
+            oldest.unlink(missing_ok=True)
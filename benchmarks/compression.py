@@ -0,0 +1,152 @@
+import argparse
+import dataclasses
+import json
+import pathlib
+import random
+import statistics
+import string
+import time
+
+import datafusion as dn
+import pyarrow as pa
+
+import arbalister.arrow as aa
+from arbalister import file_format as ff
+
+CODECS: list[tuple[str | None, int | None]] = [
+    (None, None),
+    ("lz4", None),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Result:
+    """Cost of sending the tiles of a table with a codec."""
+
+    codec: str
+    level: int | None
+    tile_bytes: float
+    encode_ms: float
+    decode_ms: float
+    # Total time per tile, including the transfer, for each bandwidth in Mbit/s
+    total_ms: dict[float, float]
+
+
+def generate_text_table(num_rows: int, num_cols: int, seed: int = 0) -> pa.Table:
+    """Generate a wide table of short sentences, which compress like typical text columns."""
+    rnd = random.Random(seed)
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(2, 9))) for _ in range(2000)]
+    sentences = [" ".join(rnd.choices(words, k=rnd.randint(3, 12))) for _ in range(10_000)]
+    return pa.table({f"col_{j}": rnd.choices(sentences, k=num_rows) for j in range(num_cols)})
+
+
+def read_table(path: pathlib.Path) -> pa.Table:
+    """Read a data file in memory with the extension readers."""
+    read = aa.get_table_reader(ff.FileFormat.from_filename(path))
+    return read(dn.SessionContext(), path).to_arrow_table()
+
+
+def iter_tiles(table: pa.Table, row_chunk_size: int, col_chunk_size: int) -> list[pa.Table]:
+    """Split the table in tiles, as the grid fetches them."""
+    return [
+        table.slice(row, row_chunk_size).select(table.column_names[col : col + col_chunk_size])
+        for row in range(0, table.num_rows, row_chunk_size)
+        for col in range(0, table.num_columns, col_chunk_size)
+    ]
+
+
+def encode(tile: pa.Table, options: pa.ipc.IpcWriteOptions) -> bytes:
+    """Encode a tile as an IPC stream, as the routes do."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tile.schema, options=options) as writer:
+        writer.write_table(tile)
+    data: bytes = sink.getvalue().to_pybytes()
+    return data
+
+
+def measure(tiles: list[pa.Table], codec: str | None, level: int | None, bandwidths: list[float]) -> Result:
+    """Measure the median cost of encoding, decoding, and transferring a tile."""
+    options = pa.ipc.IpcWriteOptions(
+        compression=None if codec is None else pa.Codec(codec, compression_level=level)
+    )
+    sizes: list[int] = []
+    encode_times: list[float] = []
+    decode_times: list[float] = []
+    for tile in tiles:
+        start = time.perf_counter()
+        data = encode(tile, options)
+        encode_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pa.ipc.open_stream(data).read_all()
+        decode_times.append(time.perf_counter() - start)
+        sizes.append(len(data))
+
+    tile_bytes = statistics.median(sizes)
+    encode_ms = statistics.median(encode_times) * 1e3
+    decode_ms = statistics.median(decode_times) * 1e3
+    return Result(
+        codec=codec or "none",
+        level=level,
+        tile_bytes=tile_bytes,
+        encode_ms=encode_ms,
+        decode_ms=decode_ms,
+        total_ms={bw: encode_ms + decode_ms + tile_bytes * 8 / (bw * 1e6) * 1e3 for bw in bandwidths},
+    )
+
+
+def configure_argparse() -> argparse.ArgumentParser:
+    """Configure CLI options."""
+    parser = argparse.ArgumentParser(
+        description="Compare the CPU cost of IPC body compression against the transfer time it saves."
+    )
+    parser.add_argument("--file", "-f", type=pathlib.Path, help="Data file, defaults to generated text")
+    parser.add_argument("--num-rows", type=int, default=20_000, help="Number of rows to generate")
+    parser.add_argument("--num-cols", type=int, default=48, help="Number of columns to generate")
+    parser.add_argument("--row-chunk-size", type=int, default=512, help="Rows per tile")
+    parser.add_argument("--col-chunk-size", type=int, default=24, help="Columns per tile")
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        action="append",
+        help="Link bandwidth in Mbit/s, can be repeated",
+        default=[],
+    )
+    parser.add_argument("--json", type=pathlib.Path, help="Also save the results in a JSON file")
+    return parser
+
+
+def main() -> None:
+    """Run the compression benchmark."""
+    args = configure_argparse().parse_args()
+    bandwidths: list[float] = args.bandwidth or [10.0, 100.0, 1000.0]
+
+    if args.file is not None:
+        table = read_table(args.file)
+    else:
+        table = generate_text_table(args.num_rows, args.num_cols)
+    tiles = iter_tiles(table, args.row_chunk_size, args.col_chunk_size)
+
+    results = [
+        measure(tiles, codec, level, bandwidths)
+        for codec, level in CODECS
+        if codec is None or pa.Codec.is_available(codec)
+    ]
+
+    header = ["codec", "level", "tile KiB", "encode ms", "decode ms"]
+    header += [f"total ms @{bw:g}Mbit/s" for bw in bandwidths]
+    print(" | ".join(header))
+    for r in results:
+        row = [r.codec, str(r.level or ""), f"{r.tile_bytes / 1024:.1f}", f"{r.encode_ms:.2f}"]
+        row += [f"{r.decode_ms:.2f}", *(f"{r.total_ms[bw]:.2f}" for bw in bandwidths)]
+        print(" | ".join(row))
+
+    if args.json is not None:
+        args.json.write_text(json.dumps([dataclasses.asdict(r) for r in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
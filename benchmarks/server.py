@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import pathlib
+import random
+import resource
+import statistics
+import sys
+import time
+import urllib.parse
+from typing import Any
+
+import pyarrow.parquet as paq
+import tornado.httpclient
+import tornado.httpserver
+import tornado.netutil
+from jupyter_server.serverapp import ServerApp
+from traitlets.config import Config
+
+import arbalister
+from arbalister import file_format as ff
+from arbalister import routes
+
+# The data generation script is not part of the package
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1] / "data"))
+import generate  # noqa: E402
+
+TOKEN = "arbalister-benchmark"
+DEFAULT_SCALES = ["10_000x10", "100_000x100"]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Dataset:
+    """A generated file of a table where each cell holds its coordinates."""
+
+    file_format: ff.FileFormat
+    num_rows: int
+    num_cols: int
+    path: pathlib.Path
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Result:
+    """Cost of the requests of a pattern on a dataset."""
+
+    file_format: str
+    num_rows: int
+    num_cols: int
+    pattern: str
+    num_requests: int
+    # Latency of the first request, before any cache is warm
+    cold_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    # Median size of the response bodies
+    bytes_per_request: float
+    # CPU time of the process, including the client, per request
+    cpu_ms_per_request: float
+    # Peak resident set size of the process since it started
+    peak_rss_mib: float
+
+
+def parse_scale(text: str) -> tuple[int, int]:
+    """Parse a ``<rows>x<columns>`` scale, such as ``1_000_000x100``."""
+    rows, _, cols = text.partition("x")
+    return int(rows), int(cols)
+
+
+def generate_dataset(
+    data_dir: pathlib.Path, file_format: ff.FileFormat, num_rows: int, num_cols: int
+) -> Dataset:
+    """Generate the dataset file, unless it was generated by a previous run.
+
+    The Parquet file is written by chunks, so it scales to any number of rows, while the other
+    formats are converted from it in memory.
+    """
+
+    def path_of(file_format: ff.FileFormat) -> pathlib.Path:
+        return data_dir / f"coordinate-{num_rows}x{num_cols}.{file_format.value}"
+
+    parquet_path = path_of(ff.FileFormat.Parquet)
+    if not parquet_path.exists():
+        data_dir.mkdir(parents=True, exist_ok=True)
+        generate.sink_coordinate_table(num_rows=num_rows, num_cols=num_cols, path=parquet_path)
+    path = path_of(file_format)
+    if not path.exists():
+        generate.save_table(paq.read_table(parquet_path), path, file_format)
+    return Dataset(file_format=file_format, num_rows=num_rows, num_cols=num_cols, path=path)
+
+
+def request_patterns(
+    dataset: Dataset, row_chunk_size: int, col_chunk_size: int, scroll_steps: int, seed: int
+) -> dict[str, list[tuple[str, dict[str, Any]]]]:
+    """Return the routes and query parameters of the requests of each pattern."""
+    last_row_chunk = max(0, (dataset.num_rows - 1) // row_chunk_size)
+    rnd = random.Random(seed)
+    tile = {"row_chunk_size": row_chunk_size, "col_chunk_size": col_chunk_size, "col_chunk": 0}
+    return {
+        "file_info": [("file/info", {})],
+        "stats": [("arrow/stats", {})],
+        "first_tile": [("arrow/stream", {**tile, "row_chunk": 0})],
+        "deep_tile": [("arrow/stream", {**tile, "row_chunk": last_row_chunk})],
+        "wide_tile": [("arrow/stream", {"row_chunk_size": row_chunk_size, "row_chunk": 0})],
+        "random_scroll": [
+            ("arrow/stream", {**tile, "row_chunk": rnd.randint(0, last_row_chunk)})
+            for _ in range(scroll_steps)
+        ],
+    }
+
+
+async def start_server(
+    root_dir: pathlib.Path, arbalister_config: dict[str, Any]
+) -> tuple[tornado.httpserver.HTTPServer, str]:
+    """Start a Jupyter server with the extension routes in this process, returning its URL."""
+    app = ServerApp(
+        root_dir=str(root_dir),
+        open_browser=False,
+        allow_root=True,
+        log_level="WARN",
+        config=Config({"IdentityProvider": {"token": TOKEN}, "Arbalister": arbalister_config}),
+    )
+    app.init_signal = lambda: None  # type: ignore[method-assign]
+    app.initialize(argv=[], find_extensions=False, new_httpserver=False)
+    routes.setup_route_handlers(app.web_app)
+
+    sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+    server = tornado.httpserver.HTTPServer(app.web_app)
+    server.add_sockets(sockets)
+    port = sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}{app.base_url}"
+
+
+async def run_pattern(
+    client: tornado.httpclient.AsyncHTTPClient,
+    url: str,
+    dataset: Dataset,
+    requests: list[tuple[str, dict[str, Any]]],
+    repeat: int,
+) -> tuple[list[float], list[int], float]:
+    """Send the requests of a pattern, returning the latencies, body sizes and CPU time."""
+    latencies: list[float] = []
+    sizes: list[int] = []
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        for route, query in requests:
+            query_string = urllib.parse.urlencode(query)
+            start = time.perf_counter()
+            response = await client.fetch(
+                f"{url}{route}/{dataset.path.name}?{query_string}",
+                headers={"Authorization": f"token {TOKEN}"},
+                request_timeout=3600,
+            )
+            latencies.append(time.perf_counter() - start)
+            sizes.append(len(response.body))
+    return latencies, sizes, time.process_time() - cpu_start
+
+
+def summarize(dataset: Dataset, pattern: str, latencies: list[float], sizes: list[int], cpu: float) -> Result:
+    """Compute the latency percentiles and resource usage of a pattern."""
+    ms = [t * 1e3 for t in latencies]
+    quantiles = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return Result(
+        file_format=dataset.file_format.value,
+        num_rows=dataset.num_rows,
+        num_cols=dataset.num_cols,
+        pattern=pattern,
+        num_requests=len(ms),
+        cold_ms=ms[0],
+        p50_ms=quantiles[49],
+        p90_ms=quantiles[89],
+        p99_ms=quantiles[98],
+        max_ms=max(ms),
+        bytes_per_request=statistics.median(sizes),
+        cpu_ms_per_request=cpu * 1e3 / len(ms),
+        # Linux reports the maximum resident set size in KiB
+        peak_rss_mib=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def configure_argparse() -> argparse.ArgumentParser:
+    """Configure CLI options."""
+    parser = argparse.ArgumentParser(
+        description="Measure the server routes on generated datasets for typical request patterns."
+    )
+    parser.add_argument(
+        "--scale",
+        action="append",
+        default=[],
+        help=f"Dataset size as <rows>x<columns>, can be repeated, defaults to {DEFAULT_SCALES}",
+    )
+    parser.add_argument(
+        "--format",
+        action="append",
+        choices=[f.value for f in ff.FileFormat],
+        default=[],
+        help="File format, can be repeated, defaults to all formats",
+    )
+    parser.add_argument(
+        "--data-dir", type=pathlib.Path, default=pathlib.Path("data/gen/bench"), help="Dataset directory"
+    )
+    parser.add_argument("--row-chunk-size", type=int, default=512, help="Rows per tile")
+    parser.add_argument("--col-chunk-size", type=int, default=24, help="Columns per tile")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each pattern is sent")
+    parser.add_argument("--scroll-steps", type=int, default=20, help="Tiles of a random scroll")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random scroll")
+    parser.add_argument("--json", type=pathlib.Path, help="Also save the results in a JSON file")
+    return parser
+
+
+async def run(args: argparse.Namespace) -> list[Result]:
+    """Generate the datasets and measure each request pattern on them."""
+    formats = [ff.FileFormat(f) for f in args.format] or list(ff.FileFormat)
+    datasets = [
+        generate_dataset(args.data_dir, file_format, *parse_scale(scale))
+        for scale in args.scale or DEFAULT_SCALES
+        for file_format in formats
+    ]
+    server, url = await start_server(args.data_dir, {"cache_dir": str(args.data_dir / "cache")})
+    client = tornado.httpclient.AsyncHTTPClient(max_body_size=1 << 40)
+
+    results: list[Result] = []
+    for dataset in datasets:
+        patterns = request_patterns(
+            dataset, args.row_chunk_size, args.col_chunk_size, args.scroll_steps, args.seed
+        )
+        for pattern, requests in patterns.items():
+            latencies, sizes, cpu = await run_pattern(client, url, dataset, requests, args.repeat)
+            result = summarize(dataset, pattern, latencies, sizes, cpu)
+            print(
+                f"{result.file_format} {result.num_rows}x{result.num_cols} {pattern}:"
+                f" cold {result.cold_ms:.1f} ms, p50 {result.p50_ms:.1f} ms,"
+                f" p99 {result.p99_ms:.1f} ms, {result.bytes_per_request / 1024:.1f} KiB,"
+                f" cpu {result.cpu_ms_per_request:.1f} ms, rss {result.peak_rss_mib:.0f} MiB",
+                flush=True,
+            )
+            results.append(result)
+
+    client.close()
+    server.stop()
+    return results
+
+
+def main() -> None:
+    """Run the server benchmark."""
+    args = configure_argparse().parse_args()
+    results = asyncio.run(run(args))
+    if args.json is not None:
+        document = {"version": arbalister.__version__, "results": [dataclasses.asdict(r) for r in results]}
+        args.json.write_text(json.dumps(document, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+
+# Modules the server extension should not import before the first request
+HEAVY_MODULES = ["datafusion", "pyarrow", "jupyterlab", "adbc_driver_manager"]
+
+# Time the extension loading in a fresh interpreter, where the server modules are already imported
+# since the Jupyter server pays for them anyway
+LOAD_EXTENSION = """
+import json, logging, sys, time, types
+import jupyter_server.serverapp, tornado.web
+
+web_app = tornado.web.Application(base_url="/")
+server_app = types.SimpleNamespace(web_app=web_app, log=logging.getLogger("startup"))
+start = time.perf_counter()
+import arbalister
+arbalister._load_jupyter_server_extension(server_app)
+duration = time.perf_counter() - start
+heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+print(json.dumps({"load_ms": duration * 1e3, "heavy_modules": heavy}))
+"""
+
+
+def measure(repeat: int) -> tuple[list[float], list[str]]:
+    """Load the extension in fresh interpreters, returning the load times and the heavy modules imported."""
+    times: list[float] = []
+    heavy: set[str] = set()
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{LOAD_EXTENSION}"
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=pathlib.Path(__file__).parents[1],
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        times.append(result["load_ms"])
+        heavy.update(result["heavy_modules"])
+    return times, sorted(heavy)
+
+
+def configure_argparse() -> argparse.ArgumentParser:
+    """Configure CLI options."""
+    parser = argparse.ArgumentParser(
+        description="Measure the time to import and load the server extension at Jupyter server start."
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="Number of fresh interpreters")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median load time is above this")
+    parser.add_argument("--json", type=pathlib.Path, help="Also save the results in a JSON file")
+    return parser
+
+
+def main() -> None:
+    """Run the startup benchmark, failing if it regressed."""
+    args = configure_argparse().parse_args()
+    times, heavy = measure(args.repeat)
+    median_ms = statistics.median(times)
+    print(f"load median {median_ms:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+
+    if args.json is not None:
+        args.json.write_text(json.dumps({"load_ms": times, "heavy_modules": heavy}, indent=2))
+    if heavy:
+        sys.exit("The server extension imports heavy modules at startup")
+    if args.max_ms is not None and median_ms > args.max_ms:
+        sys.exit(f"Loading the server extension takes more than {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
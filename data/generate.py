@@ -15,7 +15,9 @@ MAX_FAKER_ROWS = 100_000
 
 
 def _widen_field(field: pa.Field) -> pa.Field:
-    return pa.field(field.name, pa.large_string()) if pa.types.is_string(field.type) else field
+    if pa.types.is_string(field.type) or pa.types.is_string_view(field.type):
+        return pa.field(field.name, pa.large_string())
+    return field
 
 
 def widen(table: pa.Table) -> pa.Table:
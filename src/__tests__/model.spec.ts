@@ -1,10 +1,12 @@
 import "jest-canvas-mock";
 
 import { tableFromArrays } from "apache-arrow";
+import type { DataModel } from "@lumino/datagrid";
 import type * as Arrow from "apache-arrow";
 
+import { PairMap } from "../collection";
 import { ArrowModel } from "../model";
-import { fetchStats, fetchTable } from "../requests";
+import { fetchStats, fetchTable, fetchTables } from "../requests";
 import type { FileInfo, FileReadOptions } from "../file-options";
 import type * as Req from "../requests";
 
@@ -20,6 +22,7 @@ async function fetchStatsMocked(_params: Req.StatsOptions): Promise<Req.StatsRes
   return {
     num_rows: MOCK_TABLE.numRows,
     num_cols: MOCK_TABLE.numCols,
+    num_rows_exact: true,
     schema: MOCK_TABLE.schema,
   };
 }
@@ -44,13 +47,25 @@ async function fetchTableMocked(params: Req.TableOptions): Promise<Arrow.Table>
   return table;
 }
 
+async function fetchTablesMocked(
+  params: Req.TablesOptions,
+): Promise<PairMap<number, number, Arrow.Table>> {
+  const tables = new PairMap<number, number, Arrow.Table>();
+  for (const [row_chunk, col_chunk] of params.chunks) {
+    tables.set([row_chunk, col_chunk], await fetchTableMocked({ ...params, row_chunk, col_chunk }));
+  }
+  return tables;
+}
+
 jest.mock("../requests", () => ({
   fetchTable: jest.fn(),
+  fetchTables: jest.fn(),
   fetchStats: jest.fn(),
 }));
 
 describe("ArrowModel", () => {
   (fetchTable as jest.Mock).mockImplementation(fetchTableMocked);
+  (fetchTables as jest.Mock).mockImplementation(fetchTablesMocked);
   (fetchStats as jest.Mock).mockImplementation(fetchStatsMocked);
 
   const model = new ArrowModel(
@@ -89,4 +104,104 @@ describe("ArrowModel", () => {
     expect(fetchStats).toHaveBeenCalledTimes(initialStatsCallCount + 1);
     expect(fetchTable).toHaveBeenCalledTimes(initialTableCallCount + 1);
   });
+
+  it("should fetch the chunks requested in the same tick in a single batch", async () => {
+    const model3 = new ArrowModel(
+      { path: "test/data.parquet", rowChunkSize: 2, colChunkSize: 2 },
+      {} as FileReadOptions,
+      {} as FileInfo,
+    );
+    await model3.ready;
+    (fetchTables as jest.Mock).mockClear();
+
+    expect(model3.data("body", 4, 0)).toEqual("");
+    expect(model3.data("body", 6, 2)).toEqual("");
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    await model3.ready;
+
+    expect(fetchTables).toHaveBeenCalledTimes(1);
+    expect((fetchTables as jest.Mock).mock.calls[0][0].chunks).toEqual([
+      [2, 0],
+      [3, 1],
+    ]);
+    expect(model3.data("body", 6, 2)).toEqual(MOCK_TABLE.getChildAt(2)?.get(6).toString());
+  });
+
+  it("should abort the requests of chunks that left the viewport", async () => {
+    const model4 = new ArrowModel(
+      { path: "test/data.parquet", rowChunkSize: 2, colChunkSize: 2 },
+      {} as FileReadOptions,
+      {} as FileInfo,
+    );
+    await model4.ready;
+    let viewport = { firstRow: 8, firstColumn: 0, lastRow: 9, lastColumn: 1 };
+    model4.viewport = () => viewport;
+    const changed: DataModel.ChangedArgs[] = [];
+    model4.changed.connect((_, args) => {
+      changed.push(args);
+    });
+    (fetchTables as jest.Mock).mockClear();
+
+    // The first request never completes unless aborted
+    (fetchTables as jest.Mock).mockImplementationOnce(
+      (_params: Req.TablesOptions, signal: AbortSignal) =>
+        new Promise((_resolve, reject) => {
+          signal.addEventListener("abort", () => reject(new DOMException("Aborted", "AbortError")));
+        }),
+    );
+
+    model4.data("body", 8, 0);
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    const signal: AbortSignal = (fetchTables as jest.Mock).mock.calls[0][1];
+    expect(signal.aborted).toBe(false);
+
+    // Scrolling far away aborts the first request and repaints its cells
+    viewport = { firstRow: 0, firstColumn: 4, lastRow: 1, lastColumn: 4 };
+    model4.data("body", 0, 4);
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    expect(signal.aborted).toBe(true);
+    expect(changed).toContainEqual({
+      type: "cells-changed",
+      region: "body",
+      row: 8,
+      rowSpan: 2,
+      column: 0,
+      columnSpan: 2,
+    });
+
+    // Coming back fetches the aborted chunk again
+    viewport = { firstRow: 8, firstColumn: 0, lastRow: 9, lastColumn: 1 };
+    expect(model4.data("body", 8, 0)).toEqual("");
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    expect(fetchTables).toHaveBeenCalledTimes(3);
+    expect(model4.data("body", 8, 0)).toEqual(MOCK_TABLE.getChildAt(0)?.get(8).toString());
+  });
+
+  it("should keep the requests of chunks in a viewport wider than a chunk", async () => {
+    const model5 = new ArrowModel(
+      { path: "test/data.parquet", rowChunkSize: 2, colChunkSize: 1 },
+      {} as FileReadOptions,
+      {} as FileInfo,
+    );
+    await model5.ready;
+    model5.viewport = () => ({ firstRow: 8, firstColumn: 0, lastRow: 9, lastColumn: 4 });
+    (fetchTables as jest.Mock).mockClear();
+
+    // The first request never completes unless aborted
+    (fetchTables as jest.Mock).mockImplementationOnce(
+      (_params: Req.TablesOptions, signal: AbortSignal) =>
+        new Promise((_resolve, reject) => {
+          signal.addEventListener("abort", () => reject(new DOMException("Aborted", "AbortError")));
+        }),
+    );
+
+    model5.data("body", 8, 0);
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    const signal: AbortSignal = (fetchTables as jest.Mock).mock.calls[0][1];
+
+    // Both chunks are visible, four chunks apart
+    model5.data("body", 8, 4);
+    await new Promise((resolve) => setTimeout(resolve, 0));
+    expect(signal.aborted).toBe(false);
+  });
 });
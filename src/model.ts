@@ -3,17 +3,53 @@ import { DataModel } from "@lumino/datagrid";
 import type * as Arrow from "apache-arrow";
 
 import { PairMap } from "./collection";
-import { fetchFileInfo, fetchStats, fetchTable } from "./requests";
+import { fetchFileInfo, fetchStats, fetchTable, fetchTables } from "./requests";
 import type { FileInfo, FileReadOptions } from "./file-options";
 
+/**
+ * Maximum number of chunks fetched in a single batch request.
+ */
+const MAX_BATCH_CHUNKS = 256;
+
+interface PendingChunk {
+  chunkIdx: [number, number];
+  resolve: (table: Arrow.Table) => void;
+  reject: (reason: unknown) => void;
+}
+
+interface InflightRequest {
+  chunks: [number, number][];
+  controller: AbortController;
+}
+
 export namespace ArrowModel {
   export interface LoadingOptions {
     path: string;
     rowChunkSize?: number;
     colChunkSize?: number;
+    /**
+     * Compression of the chunks sent by the server, worth it on slow links.
+     *
+     * No LZ4 or Zstandard decoder is registered with Arrow JS here, so it defaults to "none".
+     */
+    compression?: "lz4" | "zstd" | "none";
+    /** Dictionary encode the repetitive string columns of the chunks sent by the server. */
+    dictionaryEncode?: boolean;
+    /** Truncate longer cell values on the server, as the grid only shows their beginning. */
+    maxCellBytes?: number;
     loadingRepr?: string;
     nullRepr?: string;
   }
+
+  /**
+   * The first and last rows and columns of the cells visible in the grid.
+   */
+  export interface Viewport {
+    firstRow: number;
+    firstColumn: number;
+    lastRow: number;
+    lastColumn: number;
+  }
 }
 
 export class ArrowModel extends DataModel {
@@ -34,6 +70,9 @@ export class ArrowModel extends DataModel {
     this._loadingParams = {
       rowChunkSize: 512,
       colChunkSize: 24,
+      compression: "none",
+      dictionaryEncode: false,
+      maxCellBytes: 1024,
       loadingRepr: "",
       nullRepr: "",
       ...loadingOptions,
@@ -76,6 +115,15 @@ export class ArrowModel extends DataModel {
     return this._ready;
   }
 
+  /**
+   * The function returning the cells visible in the grid, or undefined when unknown.
+   *
+   * Requests of chunks away from the viewport are aborted, so that the server stops computing them.
+   */
+  set viewport(viewport: () => ArrowModel.Viewport | undefined) {
+    this._viewport = viewport;
+  }
+
   get schema(): Arrow.Schema {
     return this._schema;
   }
@@ -138,11 +186,7 @@ export class ArrowModel extends DataModel {
 
     // Fetch data, however we cannot await it due to the interface required by the DataGrid.
     // Instead, we fire the request, and notify of change upon completion.
-    const promise = this.fetchChunk(chunkIdx).then((table) => {
-      this._chunks.set(chunkIdx, table);
-      this.emitChangedChunk(chunkIdx);
-    });
-    this._chunks.set(chunkIdx, promise);
+    this.requestChunk(chunkIdx, true);
 
     return this._loadingParams.loadingRepr;
   }
@@ -155,10 +199,101 @@ export class ArrowModel extends DataModel {
       row_chunk: rowChunk,
       col_chunk_size: this._loadingParams.colChunkSize,
       col_chunk: colChunk,
+      compression: this._loadingParams.compression,
+      dictionary_encode: this._loadingParams.dictionaryEncode,
+      max_cell_bytes: this._loadingParams.maxCellBytes,
       ...this._fileOptions,
     });
   }
 
+  /**
+   * Queue a chunk to be fetched in a single request with the other chunks queued in the same tick.
+   *
+   * A repaint asks for all visible chunks synchronously, so batching them saves many round-trips.
+   */
+  private fetchChunkBatched(chunkIdx: [number, number]): Promise<Arrow.Table> {
+    return new Promise((resolve, reject) => {
+      this._pendingChunks.push({ chunkIdx, resolve, reject });
+      if (this._pendingChunks.length === 1) {
+        setTimeout(() => this.flushPendingChunks(), 0);
+      }
+    });
+  }
+
+  private flushPendingChunks() {
+    const pending = this._pendingChunks;
+    this._pendingChunks = [];
+
+    this.abortChunksOutOfView();
+    for (let start = 0; start < pending.length; start += MAX_BATCH_CHUNKS) {
+      void this.fetchChunksBatch(pending.slice(start, start + MAX_BATCH_CHUNKS));
+    }
+  }
+
+  private async fetchChunksBatch(batch: PendingChunk[]) {
+    const request: InflightRequest = {
+      chunks: batch.map(({ chunkIdx }) => chunkIdx),
+      controller: new AbortController(),
+    };
+    this._inflight.add(request);
+    try {
+      const tables = await fetchTables(
+        {
+          path: this._loadingParams.path,
+          row_chunk_size: this._loadingParams.rowChunkSize,
+          col_chunk_size: this._loadingParams.colChunkSize,
+          chunks: request.chunks,
+          compression: this._loadingParams.compression,
+          dictionary_encode: this._loadingParams.dictionaryEncode,
+          max_cell_bytes: this._loadingParams.maxCellBytes,
+          ...this._fileOptions,
+        },
+        request.controller.signal,
+      );
+      for (const { chunkIdx, resolve, reject } of batch) {
+        const table = tables.get(chunkIdx);
+        if (table === undefined) {
+          reject(new Error(`Chunk ${chunkIdx} missing from the server response`));
+        } else {
+          resolve(table);
+        }
+      }
+    } catch (error) {
+      for (const { reject } of batch) {
+        reject(error);
+      }
+    } finally {
+      this._inflight.delete(request);
+    }
+  }
+
+  /**
+   * Abort the requests whose chunks all left the viewport, so that the server stops computing them.
+   *
+   * Chunks next to the viewport are kept, as they are prefetched for scrolling.
+   * Nothing is aborted while the viewport is unknown.
+   */
+  private abortChunksOutOfView() {
+    const viewport = this._viewport();
+    if (viewport === undefined) {
+      return;
+    }
+    const [firstRowChunk, firstColChunk] = this.chunkIdx(viewport.firstRow, viewport.firstColumn);
+    const [lastRowChunk, lastColChunk] = this.chunkIdx(viewport.lastRow, viewport.lastColumn);
+    const isAway = ([row, col]: [number, number]) =>
+      row < firstRowChunk - 1 ||
+      row > lastRowChunk + 1 ||
+      col < firstColChunk - 1 ||
+      col > lastColChunk + 1;
+
+    for (const request of this._inflight) {
+      if (request.chunks.every(isAway)) {
+        request.controller.abort();
+        this._inflight.delete(request);
+      }
+    }
+  }
+
   private emitChangedChunk(chunkIdx: [number, number]) {
     const [rowChunk, colChunk] = chunkIdx;
 
@@ -183,9 +318,32 @@ export class ArrowModel extends DataModel {
       return;
     }
 
-    const promise = this.fetchChunk(chunkIdx).then((table) => {
-      this._chunks.set(chunkIdx, table);
-    });
+    this.requestChunk(chunkIdx, false);
+  }
+
+  private requestChunk(chunkIdx: [number, number], emitChanged: boolean) {
+    const promise: Promise<void> = this.fetchChunkBatched(chunkIdx).then(
+      (table) => {
+        this._chunks.set(chunkIdx, table);
+        if (emitChanged) {
+          this.emitChangedChunk(chunkIdx);
+        }
+      },
+      (error) => {
+        const aborted = error instanceof DOMException && error.name === "AbortError";
+        // Forget the chunk so that it is fetched again if it comes back into view
+        if (this._chunks.get(chunkIdx) === promise) {
+          this._chunks.delete(chunkIdx);
+          if (aborted) {
+            // Repaint its cells rather than leaving them loading
+            this.emitChangedChunk(chunkIdx);
+          }
+        }
+        if (!aborted) {
+          throw error;
+        }
+      },
+    );
     this._chunks.set(chunkIdx, promise);
   }
 
@@ -210,5 +368,8 @@ export class ArrowModel extends DataModel {
   private _numCols: number = 0;
   private _schema!: Arrow.Schema;
   private _chunks: PairMap<number, number, Arrow.Table | Promise<void>> = new PairMap();
+  private _pendingChunks: PendingChunk[] = [];
+  private _inflight: Set<InflightRequest> = new Set();
+  private _viewport: () => ArrowModel.Viewport | undefined = () => undefined;
   private _ready: Promise<void>;
 }
@@ -1,6 +1,7 @@
-import { tableFromIPC } from "apache-arrow";
+import { RecordBatchReader, Table, tableFromIPC } from "apache-arrow";
 import type * as Arrow from "apache-arrow";
 
+import { PairMap } from "./collection";
 import type { FileInfo, FileInfoFor, FileReadOptions, FileReadOptionsFor } from "./file-options";
 import type { FileType } from "./file-types";
 
@@ -33,7 +34,17 @@ export async function fetchFileInfo(params: Readonly<FileInfoOptions>): Promise<
   return data;
 }
 
-export interface StatsOptions {
+/**
+ * Rows selection and ordering computed on the server.
+ */
+export interface QueryOptions {
+  /** A filter expression such as `age >= 18 and (city == 'Paris' or city is null)`. */
+  filter?: string;
+  sort_by?: string;
+  descending?: boolean;
+}
+
+export interface StatsOptions extends QueryOptions {
   path: string;
 }
 
@@ -51,12 +62,15 @@ interface SchemaInfo {
 interface StatsResponseRaw {
   num_rows: number;
   num_cols: number;
+  num_rows_exact: boolean;
   schema: SchemaInfo;
 }
 
 export interface StatsResponse {
   num_rows: number;
   num_cols: number;
+  /** Whether `num_rows` is exact or estimated from a sample of the file. */
+  num_rows_exact: boolean;
   schema: Arrow.Schema;
 }
 
@@ -70,7 +84,14 @@ type OptionalizeUnion<T> = {
 export async function fetchStats(
   params: Readonly<StatsOptions & FileReadOptions>,
 ): Promise<StatsResponse> {
-  const queryKeys = ["path", "delimiter", "table_name"] as const;
+  const queryKeys = [
+    "path",
+    "delimiter",
+    "table_name",
+    "filter",
+    "sort_by",
+    "descending",
+  ] as const;
   const queryKeyMap: Record<string, string> = {
     tableName: "table_name",
   };
@@ -78,7 +99,7 @@ export async function fetchStats(
   const query = new URLSearchParams();
 
   for (const key of queryKeys) {
-    const value = (params as Readonly<TableOptions> & OptionalizeUnion<FileReadOptions>)[key];
+    const value = (params as Readonly<StatsOptions> & OptionalizeUnion<FileReadOptions>)[key];
     if (value !== undefined && value != null) {
       const queryKey = queryKeyMap[key] || key;
       query.set(queryKey, value.toString());
@@ -116,11 +137,86 @@ export async function fetchStats(
   return {
     num_rows: data.num_rows,
     num_cols: data.num_cols,
+    num_rows_exact: data.num_rows_exact,
     schema,
   };
 }
 
-export interface TableOptions {
+export interface SummaryOptions {
+  path: string;
+  /** Number of bins of the histograms of numeric columns. */
+  bins?: number;
+  /** Estimate the distinct counts, which scans every column even for Parquet files. */
+  distinct?: boolean;
+}
+
+export interface Histogram {
+  /** The bins boundaries, one more than the number of bins. */
+  edges: number[];
+  counts: number[];
+}
+
+export interface ColumnSummary {
+  name: string;
+  type: string;
+  null_count: number;
+  min: string | number | boolean | null;
+  max: string | number | boolean | null;
+  /** Estimated number of distinct non-null values. */
+  distinct_count: number | null;
+  histogram: Histogram | null;
+}
+
+export interface SummaryResponse {
+  num_rows: number;
+  columns: ColumnSummary[];
+}
+
+export async function fetchSummary(
+  params: Readonly<SummaryOptions & FileReadOptions>,
+): Promise<SummaryResponse> {
+  const queryKeys = ["bins", "distinct", "delimiter", "table_name"] as const;
+
+  const query = new URLSearchParams();
+
+  for (const key of queryKeys) {
+    const value = (params as Readonly<SummaryOptions> & OptionalizeUnion<FileReadOptions>)[key];
+    if (value !== undefined && value != null) {
+      query.set(key, value.toString());
+    }
+  }
+
+  const response = await fetch(`/arrow/summary/${params.path}?${query.toString()}`);
+  if (!response.ok) {
+    throw new Error(`Error communicating with the Arbalister server: ${response.status}`);
+  }
+  return await response.json();
+}
+
+/**
+ * Encoding of the IPC streams sent by the server.
+ */
+export interface EncodingOptions {
+  /**
+   * Compression of the record batch bodies.
+   *
+   * Compressed bodies save transfer time on slow links, at the cost of CPU time on both ends, and
+   * require an Arrow decoder able to decompress the codec.
+   */
+  compression?: "lz4" | "zstd" | "none";
+  compression_level?: number;
+  /** Dictionary encode the string columns with few distinct values. */
+  dictionary_encode?: boolean;
+  /**
+   * Truncate the string and binary values longer than this number of bytes.
+   *
+   * Truncated values end with an ellipsis and are longer than the limit, while complete values are
+   * not. Use `fetchCell` to get the full value.
+   */
+  max_cell_bytes?: number;
+}
+
+export interface TableOptions extends QueryOptions, EncodingOptions {
   path: string;
   row_chunk_size?: number;
   row_chunk?: number;
@@ -135,6 +231,7 @@ export type TableOptionsFor<T extends FileType> = TableOptions & FileReadOptions
 
 export async function fetchTable(
   params: Readonly<TableOptions & FileReadOptions>,
+  signal?: AbortSignal,
 ): Promise<Arrow.Table> {
   const queryKeys = [
     "row_chunk_size",
@@ -143,6 +240,13 @@ export async function fetchTable(
     "col_chunk",
     "delimiter",
     "table_name",
+    "filter",
+    "sort_by",
+    "descending",
+    "compression",
+    "compression_level",
+    "dictionary_encode",
+    "max_cell_bytes",
   ] as const;
 
   const query = new URLSearchParams();
@@ -155,7 +259,105 @@ export async function fetchTable(
   }
 
   const url = `/arrow/stream/${params.path}?${query.toString()}`;
-  const response = await fetch(url);
+  const response = await fetch(url, { signal });
+  if (!response.ok) {
+    throw new Error(`Error communicating with the Arbalister server: ${response.status}`);
+  }
+  return await tableFromIPC(response);
+}
+
+export interface TablesOptions extends QueryOptions, EncodingOptions {
+  path: string;
+  row_chunk_size?: number;
+  col_chunk_size?: number;
+  /** The `[row_chunk, col_chunk]` indices of the chunks to fetch. */
+  chunks: ReadonlyArray<[number, number]>;
+}
+
+/**
+ * Fetch many chunks in a single request, keyed by their row and column chunk indices.
+ *
+ * Aborting the signal closes the connection, which stops the query on the server.
+ */
+export async function fetchTables(
+  params: Readonly<TablesOptions & FileReadOptions>,
+  signal?: AbortSignal,
+): Promise<PairMap<number, number, Arrow.Table>> {
+  const queryKeys = [
+    "row_chunk_size",
+    "col_chunk_size",
+    "delimiter",
+    "table_name",
+    "filter",
+    "sort_by",
+    "descending",
+    "compression",
+    "compression_level",
+    "dictionary_encode",
+    "max_cell_bytes",
+  ] as const;
+
+  const query = new URLSearchParams();
+
+  for (const key of queryKeys) {
+    const value = (params as Readonly<TablesOptions> & OptionalizeUnion<FileReadOptions>)[key];
+    if (value !== undefined && value != null) {
+      query.set(key, value.toString());
+    }
+  }
+  query.set("chunks", params.chunks.map(([row, col]) => `${row}:${col}`).join(","));
+
+  const url = `/arrow/batch/${params.path}?${query.toString()}`;
+  const response = await fetch(url, { signal });
+  if (!response.ok) {
+    throw new Error(`Error communicating with the Arbalister server: ${response.status}`);
+  }
+
+  // The response is a sequence of IPC streams, one per chunk, identified by their schema metadata
+  const bytes = new Uint8Array(await response.arrayBuffer());
+  const tables = new PairMap<number, number, Arrow.Table>();
+  for (const reader of RecordBatchReader.readAll(bytes)) {
+    const rowChunk = Number(reader.schema.metadata.get("row_chunk"));
+    const colChunk = Number(reader.schema.metadata.get("col_chunk"));
+    tables.set([rowChunk, colChunk], new Table(reader.schema, reader.readAll()));
+  }
+  return tables;
+}
+
+export interface CellOptions extends QueryOptions {
+  path: string;
+  row: number;
+  column: string;
+}
+
+/**
+ * Fetch the full value of a single cell, as a table with one row, or none if out of range.
+ */
+export async function fetchCell(
+  params: Readonly<CellOptions & FileReadOptions>,
+  signal?: AbortSignal,
+): Promise<Arrow.Table> {
+  const queryKeys = [
+    "row",
+    "column",
+    "delimiter",
+    "table_name",
+    "filter",
+    "sort_by",
+    "descending",
+  ] as const;
+
+  const query = new URLSearchParams();
+
+  for (const key of queryKeys) {
+    const value = (params as Readonly<CellOptions> & OptionalizeUnion<FileReadOptions>)[key];
+    if (value !== undefined && value != null) {
+      query.set(key, value.toString());
+    }
+  }
+
+  const url = `/arrow/cell/${params.path}?${query.toString()}`;
+  const response = await fetch(url, { signal });
   if (!response.ok) {
     throw new Error(`Error communicating with the Arbalister server: ${response.status}`);
   }
@@ -118,6 +118,7 @@ export class ArrowGridViewer extends Panel {
     try {
       const dataModel = await ArrowModel.fromRemoteFileInfo({ path: this.path });
       await dataModel.ready;
+      dataModel.viewport = () => this._grid.currentViewport;
       this._grid.dataModel = dataModel;
       this._grid.selectionModel = new BasicSelectionModel({ dataModel });
     } catch (error) {